@@ -1,13 +1,39 @@
 import math
+import os
+import sys
 import json
+import mmap
+import queue
+import sqlite3
+import struct
 import re
+import signal
+import socket
 import time
+import argparse
+import base64
+import gc
 import hashlib
-from dataclasses import dataclass, field
-from datetime import datetime, time
-from typing import List, Optional, Tuple, Dict
-from flask import Flask, jsonify, request, render_template
+import hmac
+import heapq
+import threading
+import urllib.parse
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from multiprocessing import shared_memory
+from dataclasses import dataclass, field, replace
+from datetime import datetime, time, timedelta
+from time import perf_counter
+from typing import List, Optional, Tuple, Dict, Set, Iterable, Iterator, Callable, Sequence
+from flask import (Blueprint, Flask, Response, g, has_request_context, jsonify, request,
+                   render_template, stream_with_context)
 from flask_cors import CORS
+from search_core import (Coordinates, LocationService, PackedStrings, PostingLists,
+                         SpatialGridIndex, TextSearchIndex, fold_diacritics, intern_strings,
+                         tokenize_text)
 
 # Try to import requests for Ollama (optional)
 try:
@@ -17,26 +43,89 @@ except ImportError:
     REQUESTS_AVAILABLE = False
     print("⚠️ requests not installed. Install with: pip install requests (for Ollama support)")
 
+# Try to import numpy for the columnar search backend (optional)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("⚠️ numpy not installed. Install with: pip install numpy (for vectorized search)")
+
 # ----------------------------------------------------------------------------
 # CLASSES
 # ----------------------------------------------------------------------------
 
-@dataclass
-class Coordinates:
-    latitude: float
-    longitude: float
+def dump_json_bytes(obj) -> bytes:
+    """Compact UTF-8 JSON, the encoding used for pre-serialized fragments."""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
 
-    def getLatitude(self) -> float:
-        return self.latitude
+class JSONFragment:
+    """Already-encoded JSON that encode_json() embeds verbatim."""
+    __slots__ = ("raw",)
 
-    def getLongitude(self) -> float:
-        return self.longitude
+    def __init__(self, raw: bytes):
+        self.raw = raw
+
+    def to_dict(self) -> dict:
+        return json.loads(self.raw)
+
+def encode_json(obj) -> bytes:
+    """dump_json_bytes() that splices JSONFragment values in without re-encoding them."""
+    if isinstance(obj, JSONFragment):
+        return obj.raw
+    if isinstance(obj, dict):
+        return b"{" + b",".join(dump_json_bytes(str(key)) + b":" + encode_json(value)
+                                for key, value in obj.items()) + b"}"
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b",".join(encode_json(value) for value in obj) + b"]"
+    return dump_json_bytes(obj)
 
 class Restaurant:
+    # Compact layout for large catalogues: no per-instance __dict__, the
+    # coordinates inline instead of a Coordinates object, and the repeated
+    # vocabulary (cuisines, tags, flags, hours, ...) interned and held in tuples.
+    __slots__ = ("id", "name", "rating", "averagePrice", "cuisines", "tags", "openHours",
+                 "specialFlags", "latitude", "longitude", "image_url", "distance_text",
+                 "price_text", "address", "dishType", "flavorProfile",
+                 "_json_head", "_json_distance")
+
     def __init__(self, id: int, name: str, rating: float, averagePrice: float,
                  cuisines: List[str], tags: List[str], openHours: str,
                  specialFlags: List[str], location: Coordinates, image_url: str,
-                 distance_text: str, price_text: str, address: str = ""): # Added address
+                 distance_text: str, price_text: str, address: str = "", # Added address
+                 dishType: Optional[List[str]] = None, flavorProfile: Optional[List[str]] = None):
+        self.id = id
+        self.name = name
+        self.rating = rating
+        self.averagePrice = averagePrice
+        self.cuisines = intern_strings(cuisines)
+        self.tags = intern_strings(tags)
+        self.openHours = sys.intern(openHours)
+        self.specialFlags = intern_strings(specialFlags)
+        self.latitude = location.latitude
+        self.longitude = location.longitude
+        self.image_url = image_url
+        self.distance_text = distance_text
+        self.price_text = sys.intern(price_text)
+        self.address = address
+        self.dishType = intern_strings(dishType)
+        self.flavorProfile = intern_strings(flavorProfile)
+        # Static JSON, encoded on first use (see to_json). Restaurants are
+        # rebuilt on every data load, so a reload never serves stale bytes.
+        self._json_head: Optional[bytes] = None
+        self._json_distance: Optional[bytes] = None
+
+    @classmethod
+    def from_compact(cls, id: int, name: str, rating: float, averagePrice: float,
+                     cuisines: Tuple[str, ...], tags: Tuple[str, ...], openHours: str,
+                     specialFlags: Tuple[str, ...], latitude: float, longitude: float,
+                     image_url: str, distance_text: str, price_text: str, address: str,
+                     dishType: Tuple[str, ...], flavorProfile: Tuple[str, ...]) -> "Restaurant":
+        """
+        Restaurant from values already in the compact layout (interned strings,
+        tuples, inline coordinates), skipping the conversions in __init__.
+        """
+        self = cls.__new__(cls)
         self.id = id
         self.name = name
         self.rating = rating
@@ -45,23 +134,37 @@ class Restaurant:
         self.tags = tags
         self.openHours = openHours
         self.specialFlags = specialFlags
-        self.location = location
+        self.latitude = latitude
+        self.longitude = longitude
         self.image_url = image_url
         self.distance_text = distance_text
         self.price_text = price_text
         self.address = address
+        self.dishType = dishType
+        self.flavorProfile = flavorProfile
+        self._json_head = None
+        self._json_distance = None
+        return self
 
     def getId(self) -> int: return self.id
     def getName(self) -> str: return self.name
     def getRating(self) -> float: return self.rating
     def getAveragePrice(self) -> float: return self.averagePrice
-    def getCuisines(self) -> List[str]: return self.cuisines
-    def getTags(self) -> List[str]: return self.tags
+    def getCuisines(self) -> Tuple[str, ...]: return self.cuisines
+    def getTags(self) -> Tuple[str, ...]: return self.tags
     def getOpenHours(self) -> str: return self.openHours
-    def getSpecialFlags(self) -> List[str]: return self.specialFlags
-    def getLocation(self) -> Coordinates: return self.location
+    def getSpecialFlags(self) -> Tuple[str, ...]: return self.specialFlags
+    def getLatitude(self) -> float: return self.latitude
+    def getLongitude(self) -> float: return self.longitude
+    def getLocation(self) -> Coordinates: return Coordinates(self.latitude, self.longitude)
     def getAddress(self) -> str: return self.address
     def getPriceText(self) -> str: return self.price_text
+    def getDishType(self) -> Tuple[str, ...]: return self.dishType
+    def getFlavorProfile(self) -> Tuple[str, ...]: return self.flavorProfile
+
+    @property
+    def location(self) -> Coordinates:
+        return self.getLocation()
 
     # Helper for JSON
     def to_dict(self):
@@ -74,13 +177,41 @@ class Restaurant:
             "tags": self.tags,
             "openHours": self.openHours,
             "specialFlags": self.specialFlags,
-            "location": {"latitude": self.location.latitude, "longitude": self.location.longitude},
+            "location": {"latitude": self.latitude, "longitude": self.longitude},
             "image_url": self.image_url,
             "distance_text": self.distance_text,
             "price_text": self.price_text,
-            "address": self.address
+            "address": self.address,
+            "dishType": self.dishType,
+            "flavorProfile": self.flavorProfile
         }
 
+    def set_json(self, raw: bytes) -> None:
+        """Adopt an already-encoded to_json() (e.g. from a snapshot) as the cached static JSON."""
+        head, _, distance = raw[:-1].rpartition(b',"distance_text":')
+        self._json_head = head
+        self._json_distance = b'"distance_text":' + distance
+
+    def to_json(self, **dynamic) -> JSONFragment:
+        """
+        to_dict() as a JSON fragment. The static fields are encoded once; the
+        keyword arguments (per-request fields such as calculated_distance_km,
+        or an overriding distance_text) are spliced onto the cached bytes.
+        """
+        if self._json_head is None:
+            static = self.to_dict()
+            distance_text = static.pop("distance_text")
+            self._json_head = dump_json_bytes(static)[:-1]
+            self._json_distance = dump_json_bytes({"distance_text": distance_text})[1:-1]
+        raw = self._json_head
+        if "distance_text" not in dynamic:
+            raw += b"," + self._json_distance
+        if dynamic:
+            raw += b"," + dump_json_bytes(dynamic)[1:-1]
+        return JSONFragment(raw + b"}")
+
+TRIGRAM_THRESHOLD = 0.5  # Default share of the query's trigrams a fuzzy match must contain
+
 @dataclass
 class SearchQuery:
     userLocation: Coordinates
@@ -91,28 +222,33 @@ class SearchQuery:
     openNow: bool = False
     cuisines: List[str] = field(default_factory=list)
     specialFlags: List[str] = field(default_factory=list)
+    dishTypes: List[str] = field(default_factory=list)
+    flavorProfiles: List[str] = field(default_factory=list)
+    atTime: Optional[time] = None  # Evaluate opening hours at this time instead of now
+    limit: Optional[int] = None  # Page size; None returns every match
+    cursor: Optional[str] = None  # Opaque nextCursor from the previous page
+    similarityThreshold: float = TRIGRAM_THRESHOLD  # Fuzzy fallback for text without exact matches; 0 disables
 
-class LocationService:
-    EARTH_RADIUS_KM: float = 6371.0
-
-    def convertToRadians(self, degrees: float) -> float:
-        return degrees * math.pi / 180.0
-
-    def calculateDistance(self, userLocation: Coordinates,
-                          restaurantLocation: Coordinates) -> float:
-        lat1_rad = self.convertToRadians(userLocation.latitude)
-        lon1_rad = self.convertToRadians(userLocation.longitude)
-        lat2_rad = self.convertToRadians(restaurantLocation.latitude)
-        lon2_rad = self.convertToRadians(restaurantLocation.longitude)
-        d_lon = lon2_rad - lon1_rad
-        d_lat = lat2_rad - lat1_rad
-        a = (math.sin(d_lat / 2)**2) + \
-            (math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(d_lon / 2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = self.EARTH_RADIUS_KM * c
-        return distance
+@lru_cache(maxsize=4096)
+def compile_open_hours(openHours: str) -> Optional[Tuple[int, int]]:
+    """'06:00 - 22:00' -> (360, 1320) as minutes after midnight; None if unparseable."""
+    try:
+        open_str, close_str = openHours.split(' - ')
+        minutes = []
+        for part in (open_str, close_str):
+            hour, minute = part.split(':')
+            hour, minute = int(hour), int(minute)
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                return None
+            minutes.append(hour * 60 + minute)
+        return minutes[0], minutes[1]
+    except (ValueError, TypeError, AttributeError):
+        return None
 
 class HoursChecker:
+    OPEN_TEXT = "Mở cửa"
+    CLOSED_TEXT = "Đã đóng"
+
     def __init__(self, simulation_time: Optional[time] = None):
         self._simulation_time = simulation_time
 
@@ -121,24 +257,26 @@ class HoursChecker:
             return self._simulation_time
         return datetime.now().time()
 
+    def currentMinute(self) -> int:
+        now = self._getCurrentTime()
+        return now.hour * 60 + now.minute
+
+    @staticmethod
+    def isOpenAt(schedule: Optional[Tuple[int, int]], minute: int) -> bool:
+        """Open check on a compiled (open, close) schedule; handles overnight wrap."""
+        if schedule is None:
+            return False
+        open_minute, close_minute = schedule
+        if open_minute < close_minute:
+            return open_minute <= minute <= close_minute
+        return minute >= open_minute or minute <= close_minute
+
+    def statusText(self, is_open: bool) -> str:
+        return self.OPEN_TEXT if is_open else self.CLOSED_TEXT
+
     def isOpen(self, openHours: str) -> Tuple[bool, str]:
-        try:
-            open_str, close_str = openHours.split(' - ')
-            open_time = time(int(open_str.split(':')[0]), int(open_str.split(':')[1]))
-            close_time = time(int(close_str.split(':')[0]), int(close_str.split(':')[1]))
-            now = self._getCurrentTime()
-
-            is_open = False
-            if open_time < close_time:
-                is_open = open_time <= now <= close_time
-            else:
-                is_open = now >= open_time or now <= close_time
-            
-            status_text = "Mở cửa" if is_open else "Đã đóng"
-            return is_open, status_text
-                
-        except (ValueError, TypeError):
-            return False, "Đã đóng"
+        is_open = self.isOpenAt(compile_open_hours(openHours), self.currentMinute())
+        return is_open, self.statusText(is_open)
 
 # ----------------------------------------------------------------------------
 # DATA SOURCE
@@ -150,207 +288,2915 @@ def load_data_from_json(json_path: str) -> List[Restaurant]:
         with open(json_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
 
-        restaurant_list = []
-        for item in data:
-            coords = Coordinates(
-                latitude=item['location']['latitude'],
-                longitude=item['location']['longitude']
-            )
-            
-            res = Restaurant(
-                id=item['id'],
-                name=item['name'],
-                rating=item['rating'],
-                averagePrice=item['averagePrice'],
-                cuisines=item['cuisines'],
-                tags=item['tags'],
-                openHours=item['openHours'],
-                specialFlags=item['specialFlags'],
-                location=coords,
-                image_url=item['image_url'],
-                distance_text=item['distance_text'],
-                price_text=item['price_text'],
-                address=item.get('address', '')
-            )
-            restaurant_list.append(res)
-        
-        print(f"Successfully loaded {len(restaurant_list)} restaurants from JSON.")
-        return restaurant_list
-    
-    except FileNotFoundError:
-        print(f"Error: The data file '{json_path}' was not found.")
-        return []
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from '{json_path}'. Check for syntax errors.")
-        return []
-    except KeyError as e:
-        print(f"Error: Missing key {e} in JSON data.")
-        return []
+        restaurant_list = []
+        for item in data:
+            coords = Coordinates(
+                latitude=item['location']['latitude'],
+                longitude=item['location']['longitude']
+            )
+            
+            res = Restaurant(
+                id=item['id'],
+                name=item['name'],
+                rating=item['rating'],
+                averagePrice=item['averagePrice'],
+                cuisines=item['cuisines'],
+                tags=item['tags'],
+                openHours=item['openHours'],
+                specialFlags=item['specialFlags'],
+                location=coords,
+                image_url=item['image_url'],
+                distance_text=item['distance_text'],
+                price_text=item['price_text'],
+                address=item.get('address', ''),
+                dishType=item.get('dishType', []),
+                flavorProfile=item.get('flavorProfile', [])
+            )
+            res.to_json()  # Encode the static JSON once, at load time
+            restaurant_list.append(res)
+        
+        print(f"Successfully loaded {len(restaurant_list)} restaurants from JSON.")
+        return restaurant_list
+    
+    except FileNotFoundError:
+        print(f"Error: The data file '{json_path}' was not found.")
+        return []
+    except json.JSONDecodeError:
+        print(f"Error: Could not decode JSON from '{json_path}'. Check for syntax errors.")
+        return []
+    except KeyError as e:
+        print(f"Error: Missing key {e} in JSON data.")
+        return []
+
+# ----------------------------------------------------------------------------
+# BINARY SNAPSHOT
+# ----------------------------------------------------------------------------
+# A compiled copy of restaurants.json (see tools/build_snapshot.py) that is
+# mmap'ed instead of parsed as JSON. The json backend still builds one
+# Restaurant per row from it at startup; only the shared memory catalogue
+# decodes rows on demand. Layout, little-endian:
+#   header      SNAPSHOT_HEADER (magic, version, row count, section count)
+#   directory   one (offset, length) pair per section, in SNAPSHOT_SECTIONS order
+#   sections    fixed-width columns, each aligned to 8 bytes
+# Text lives once in a string table ("strings" offsets into "string_data");
+# string columns hold table indexes, and list columns hold offsets into a flat
+# array of table indexes. The static JSON of every row is stored too, so the
+# loader does not re-encode it.
+
+SNAPSHOT_MAGIC = b"CCSNAP\x00\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sHHII")
+SNAPSHOT_ENTRY = struct.Struct("<QQ")
+
+SNAPSHOT_NUMERIC_FIELDS = (("id", "q"), ("rating", "d"), ("averagePrice", "d"),
+                           ("latitude", "d"), ("longitude", "d"))
+SNAPSHOT_STRING_FIELDS = ("name", "openHours", "image_url", "distance_text",
+                          "price_text", "address")
+SNAPSHOT_LIST_FIELDS = ("cuisines", "tags", "specialFlags", "dishType", "flavorProfile")
+SNAPSHOT_DISPLAY_FIELDS = ("image_url", "distance_text", "price_text")  # Left empty in index-only snapshots
+
+SNAPSHOT_SECTIONS = (
+    tuple(SNAPSHOT_NUMERIC_FIELDS)
+    + tuple((name, "I") for name in SNAPSHOT_STRING_FIELDS)
+    + tuple(section for name in SNAPSHOT_LIST_FIELDS
+            for section in ((name + ".offsets", "I"), (name + ".items", "I")))
+    + (("strings", "Q"), ("string_data", "B"), ("json", "Q"), ("json_data", "B"))
+)
+
+def snapshot_path_for(json_path: str) -> str:
+    """data/restaurants.json -> data/restaurants.snap"""
+    return os.path.splitext(json_path)[0] + ".snap"
+
+def compile_snapshot(restaurants: Iterable[Restaurant],
+                     indexOnly: bool = False) -> Tuple[int, List[Tuple[int, bytes]]]:
+    """
+    The snapshot image of restaurants as (total size, [(offset, buffer)]);
+    the gaps between buffers are zero padding. An indexOnly image keeps just
+    what the search indexes read: no display strings and no pre-encoded JSON.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Snapshots can only be written on little-endian machines")
+
+    columns: Dict[str, array] = {name: array(code) for name, code in SNAPSHOT_SECTIONS
+                                 if code != "B"}
+    offset_columns = [name + ".offsets" for name in SNAPSHOT_LIST_FIELDS] + ["strings", "json"]
+    for name in offset_columns:
+        columns[name].append(0)
+    string_offsets, string_data, json_data = columns["strings"], bytearray(), bytearray()
+    table: Dict[str, int] = {}
+
+    def string_id(value: str) -> int:
+        if value not in table:
+            table[value] = len(table)
+            string_data.extend(value.encode("utf-8"))
+            string_offsets.append(len(string_data))
+        return table[value]
+
+    for restaurant in restaurants:
+        for name, _ in SNAPSHOT_NUMERIC_FIELDS:
+            columns[name].append(getattr(restaurant, name))
+        for name in SNAPSHOT_STRING_FIELDS:
+            blank = indexOnly and name in SNAPSHOT_DISPLAY_FIELDS
+            columns[name].append(string_id("" if blank else getattr(restaurant, name)))
+        for name in SNAPSHOT_LIST_FIELDS:
+            items = columns[name + ".items"]
+            items.extend(string_id(value) for value in getattr(restaurant, name))
+            columns[name + ".offsets"].append(len(items))
+        if not indexOnly:
+            json_data.extend(restaurant.to_json().raw)
+        columns["json"].append(len(json_data))
+
+    # Sections are handed out straight from their buffers, never joined in memory
+    buffers = [string_data if name == "string_data" else json_data if name == "json_data"
+               else memoryview(columns[name]).cast("B") for name, _ in SNAPSHOT_SECTIONS]
+    offset = SNAPSHOT_HEADER.size + SNAPSHOT_ENTRY.size * len(buffers)
+    layout = []
+    for buffer in buffers:
+        offset += -offset % 8
+        layout.append((offset, len(buffer)))
+        offset += len(buffer)
+
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0,
+                                  len(columns["json"]) - 1, len(buffers))
+    header += b"".join(SNAPSHOT_ENTRY.pack(*entry) for entry in layout)
+    return offset, [(0, header)] + [(start, buffer) for (start, _), buffer in zip(layout, buffers)]
+
+def write_snapshot(restaurants: List[Restaurant], snapshot_path: str, indexOnly: bool = False) -> None:
+    """Compile restaurants into a binary snapshot, replacing snapshot_path atomically."""
+    _, chunks = compile_snapshot(restaurants, indexOnly)
+    temp_path = snapshot_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        for offset, buffer in chunks:
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(buffer)
+    os.replace(temp_path, snapshot_path)
+
+def snapshot_columns(buffer, label: str) -> Tuple[int, Dict[str, memoryview]]:
+    """
+    Row count and section views of a snapshot image (a file mapping or a
+    shared memory segment). Raises ValueError for anything but a complete
+    snapshot of the current version.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Snapshots can only be read on little-endian machines")
+    view = memoryview(buffer)
+    columns = {}
+    try:
+        magic, version, _, count, section_count = SNAPSHOT_HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"'{label}' is not a version {SNAPSHOT_VERSION} snapshot")
+        if section_count != len(SNAPSHOT_SECTIONS):
+            raise ValueError(f"'{label}' has an unexpected section layout")
+        for index, (name, code) in enumerate(SNAPSHOT_SECTIONS):
+            offset, length = SNAPSHOT_ENTRY.unpack_from(
+                view, SNAPSHOT_HEADER.size + index * SNAPSHOT_ENTRY.size)
+            if offset + length > len(view):
+                raise ValueError(f"'{label}' is truncated")
+            columns[name] = view[offset:offset + length].cast(code)
+    except (ValueError, struct.error):
+        # No view may outlive a failed open, or the caller cannot close the mapping
+        for column in columns.values():
+            column.release()
+        raise
+    finally:
+        view.release()
+    return count, columns
+
+def load_data_from_snapshot(snapshot_path: str) -> List[Restaurant]:
+    """
+    Restaurants from a binary snapshot. The file is mmap'ed and its columns
+    read in place, but every row still becomes a Restaurant, so the load is
+    about three times faster than JSON rather than free. Raises ValueError
+    for a file that is not a snapshot of the current version.
+    """
+    with open(snapshot_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    columns = {}
+    try:
+        count, columns = snapshot_columns(mapped, snapshot_path)
+
+        # Decoded and interned once, shared by every row that uses the text
+        string_offsets, string_data = columns["strings"], columns["string_data"]
+        strings = [sys.intern(str(string_data[string_offsets[i]:string_offsets[i + 1]], "utf-8"))
+                   for i in range(len(string_offsets) - 1)]
+        json_offsets, json_data = columns["json"], columns["json_data"]
+
+        def list_column(name):
+            offsets, items = columns[name + ".offsets"].tolist(), columns[name + ".items"].tolist()
+            return [tuple(map(strings.__getitem__, items[offsets[row]:offsets[row + 1]]))
+                    for row in range(count)]
+
+        def string_column(name):
+            return list(map(strings.__getitem__, columns[name].tolist()))
+
+        fields = [name for name, _ in SNAPSHOT_NUMERIC_FIELDS]
+        values = [columns[name].tolist() for name in fields]
+        fields += SNAPSHOT_STRING_FIELDS + SNAPSHOT_LIST_FIELDS
+        values += [string_column(name) for name in SNAPSHOT_STRING_FIELDS]
+        values += [list_column(name) for name in SNAPSHOT_LIST_FIELDS]
+        # Prices are whole VND in the JSON; keep them ints so they format the same
+        prices = values[fields.index("averagePrice")]
+        prices[:] = [int(price) if price.is_integer() else price for price in prices]
+
+        restaurant_list = []
+        for row, row_values in enumerate(zip(*values)):
+            res = Restaurant.from_compact(**dict(zip(fields, row_values)))
+            res.set_json(bytes(json_data[json_offsets[row]:json_offsets[row + 1]]))
+            restaurant_list.append(res)
+    finally:
+        # Every view into the mapping must be released before it can close
+        for column in columns.values():
+            column.release()
+        mapped.close()
+
+    print(f"Successfully loaded {len(restaurant_list)} restaurants from snapshot.")
+    return restaurant_list
+
+def load_restaurants(json_path: str) -> List[Restaurant]:
+    """
+    Restaurants from the compiled snapshot when it is newer than json_path,
+    otherwise (missing, stale or unreadable snapshot) from the JSON itself.
+    """
+    snapshot_path = snapshot_path_for(json_path)
+    try:
+        if os.path.getmtime(snapshot_path) > os.path.getmtime(json_path):
+            return load_data_from_snapshot(snapshot_path)
+        print(f"⚠️ '{snapshot_path}' is older than '{json_path}', loading JSON instead.")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, struct.error) as e:
+        print(f"⚠️ Could not read snapshot '{snapshot_path}' ({e}), loading JSON instead.")
+    return load_data_from_json(json_path)
+
+# ----------------------------------------------------------------------------
+# SEARCH INDEXES
+# ----------------------------------------------------------------------------
+
+def price_bucket(averagePrice: float) -> str:
+    """Map an average price to the priceRange buckets used by the search filter."""
+    if averagePrice < 25000:
+        return "low"
+    elif averagePrice <= 50000:
+        return "mid"
+    return "high"
+
+def positions_to_bitmap(positions: Iterable[int], size: int) -> int:
+    """Pack positions into an int bitmap (bit i set = position i)."""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+def bitmap_to_positions(bitmap: int) -> List[int]:
+    """Ascending positions of the set bits in an int bitmap."""
+    bits = bin(bitmap)[:1:-1]  # drop '0b' and reverse so string index == position
+    return [match.start() for match in re.finditer('1', bits)]
+
+class FacetIndex:
+    """
+    One bitmap (a Python int, bit i = catalogue position i) per facet value.
+    A query ORs the bitmaps of the requested values within a facet and ANDs
+    across facets, so categorical filters never touch individual rows.
+    New facets only need an entry in FACETS.
+    """
+    FACETS = {
+        "cuisines": lambda r: r.getCuisines(),
+        "specialFlags": lambda r: r.getSpecialFlags(),
+        "priceRange": lambda r: [price_bucket(r.getAveragePrice())],
+        "dishType": lambda r: r.getDishType(),
+        "flavorProfile": lambda r: r.getFlavorProfile(),
+    }
+
+    def __init__(self, restaurants: List[Restaurant]):
+        self.size = len(restaurants)
+        self.all_bits = (1 << self.size) - 1
+        positions: Dict[str, Dict[str, List[int]]] = {name: {} for name in self.FACETS}
+        for position, restaurant in enumerate(restaurants):
+            for name, extract in self.FACETS.items():
+                for value in extract(restaurant):
+                    positions[name].setdefault(value, []).append(position)
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            name: {value: positions_to_bitmap(rows, self.size) for value, rows in values.items()}
+            for name, values in positions.items()
+        }
+
+    def matchAny(self, facet: str, values: Iterable[str]) -> int:
+        """OR of the bitmaps of values within one facet (unknown values match nothing)."""
+        bitmap = 0
+        for value in values:
+            bitmap |= self.bitmaps[facet].get(value, 0)
+        return bitmap
+
+    def select(self, selections: Dict[str, List[str]]) -> Optional[int]:
+        """AND across facets; None when no facet is constrained."""
+        result = None
+        for facet, values in selections.items():
+            if not values:
+                continue
+            bitmap = self.matchAny(facet, values)
+            result = bitmap if result is None else result & bitmap
+        return result
+
+    @staticmethod
+    def selectionsFor(query: SearchQuery) -> Dict[str, List[str]]:
+        return {
+            "cuisines": query.cuisines,
+            "specialFlags": query.specialFlags,
+            "priceRange": [query.priceRange] if query.priceRange in ("low", "mid", "high") else [],
+            "dishType": query.dishTypes,
+            "flavorProfile": query.flavorProfiles,
+        }
+
+class OpenHoursIndex:
+    """
+    Open hours compiled once at load into minute-of-day (open, close) pairs,
+    plus an "open at minute m" bitmap that is rebuilt only when the minute
+    changes (a few recent minutes are kept for atTime queries).
+    """
+    CACHED_MINUTES = 4
+
+    def __init__(self, restaurants: List[Restaurant]):
+        self.schedules = [compile_open_hours(r.getOpenHours()) for r in restaurants]
+        self._bitmaps: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Minutes at which some restaurant opens or closes (closing takes
+        # effect the minute after close, since close is inclusive)
+        self.boundaries = sorted({
+            boundary for schedule in self.schedules if schedule is not None
+            for boundary in (schedule[0], (schedule[1] + 1) % (24 * 60))
+        })
+
+    def isOpenAt(self, position: int, minute: int) -> bool:
+        return HoursChecker.isOpenAt(self.schedules[position], minute)
+
+    def minutesUntilChange(self, minute: int) -> Optional[int]:
+        """Minutes until the next open/close boundary after `minute`; None if nothing ever changes."""
+        if not self.boundaries:
+            return None
+        index = bisect_right(self.boundaries, minute)
+        if index < len(self.boundaries):
+            return self.boundaries[index] - minute
+        return self.boundaries[0] + 24 * 60 - minute
+
+    def openBitmap(self, minute: int) -> int:
+        bitmap = self._bitmaps.get(minute)
+        if bitmap is None:
+            bitmap = positions_to_bitmap(
+                (p for p, schedule in enumerate(self.schedules)
+                 if HoursChecker.isOpenAt(schedule, minute)),
+                len(self.schedules)
+            )
+            with self._lock:
+                self._bitmaps[minute] = bitmap
+                while len(self._bitmaps) > self.CACHED_MINUTES:
+                    self._bitmaps.popitem(last=False)
+        return bitmap
+
+class ColumnarRestaurantStore:
+    """
+    Contiguous NumPy float columns over catalogue positions, so distance,
+    radius cut and rating sort are single vectorized expressions per request.
+    Categorical filters (cuisines, flags, price bucket) are answered earlier
+    by the FacetIndex bitmaps.
+    """
+
+    def __init__(self, restaurants: List[Restaurant]):
+        count = len(restaurants)
+        self.latitude = np.fromiter((r.getLatitude() for r in restaurants),
+                                    dtype=np.float64, count=count)
+        self.longitude = np.fromiter((r.getLongitude() for r in restaurants),
+                                     dtype=np.float64, count=count)
+        self.rating = np.fromiter((r.getRating() for r in restaurants),
+                                  dtype=np.float64, count=count)
+        self.averagePrice = np.fromiter((r.getAveragePrice() for r in restaurants),
+                                        dtype=np.float64, count=count)
+        self._derive()
+
+    @classmethod
+    def fromColumns(cls, latitude, longitude, rating, averagePrice) -> "ColumnarRestaurantStore":
+        """Store over existing float64 buffers (e.g. shared memory), without copying them."""
+        self = cls.__new__(cls)
+        self.latitude = np.frombuffer(latitude, dtype=np.float64)
+        self.longitude = np.frombuffer(longitude, dtype=np.float64)
+        self.rating = np.frombuffer(rating, dtype=np.float64)
+        self.averagePrice = np.frombuffer(averagePrice, dtype=np.float64)
+        self._derive()
+        return self
+
+    def _derive(self):
+        self.latitudeRad = np.radians(self.latitude)
+        self.longitudeRad = np.radians(self.longitude)
+        self.cosLatitude = np.cos(self.latitudeRad)
+
+    def distancesKm(self, center: Coordinates, positions) -> "np.ndarray":
+        """Haversine distance from center to each position, same formula as LocationService."""
+        lat1 = math.radians(center.latitude)
+        lon1 = math.radians(center.longitude)
+        d_lat = self.latitudeRad[positions] - lat1
+        d_lon = self.longitudeRad[positions] - lon1
+        a = np.sin(d_lat / 2) ** 2 + \
+            math.cos(lat1) * self.cosLatitude[positions] * np.sin(d_lon / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return LocationService.EARTH_RADIUS_KM * c
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Character trigrams of each word, padded like pg_trgm ('  w', ' wo', ...,
+    'rd '), so word starts weigh more and short words still get trigrams.
+    """
+    grams: Set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    """
+    Typo-tolerant lookup over diacritic-folded restaurant names and tags (the
+    tags carry the dish names). Each distinct folded term ('banh mi',
+    'pho le') is indexed once under its trigrams, with the restaurants that
+    use it as name or tag listed per term.
+
+    A term matches when it contains at least `threshold` of the query's
+    trigrams ("bahn mi" shares 5 of 8 with "banh mi"). By pigeonhole such a
+    term appears in at least one of the (len - need + 1) rarest posting
+    lists, so only those are scanned; the remaining lists are checked per
+    candidate with a binary search. Nothing is compared row by row.
+    """
+    FIELDS = ("name", "tags")
+
+    def __init__(self, restaurants: List[Restaurant]):
+        term_ids: Dict[str, int] = {}
+        owners: List[array] = []  # term id -> position << 1 | field code
+        for position, restaurant in enumerate(restaurants):
+            for field_code, values in enumerate(([restaurant.getName()], restaurant.getTags())):
+                for value in values:
+                    term = ' '.join(tokenize_text(fold_diacritics(value)))
+                    if not term:
+                        continue
+                    term_id = term_ids.get(term)
+                    if term_id is None:
+                        term_id = term_ids[term] = len(owners)
+                        owners.append(array('I'))
+                    owners[term_id].append(position << 1 | field_code)
+        # Term ids are appended in increasing order, so every posting list is sorted
+        postings: Dict[str, array] = {}
+        for term, term_id in term_ids.items():
+            for gram in trigrams(term):
+                postings.setdefault(gram, array('I')).append(term_id)
+        self.owners = PostingLists.pack(owners)
+        self.postings = PostingLists.packMapping(postings)
+
+    def sections(self) -> Dict[str, Tuple[str, object]]:
+        """The index as named (array type code, buffer) pairs, see fromSections."""
+        return {**self.owners.sections("trigram.owners"), **self.postings.sections("trigram.postings")}
+
+    @classmethod
+    def fromSections(cls, sections: Dict[str, memoryview]) -> "TrigramIndex":
+        """Index over stored sections (e.g. in shared memory), without copying them."""
+        self = cls.__new__(cls)
+        self.owners = PostingLists.fromSections(sections, "trigram.owners")
+        self.postings = PostingLists.fromSections(sections, "trigram.postings")
+        return self
+
+    def _matchingTerms(self, grams: Set[str], need: int) -> Dict[int, int]:
+        """Term id -> shared trigram count, for terms sharing at least `need`."""
+        lists = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        probe = len(lists) - need + 1
+        counts: Counter = Counter()
+        for posting in lists[:probe]:
+            counts.update(posting)
+        for i in range(probe, len(lists)):
+            posting, left = lists[i], len(lists) - i
+            if len(posting) <= 4 * len(counts):
+                # Counting the whole list (in C) is cheaper than probing each candidate;
+                # terms it adds were in no probed list, so they stay below `need`
+                counts.update(posting)
+                continue
+            for term_id, count in list(counts.items()):
+                if count + left < need:
+                    del counts[term_id]  # Cannot reach `need` any more
+                    continue
+                j = bisect_left(posting, term_id)
+                if j < len(posting) and posting[j] == term_id:
+                    counts[term_id] = count + 1
+        return {term_id: count for term_id, count in counts.items() if count >= need}
+
+    def search(self, queryText: str, threshold: float = TRIGRAM_THRESHOLD,
+               fields: Iterable[str] = FIELDS) -> List[Tuple[int, str, float]]:
+        """
+        Restaurants with a name or tag similar to the query, best first.
+        Returns: [(position, match_field, similarity)] ordered by similarity
+        descending, then position; similarity is the share of the query's
+        trigrams found in the matching term.
+        """
+        grams = trigrams(' '.join(tokenize_text(fold_diacritics(queryText or ""))))
+        field_codes = {self.FIELDS.index(f) for f in fields if f in self.FIELDS}
+        if not grams or not field_codes:
+            return []
+        need = max(1, math.ceil(threshold * len(grams) - 1e-9))
+
+        best: Dict[int, Tuple[float, int]] = {}
+        for term_id, count in self._matchingTerms(grams, need).items():
+            score = count / len(grams)
+            for owner in self.owners[term_id]:
+                position, field_code = owner >> 1, owner & 1
+                if field_code not in field_codes:
+                    continue
+                # Keep the best term per restaurant; on a tie the name wins
+                current = best.get(position)
+                if current is None or (score, -field_code) > (current[0], -current[1]):
+                    best[position] = (score, field_code)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(position, self.FIELDS[code], score) for position, (score, code) in ranked]
+
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+class AutocompleteIndex:
+    """
+    Prefix suggestions over restaurant names, tags, dish names (dishes.json)
+    and region names (regions.json). Every suggestion is keyed by its text
+    lowercased and diacritic-folded, from each word start, so "pho", "phở"
+    and "le" all reach "Phở Lệ".
+
+    The trie is laid out flat: keys sorted, so each trie node (prefix) is a
+    contiguous run found with two binary searches. Suggestions are numbered
+    best first - restaurants by rating, tags, dishes and regions by the best
+    restaurant they lead to, then by how many - so the answer for a node is
+    its smallest suggestion numbers. Nodes too big to scan (short prefixes)
+    store that answer precomputed; the rest are scanned.
+    """
+    SCAN_LIMIT = 64  # Largest node answered by scanning its keys
+
+    def __init__(self, restaurants: List[Restaurant], dishes_data: dict, regions_data: list):
+        # (rating, popularity, text, type, id, names to key it by) per suggestion
+        candidates: List[tuple] = []
+        by_tag: Dict[str, List[float]] = {}
+        for restaurant in restaurants:
+            candidates.append((restaurant.getRating(), 1, restaurant.getName(), "restaurant",
+                               restaurant.getId(), (restaurant.getName(),)))
+            for tag in restaurant.getTags():
+                by_tag.setdefault(tag, []).append(restaurant.getRating())
+        by_folded_tag: Dict[str, List[float]] = {}
+        for tag, ratings in by_tag.items():
+            candidates.append((max(ratings), len(ratings), tag, "tag", None, (tag,)))
+            by_folded_tag.setdefault(fold_diacritics(tag), []).extend(ratings)
+        for dish_id, dish in dishes_data.get('dishes', {}).items():
+            name = dish.get('name', '')
+            ratings = by_folded_tag.get(fold_diacritics(name), [])
+            candidates.append((max(ratings, default=0.0), len(ratings), name, "dish", dish_id, (name,)))
+        for region in regions_data:
+            names = (region.get('name', ''), region.get('nameEn', ''))
+            candidates.append((0.0, 0, names[0], "region", region.get('id'), names))
+        candidates.sort(key=lambda c: (-c[0], -c[1], c[2]))
+
+        payloads: List[str] = []
+        pairs: List[Tuple[str, int]] = []
+        for number, (_, _, text, kind, ref, names) in enumerate(candidates):
+            payload = {"text": text, "type": kind}
+            if ref is not None:
+                payload["id"] = ref
+            payloads.append(dump_json_bytes(payload).decode('utf-8'))
+            for key in self._keysFor(names):
+                pairs.append((key, number))
+        pairs.sort()
+        self.payloads = PackedStrings.pack(payloads)
+        self.keys: Sequence[str] = [key for key, _ in pairs]
+        self.numbers = array('I', (number for _, number in pairs))
+        precomputed: Dict[str, List[int]] = {}
+        self._precompute(0, len(self.keys), 1, precomputed)
+        self.precomputed = PostingLists.packMapping(precomputed)
+        self.keys = PackedStrings.pack(self.keys)
+
+    def sections(self) -> Dict[str, Tuple[str, object]]:
+        """The index as named (array type code, buffer) pairs, see fromSections."""
+        return {**self.payloads.sections("autocomplete.payloads"),
+                **self.keys.sections("autocomplete.keys"),
+                "autocomplete.numbers": ("I", self.numbers),
+                **self.precomputed.sections("autocomplete.precomputed")}
+
+    @classmethod
+    def fromSections(cls, sections: Dict[str, memoryview]) -> "AutocompleteIndex":
+        """Index over stored sections (e.g. in shared memory), without copying them."""
+        self = cls.__new__(cls)
+        self.payloads = PackedStrings.fromSections(sections, "autocomplete.payloads")
+        self.keys = PackedStrings.fromSections(sections, "autocomplete.keys")
+        self.numbers = sections["autocomplete.numbers"]
+        self.precomputed = PostingLists.fromSections(sections, "autocomplete.precomputed")
+        return self
+
+    @staticmethod
+    def _keysFor(names: Iterable[str]) -> Set[str]:
+        keys: Set[str] = set()
+        for name in names:
+            for words in (tokenize_text(name), tokenize_text(fold_diacritics(name))):
+                keys.update(' '.join(words[i:]) for i in range(len(words)))
+        return keys
+
+    def _best(self, lo: int, hi: int, limit: int) -> List[int]:
+        return heapq.nsmallest(limit, set(self.numbers[lo:hi]))
+
+    def _precompute(self, lo: int, hi: int, depth: int, precomputed: Dict[str, List[int]]):
+        """Store the answer of every node below keys[lo:hi] holding more than SCAN_LIMIT keys."""
+        i = lo
+        while i < hi and len(self.keys[i]) < depth:
+            i += 1  # Keys that end at the parent node have no child to visit
+        while i < hi:
+            prefix = self.keys[i][:depth]
+            end = bisect_left(self.keys, prefix + '\uffff', i, hi)
+            if end - i > self.SCAN_LIMIT:
+                precomputed[prefix] = self._best(i, end, AUTOCOMPLETE_MAX_LIMIT)
+                self._precompute(i, end, depth + 1, precomputed)
+            i = end
+
+    def suggest(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[JSONFragment]:
+        """Best `limit` suggestions whose text (or a word in it) starts with `prefix`."""
+        prefix = ' '.join(tokenize_text(prefix or "")) + (' ' if prefix[-1:].isspace() else '')
+        if not prefix.strip():
+            return []
+        numbers = self.precomputed.get(prefix)
+        if numbers is None:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + '\uffff', lo)
+            numbers = self._best(lo, hi, limit)
+        return [JSONFragment(self.payloads.raw(n)) for n in numbers[:limit]]
+
+# ----------------------------------------------------------------------------
+# RESTAURANT CATALOGUES (storage backends)
+# ----------------------------------------------------------------------------
+
+DATA_DIR = 'data'
+RESTAURANTS_FILE = 'restaurants.json'
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'json')  # 'json', 'sqlite' or 'sharded'
+SQLITE_FILE = 'restaurants.db'
+SQLITE_SCHEMA_VERSION = 1
+SHARD_DIR = 'shards'
+SHARD_MANIFEST = 'manifest.json'
+SHARD_ASSIGNMENT = 'assignment.bin'
+SHARD_INDEX = 'index.snap'
+SHARD_FORMAT_VERSION = 2
+SHARD_IDLE_SECONDS = float(os.environ.get('SHARD_IDLE_SECONDS', '600'))  # Unused this long -> released
+SHARD_SWEEP_INTERVAL = 30.0  # Seconds between idle checks
+
+def top_positions(positions: Iterable[int], key: Callable[[int], tuple],
+                  limit: Optional[int]) -> List[int]:
+    """positions sorted by key, only the first `limit` when given."""
+    return sorted(positions, key=key) if limit is None else heapq.nsmallest(limit, positions, key=key)
+
+class RestaurantCatalogue(ABC):
+    """
+    Storage backend for the restaurant catalogue. Rows are addressed by
+    position (0 .. len - 1), the key every index uses; a backend serves rows
+    by position, iterates them in position order and supplies the spatial and
+    text indexes for its storage. Slicing returns a list.
+    """
+    backend = ""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def __getitem__(self, position):
+        ...
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[Restaurant]:
+        ...
+
+    @abstractmethod
+    def getById(self, restaurantId: int) -> Optional[Restaurant]:
+        ...
+
+    @abstractmethod
+    def topRated(self, limit: int, maxPrice: Optional[float] = None) -> List[Restaurant]:
+        """Best-rated restaurants (ties in catalogue order), optionally priced at most maxPrice."""
+
+    def rankByRating(self, positions: Iterable[int], limit: Optional[int] = None) -> List[int]:
+        """positions ordered best-rated first (ties in catalogue order), the first `limit` of them."""
+        return top_positions(positions, lambda p: (-self[p].getRating(), p), limit)
+
+    @abstractmethod
+    def priceSummary(self) -> Optional[Tuple[float, float, float]]:
+        """(min, average, max) of the known (positive) average prices; None without any."""
+
+    @abstractmethod
+    def createSpatialIndex(self):
+        """Index with candidatePositions(center, radiusKm), like SpatialGridIndex."""
+
+    @abstractmethod
+    def createTextIndex(self):
+        """Index with search(queryText, fields), like TextSearchIndex."""
+
+    def createColumnarStore(self) -> ColumnarRestaurantStore:
+        return ColumnarRestaurantStore(self)
+
+    def createTrigramIndex(self) -> TrigramIndex:
+        return TrigramIndex(self.indexSource())
+
+    def createAutocompleteIndex(self, dishes_data: dict, regions_data: list) -> AutocompleteIndex:
+        return AutocompleteIndex(self.indexSource(), dishes_data, regions_data)
+
+    def indexSource(self) -> "RestaurantCatalogue":
+        """Rows the search indexes are built from: the catalogue itself, or a
+        lighter stand-in with the same positions and indexed fields."""
+        return self
+
+    def stats(self) -> dict:
+        """Backend details for /api/admin/data."""
+        return {}
+
+class ListCatalogue(list, RestaurantCatalogue):
+    """
+    The default backend: every Restaurant in memory, loaded from the JSON (or
+    its snapshot). A list subclass, so indexing stays at C speed in the hot
+    search loops.
+    """
+    backend = "json"
+
+    def __init__(self, restaurants: Iterable[Restaurant]):
+        super().__init__(restaurants)
+        self._byId = {restaurant.getId(): restaurant for restaurant in self}
+
+    def getById(self, restaurantId: int) -> Optional[Restaurant]:
+        return self._byId.get(restaurantId)
+
+    def topRated(self, limit: int, maxPrice: Optional[float] = None) -> List[Restaurant]:
+        rows = self if maxPrice is None else (r for r in self if r.getAveragePrice() <= maxPrice)
+        return heapq.nlargest(limit, rows, key=lambda r: r.getRating())
+
+    def priceSummary(self) -> Optional[Tuple[float, float, float]]:
+        prices = [r.getAveragePrice() for r in self if r.getAveragePrice() > 0]
+        if not prices:
+            return None
+        return min(prices), sum(prices) / len(prices), max(prices)
+
+    def createSpatialIndex(self) -> SpatialGridIndex:
+        return SpatialGridIndex(self)
+
+    def createTextIndex(self) -> TextSearchIndex:
+        return TextSearchIndex(self)
+
+SQLITE_COLUMNS = ("position", "id", "name", "rating", "averagePrice", "cuisines", "tags",
+                  "openHours", "specialFlags", "latitude", "longitude", "image_url",
+                  "distance_text", "price_text", "address", "dishType", "flavorProfile", "json")
+SQLITE_LIST_COLUMNS = ("cuisines", "tags", "specialFlags", "dishType", "flavorProfile")
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE restaurants (
+    position INTEGER PRIMARY KEY,  -- 0-based catalogue position, the key of every index
+    id INTEGER NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    rating REAL NOT NULL,
+    averagePrice NUMERIC NOT NULL,
+    cuisines TEXT NOT NULL,        -- JSON arrays
+    tags TEXT NOT NULL,
+    openHours TEXT NOT NULL,
+    specialFlags TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    image_url TEXT NOT NULL,
+    distance_text TEXT NOT NULL,
+    price_text TEXT NOT NULL,
+    address TEXT NOT NULL,
+    dishType TEXT NOT NULL,
+    flavorProfile TEXT NOT NULL,
+    json BLOB NOT NULL             -- Restaurant.to_json(), encoded at migration
+);
+CREATE INDEX restaurants_rating ON restaurants (rating DESC, position);
+CREATE INDEX restaurants_price ON restaurants (averagePrice);
+CREATE VIRTUAL TABLE restaurants_rtree USING rtree (position, minLat, maxLat, minLon, maxLon);
+CREATE VIRTUAL TABLE restaurants_fts USING fts5 (
+    {", ".join(TextSearchIndex.FIELDS)},
+    {", ".join(field + "_folded" for field in TextSearchIndex.FIELDS)},
+    content='', prefix='2 3', tokenize='unicode61 remove_diacritics 0'
+);
+"""
+
+def write_sqlite_catalogue(restaurants: Iterable[Restaurant], db_path: str) -> int:
+    """
+    Write restaurants into a new SQLite catalogue at db_path, replacing any
+    existing file atomically. Returns the number of rows written.
+    """
+    temp_path = db_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.executescript(SQLITE_SCHEMA)
+        count = 0
+        for position, restaurant in enumerate(restaurants):
+            values = [position] + [getattr(restaurant, column) for column in SQLITE_COLUMNS[1:-1]]
+            values = [json.dumps(list(value), ensure_ascii=False) if isinstance(value, tuple)
+                      else value for value in values]
+            connection.execute(
+                f"INSERT INTO restaurants VALUES ({', '.join('?' * len(SQLITE_COLUMNS))})",
+                values + [restaurant.to_json().raw])
+            connection.execute("INSERT INTO restaurants_rtree VALUES (?, ?, ?, ?, ?)",
+                               (position, restaurant.latitude, restaurant.latitude,
+                                restaurant.longitude, restaurant.longitude))
+            # The FTS columns hold the same tokens TextSearchIndex would index
+            texts = {
+                "name": [restaurant.getName()],
+                "tags": restaurant.getTags(),
+                "cuisines": restaurant.getCuisines(),
+                "address": [restaurant.getAddress()],
+            }
+            tokens = [[token for value in texts[field] for token in tokenize_text(value)]
+                      for field in TextSearchIndex.FIELDS]
+            connection.execute(
+                f"INSERT INTO restaurants_fts (rowid, {', '.join(TextSearchIndex.FIELDS)}, "
+                f"{', '.join(field + '_folded' for field in TextSearchIndex.FIELDS)}) "
+                f"VALUES ({', '.join('?' * (1 + 2 * len(TextSearchIndex.FIELDS)))})",
+                [position] + [' '.join(field_tokens) for field_tokens in tokens]
+                + [' '.join(fold_diacritics(token) for token in field_tokens) for field_tokens in tokens])
+            count += 1
+        connection.execute("INSERT INTO meta VALUES ('schema_version', ?)", (str(SQLITE_SCHEMA_VERSION),))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, db_path)
+    return count
+
+class SqliteCatalogue(RestaurantCatalogue):
+    """
+    Catalogue kept in a SQLite file (see write_sqlite_catalogue) and read on
+    demand, so workers do not each hold every Restaurant. Radius and bounding
+    box lookups go through an R*Tree table, text through FTS5, and rating and
+    price queries through ordinary indexes. Recently used rows are cached.
+    The file is opened read-only through a small per-process connection pool.
+    """
+    backend = "sqlite"
+    ROW_CACHE_SIZE = 4096
+
+    def __init__(self, db_path: str):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"'{db_path}' not found; create it with tools/migrate_to_sqlite.py")
+        self.path = db_path
+        self._pool: "queue.SimpleQueue[sqlite3.Connection]" = queue.SimpleQueue()
+        self._poolPid = os.getpid()
+        version = self.query("SELECT value FROM meta WHERE key = 'schema_version'")
+        if not version or int(version[0][0]) != SQLITE_SCHEMA_VERSION:
+            raise ValueError(f"'{db_path}' is not a version {SQLITE_SCHEMA_VERSION} catalogue")
+        self._size = self.query("SELECT COUNT(*) FROM restaurants")[0][0]
+        self._cachedRow = lru_cache(maxsize=self.ROW_CACHE_SIZE)(self._fetchRow)
+
+    def _acquire(self) -> sqlite3.Connection:
+        # Pooled connections must not cross a fork: a forked worker starts its own pool
+        if self._poolPid != os.getpid():
+            self._pool, self._poolPid = queue.SimpleQueue(), os.getpid()
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            uri = "file:" + urllib.parse.quote(os.path.abspath(self.path)) + "?mode=ro"
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def query(self, sql: str, parameters: tuple = ()) -> list:
+        connection = self._acquire()
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            self._pool.put(connection)
+
+    @staticmethod
+    def _restaurant(row: tuple) -> Restaurant:
+        fields = dict(zip(SQLITE_COLUMNS, row))
+        del fields["position"]
+        raw = fields.pop("json")
+        for column in SQLITE_LIST_COLUMNS:
+            fields[column] = intern_strings(json.loads(fields[column]))
+        for column in ("openHours", "price_text"):
+            fields[column] = sys.intern(fields[column])
+        restaurant = Restaurant.from_compact(**fields)
+        restaurant.set_json(bytes(raw))
+        return restaurant
+
+    def _fetchRow(self, position: int) -> Restaurant:
+        rows = self.query(f"SELECT {', '.join(SQLITE_COLUMNS)} FROM restaurants WHERE position = ?",
+                           (position,))
+        if not rows:
+            raise IndexError("catalogue position out of range")
+        return self._restaurant(rows[0])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._cachedRow(p) for p in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("catalogue position out of range")
+        return self._cachedRow(position)
+
+    def __iter__(self) -> Iterator[Restaurant]:
+        # Streams rows without filling the cache
+        connection = self._acquire()
+        try:
+            cursor = connection.execute(
+                f"SELECT {', '.join(SQLITE_COLUMNS)} FROM restaurants ORDER BY position")
+            for row in cursor:
+                yield self._restaurant(row)
+        finally:
+            self._pool.put(connection)
+
+    def getById(self, restaurantId: int) -> Optional[Restaurant]:
+        rows = self.query("SELECT position FROM restaurants WHERE id = ?", (restaurantId,))
+        return self._cachedRow(rows[0][0]) if rows else None
+
+    def topRated(self, limit: int, maxPrice: Optional[float] = None) -> List[Restaurant]:
+        if maxPrice is None:
+            rows = self.query("SELECT position FROM restaurants ORDER BY rating DESC, position "
+                               "LIMIT ?", (limit,))
+        else:
+            rows = self.query("SELECT position FROM restaurants WHERE averagePrice <= ? "
+                               "ORDER BY rating DESC, position LIMIT ?", (maxPrice, limit))
+        return [self._cachedRow(row[0]) for row in rows]
+
+    def rankByRating(self, positions: Iterable[int], limit: Optional[int] = None) -> List[int]:
+        rows = self.query("SELECT position FROM restaurants WHERE position IN "
+                          "(SELECT value FROM json_each(?)) ORDER BY rating DESC, position LIMIT ?",
+                          (json.dumps(list(positions)), -1 if limit is None else limit))
+        return [row[0] for row in rows]
+
+    def priceSummary(self) -> Optional[Tuple[float, float, float]]:
+        low, average, high = self.query(
+            "SELECT MIN(averagePrice), AVG(averagePrice), MAX(averagePrice) "
+            "FROM restaurants WHERE averagePrice > 0")[0]
+        return None if average is None else (low, average, high)
+
+    def createSpatialIndex(self) -> "SqliteSpatialIndex":
+        return SqliteSpatialIndex(self)
+
+    def createTextIndex(self) -> "SqliteTextIndex":
+        return SqliteTextIndex(self)
+
+class SqliteSpatialIndex:
+    """candidatePositions() from the R*Tree: every row inside the circle's bounding box."""
+
+    def __init__(self, catalogue: SqliteCatalogue, locationService: Optional[LocationService] = None):
+        self.catalogue = catalogue
+        self.locationService = locationService or LocationService()
+
+    def candidatePositions(self, center: Coordinates, radiusKm: Optional[float]) -> List[int]:
+        box = self.locationService.boundingBox(center, radiusKm) if radiusKm else None
+        if box is None:
+            return list(range(len(self.catalogue)))
+        min_lat, max_lat, min_lon, max_lon = box
+        rows = self.catalogue.query(
+            "SELECT position FROM restaurants_rtree WHERE maxLat >= ? AND minLat <= ? "
+            "AND maxLon >= ? AND minLon <= ? ORDER BY position",
+            (min_lat, max_lat, min_lon, max_lon))
+        return [row[0] for row in rows]
+
+class SqliteTextIndex:
+    """
+    search() through FTS5 with TextSearchIndex's semantics: accented tokens
+    match the accented columns, plain ones the folded columns, tokens are
+    prefixes except numbers, and every token must match one of the fields.
+    """
+
+    def __init__(self, catalogue: SqliteCatalogue):
+        self.catalogue = catalogue
+
+    @staticmethod
+    def _tokenExpression(token: str, fields: Tuple[str, ...]) -> str:
+        folded = fold_diacritics(token) == token
+        columns = [field + "_folded" if folded else field for field in fields]
+        phrase = '"' + token.replace('"', '""') + '"'
+        return "{" + " ".join(columns) + "} : " + phrase + ("" if token.isdigit() else " *")
+
+    def search(self, queryText: str, fields: Iterable[str]) -> Optional[Set[int]]:
+        tokens = tokenize_text(queryText or "")
+        if not tokens:
+            return None
+        fields = tuple(fields)
+        expression = " AND ".join(self._tokenExpression(token, fields) for token in sorted(set(tokens)))
+        rows = self.catalogue.query(
+            "SELECT rowid FROM restaurants_fts WHERE restaurants_fts MATCH ?", (expression,))
+        return {row[0] for row in rows}
+
+# ----------------------------------------------------------------------------
+# SHARED MEMORY CATALOGUE (one copy for all worker processes)
+# ----------------------------------------------------------------------------
+# With serve(sharedMemory=True) the loader (parent) process compiles the
+# catalogue into a snapshot image (see BINARY SNAPSHOT) held in a POSIX shared
+# memory segment "<prefix>-<generation>". An 8-byte segment
+# "<prefix>-generation" holds the generation currently published. Workers map
+# both read-only by name. A new generation is written in full before the
+# counter moves to it; the previous segment is then unlinked, and workers
+# still reading it keep their mapping until they let go of it.
+# SnapshotCatalogue reads any mapped snapshot image; region shards also use
+# it for their index-only snapshot.
+# Next to it, "<prefix>-<generation>-indexes" holds the text, trigram and
+# autocomplete indexes, which are flat arrays (see PostingLists) built once
+# by the loader. Layout: header SHARED_INDEX_HEADER (magic, directory size),
+# a JSON directory {"meta": ..., "sections": {name: [type code, offset,
+# length]}}, then the arrays, each aligned to 8 bytes. The spatial grid,
+# facet and opening hours indexes (about 1 MB per 20k restaurants together)
+# are still built by each worker.
+
+SHARED_MEMORY_DIR = "/dev/shm"  # Where shm_open() names are visible on Linux
+SHARED_GENERATION = struct.Struct("<Q")
+SHARED_POLL_INTERVAL = 1.0  # Seconds between a worker's generation checks
+VOCABULARY_CACHE_SIZE = 16384
+SHARED_INDEX_MAGIC = b"CCINDEX\x00"
+SHARED_INDEX_HEADER = struct.Struct("<8sQ")
+
+def map_shared_segment(name: str) -> mmap.mmap:
+    """Map an existing shared memory segment read-only."""
+    with open(os.path.join(SHARED_MEMORY_DIR, name), "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def compile_index_image(sections: Dict[str, Tuple[str, object]],
+                        meta: dict) -> Tuple[int, List[Tuple[int, memoryview]]]:
+    """
+    The image of named arrays (e.g. TextSearchIndex.sections()) as (total
+    size, [(offset, buffer)]), like compile_snapshot.
+    """
+    buffers = {name: (code, memoryview(buffer).cast("B")) for name, (code, buffer) in sections.items()}
+    layout, offset = {}, 0
+    for name, (code, buffer) in buffers.items():
+        offset += -offset % 8
+        layout[name] = [code, offset, len(buffer)]
+        offset += len(buffer)
+    directory = dump_json_bytes({"meta": meta, "sections": layout})
+    start = SHARED_INDEX_HEADER.size + len(directory)
+    start += -start % 8
+    chunks = [(0, memoryview(SHARED_INDEX_HEADER.pack(SHARED_INDEX_MAGIC, len(directory)) + directory))]
+    chunks += [(start + layout[name][1], buffer) for name, (_, buffer) in buffers.items()]
+    return start + offset, chunks
+
+def index_image_sections(buffer, label: str) -> Tuple[dict, Dict[str, memoryview]]:
+    """The meta and the section views of an index image. Raises ValueError for anything else."""
+    view = memoryview(buffer)
+    sections = {}
+    try:
+        magic, length = SHARED_INDEX_HEADER.unpack_from(view, 0)
+        if magic != SHARED_INDEX_MAGIC:
+            raise ValueError(f"'{label}' is not an index image")
+        directory = json.loads(bytes(view[SHARED_INDEX_HEADER.size:SHARED_INDEX_HEADER.size + length]))
+        start = SHARED_INDEX_HEADER.size + length
+        start += -start % 8
+        for name, (code, offset, size) in directory["sections"].items():
+            if start + offset + size > len(view):
+                raise ValueError(f"'{label}' is truncated")
+            sections[name] = view[start + offset:start + offset + size].cast(code)
+    except (ValueError, KeyError, struct.error):
+        for section in sections.values():
+            section.release()
+        raise
+    finally:
+        view.release()
+    return directory["meta"], sections
+
+def autocomplete_inputs_digest(dishes_data: dict, regions_data: list) -> str:
+    """Fingerprint of the dishes and regions an autocomplete index was built with."""
+    return hashlib.sha1(dump_json_bytes([dishes_data, regions_data])).hexdigest()
+
+class SnapshotCatalogue(RestaurantCatalogue):
+    """
+    Catalogue read in place from a mapped snapshot image. Numeric columns are
+    used as zero-copy arrays, and rows are decoded on demand (recently used
+    ones cached), so no process holds a Restaurant per row.
+    """
+    backend = "snapshot"
+    ROW_CACHE_SIZE = 4096
+
+    def __init__(self, mapped: mmap.mmap, label: str):
+        self._mapped = mapped
+        self._size, self._columns = snapshot_columns(mapped, label)
+        ids = self._columns["id"]
+        self._idOrder = array('I', sorted(range(self._size), key=ids.__getitem__))
+        self._cachedRow = lru_cache(maxsize=self.ROW_CACHE_SIZE)(self._decodeRow)
+        # Tags, cuisines, hours etc. come from a small vocabulary reused across rows
+        self._word = lru_cache(maxsize=VOCABULARY_CACHE_SIZE)(self._internedText)
+
+    def _text(self, index: int) -> str:
+        offsets = self._columns["strings"]
+        return str(self._columns["string_data"][offsets[index]:offsets[index + 1]], "utf-8")
+
+    def _internedText(self, index: int) -> str:
+        return sys.intern(self._text(index))
+
+    def _decodeRow(self, position: int) -> Restaurant:
+        columns = self._columns
+        fields = {name: columns[name][position] for name, _ in SNAPSHOT_NUMERIC_FIELDS}
+        if fields["averagePrice"].is_integer():
+            fields["averagePrice"] = int(fields["averagePrice"])
+        for name in SNAPSHOT_STRING_FIELDS:
+            decode = self._word if name in ("openHours", "price_text") else self._text
+            fields[name] = decode(columns[name][position])
+        for name in SNAPSHOT_LIST_FIELDS:
+            offsets, items = columns[name + ".offsets"], columns[name + ".items"]
+            fields[name] = tuple(map(self._word, items[offsets[position]:offsets[position + 1]]))
+        restaurant = Restaurant.from_compact(**fields)
+        json_offsets = columns["json"]
+        if json_offsets[position] != json_offsets[position + 1]:  # None in index-only snapshots
+            restaurant.set_json(bytes(columns["json_data"][json_offsets[position]:json_offsets[position + 1]]))
+        return restaurant
+
+    def column(self, name: str) -> memoryview:
+        """A numeric column (SNAPSHOT_NUMERIC_FIELDS) in position order, read in place."""
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._cachedRow(p) for p in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("catalogue position out of range")
+        return self._cachedRow(position)
+
+    def __iter__(self) -> Iterator[Restaurant]:
+        # Streams rows without filling the cache
+        return map(self._decodeRow, range(self._size))
+
+    def getById(self, restaurantId: int) -> Optional[Restaurant]:
+        ids = self._columns["id"]
+        i = bisect_left(self._idOrder, restaurantId, key=ids.__getitem__)
+        if i < self._size and ids[self._idOrder[i]] == restaurantId:
+            return self._cachedRow(self._idOrder[i])
+        return None
+
+    def topRated(self, limit: int, maxPrice: Optional[float] = None) -> List[Restaurant]:
+        ratings, prices = self._columns["rating"], self._columns["averagePrice"]
+        positions = range(self._size) if maxPrice is None else \
+            (p for p in range(self._size) if prices[p] <= maxPrice)
+        return [self._cachedRow(p) for p in heapq.nlargest(limit, positions, key=ratings.__getitem__)]
+
+    def rankByRating(self, positions: Iterable[int], limit: Optional[int] = None) -> List[int]:
+        ratings = self._columns["rating"]
+        return top_positions(positions, lambda p: (-ratings[p], p), limit)
+
+    def priceSummary(self) -> Optional[Tuple[float, float, float]]:
+        prices = [int(p) if p.is_integer() else p for p in self._columns["averagePrice"] if p > 0]
+        if not prices:
+            return None
+        return min(prices), sum(prices) / len(prices), max(prices)
+
+    def createSpatialIndex(self) -> SpatialGridIndex:
+        return SpatialGridIndex(self)
+
+    def createTextIndex(self) -> TextSearchIndex:
+        return TextSearchIndex(self)
+
+    def createColumnarStore(self) -> ColumnarRestaurantStore:
+        columns = self._columns
+        return ColumnarRestaurantStore.fromColumns(
+            columns["latitude"], columns["longitude"], columns["rating"], columns["averagePrice"])
+
+class SharedCatalogue(SnapshotCatalogue):
+    """
+    SnapshotCatalogue over a shared memory segment published by the loader,
+    with the text, trigram and autocomplete indexes read from its companion
+    index segment instead of built.
+    """
+    backend = "shared"
+
+    def __init__(self, mapped: mmap.mmap, indexes: mmap.mmap, generation: int):
+        super().__init__(mapped, f"shared catalogue {generation}")
+        self.generation = generation
+        self._indexMapping = indexes
+        self._indexMeta, self._indexSections = index_image_sections(
+            indexes, f"shared indexes {generation}")
+
+    def createTextIndex(self) -> TextSearchIndex:
+        return TextSearchIndex.fromSections(self._indexSections)
+
+    def createTrigramIndex(self) -> TrigramIndex:
+        return TrigramIndex.fromSections(self._indexSections)
+
+    def createAutocompleteIndex(self, dishes_data: dict, regions_data: list) -> AutocompleteIndex:
+        if self._indexMeta.get("autocompleteInputs") != autocomplete_inputs_digest(dishes_data, regions_data):
+            # This worker read newer dishes or regions than the loader published
+            return super().createAutocompleteIndex(dishes_data, regions_data)
+        return AutocompleteIndex.fromSections(self._indexSections)
+
+    def stats(self) -> dict:
+        return {"sharedGeneration": self.generation}
+
+class SharedCataloguePublisher:
+    """Loader side: writes catalogue generations into shared memory."""
+
+    def __init__(self, prefix: Optional[str] = None):
+        self.prefix = prefix or f"culinary-{os.getpid()}"
+        self.generation = 0
+        self._segments: List[shared_memory.SharedMemory] = []
+        self._control = shared_memory.SharedMemory(
+            f"{self.prefix}-generation", create=True, size=SHARED_GENERATION.size)
+        SHARED_GENERATION.pack_into(self._control.buf, 0, 0)
+
+    @staticmethod
+    def _writeSegment(name: str, size: int, chunks: List[Tuple[int, object]]) -> shared_memory.SharedMemory:
+        segment = shared_memory.SharedMemory(name, create=True, size=size)
+        try:
+            for offset, buffer in chunks:
+                segment.buf[offset:offset + len(buffer)] = buffer
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+        segment.close()  # The loader only needs the name from here on
+        return segment
+
+    def publish(self, restaurants: RestaurantCatalogue, dishes_data: dict, regions_data: list) -> int:
+        """Publish restaurants and their shared indexes as the next generation and return its number."""
+        generation = self.generation + 1
+        size, chunks = compile_snapshot(restaurants)
+        segments = [self._writeSegment(f"{self.prefix}-{generation}", size, chunks)]
+        try:
+            rows = restaurants.indexSource()
+            sections = {**TextSearchIndex(rows).sections(), **TrigramIndex(rows).sections(),
+                        **AutocompleteIndex(rows, dishes_data, regions_data).sections()}
+            meta = {"autocompleteInputs": autocomplete_inputs_digest(dishes_data, regions_data)}
+            size, chunks = compile_index_image(sections, meta)
+            segments.append(self._writeSegment(f"{self.prefix}-{generation}-indexes", size, chunks))
+        except BaseException:
+            segments[0].unlink()
+            raise
+        SHARED_GENERATION.pack_into(self._control.buf, 0, generation)
+        for segment in self._segments:
+            segment.unlink()
+        self._segments, self.generation = segments, generation
+        return generation
+
+    def close(self):
+        """Unlink every segment; workers' existing mappings stay valid."""
+        for segment in self._segments:
+            segment.unlink()
+        self._segments = []
+        self._control.close()
+        self._control.unlink()
+
+class SharedCatalogueReader:
+    """Worker side: follows the loader's generation counter."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.loaderPid = os.getpid()  # Created by the loader before it forks
+        self._control = map_shared_segment(f"{prefix}-generation")
+
+    def generation(self) -> int:
+        return SHARED_GENERATION.unpack_from(self._control, 0)[0]
+
+    def attach(self) -> SharedCatalogue:
+        """The catalogue of the current generation."""
+        generation = self.generation()
+        while True:
+            try:
+                mapped = map_shared_segment(f"{self.prefix}-{generation}")
+                try:
+                    indexes = map_shared_segment(f"{self.prefix}-{generation}-indexes")
+                except BaseException:
+                    mapped.close()
+                    raise
+                return SharedCatalogue(mapped, indexes, generation)
+            except FileNotFoundError:
+                # Superseded (and unlinked) between reading the counter and mapping it
+                latest = self.generation()
+                if latest == generation:
+                    raise
+                generation = latest
+
+# ----------------------------------------------------------------------------
+# REGION SHARDS (DATA_BACKEND=sharded)
+# ----------------------------------------------------------------------------
+# tools/build_shards.py assigns every restaurant to the region of regions.json
+# whose coordinates are nearest and writes data/shards/:
+#   <region>.snap    the region's restaurants, a snapshot in catalogue order
+#   assignment.bin   the shard number of each catalogue position (uint16)
+#   index.snap       every restaurant, index-only (no display strings or JSON)
+#   manifest.json    per shard: region, center, radius (farthest member), count
+# Startup reads only the assignment and index.snap: ids, ratings, prices and
+# coordinates are its mapped columns, and the search indexes are built from
+# its rows. A shard's rows are loaded on first use and released after
+# SHARD_IDLE_SECONDS without use; radius queries only reach the shards their
+# circle overlaps.
+
+def write_region_shards(restaurants: Iterable[Restaurant], regions: List[dict],
+                        shard_dir: str) -> Dict[str, int]:
+    """
+    Partition restaurants by nearest region center into shard_dir. The
+    manifest is replaced last, so readers see either the old or the new set.
+    Returns the number of restaurants per region.
+    """
+    centers = [(region['id'], region.get('name', region['id']),
+                Coordinates(region['coordinates']['lat'], region['coordinates']['lng']))
+               for region in regions if region.get('coordinates')]
+    if not centers:
+        raise ValueError("No region coordinates to shard by")
+    location_service = LocationService()
+    assignment = array('H')
+    catalogue = list(restaurants)
+    members: List[List[Restaurant]] = [[] for _ in centers]
+    radii = [0.0] * len(centers)
+    for restaurant in catalogue:
+        location = restaurant.getLocation()
+        distances = [location_service.calculateDistance(location, center) for _, _, center in centers]
+        shard = min(range(len(centers)), key=distances.__getitem__)
+        assignment.append(shard)
+        members[shard].append(restaurant)
+        radii[shard] = max(radii[shard], distances[shard])
+
+    os.makedirs(shard_dir, exist_ok=True)
+    write_snapshot(catalogue, os.path.join(shard_dir, SHARD_INDEX), indexOnly=True)
+    manifest = {"version": SHARD_FORMAT_VERSION, "count": len(assignment), "shards": []}
+    for (region_id, name, center), rows, radius in zip(centers, members, radii):
+        file_name = f"{region_id}.snap"
+        write_snapshot(rows, os.path.join(shard_dir, file_name))
+        manifest["shards"].append({"region": region_id, "name": name, "latitude": center.latitude,
+                                   "longitude": center.longitude, "radiusKm": radius,
+                                   "count": len(rows), "file": file_name})
+    for name, content in ((SHARD_ASSIGNMENT, assignment.tobytes()),
+                          (SHARD_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8'))):
+        temp_path = os.path.join(shard_dir, name + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, os.path.join(shard_dir, name))
+    return {region_id: len(rows) for (region_id, _, _), rows in zip(centers, members)}
+
+class RegionShard:
+    """One region of a ShardedCatalogue. `resident` is (rows, grid) while loaded, else None."""
+
+    def __init__(self, entry: dict, path: str):
+        self.regionId = entry["region"]
+        self.name = entry.get("name", self.regionId)
+        self.center = Coordinates(entry["latitude"], entry["longitude"])
+        self.radiusKm = entry["radiusKm"]
+        self.path = path
+        self.positions = array('I')  # Catalogue positions of the shard's rows, ascending
+        self.resident: Optional[Tuple[List[Restaurant], SpatialGridIndex]] = None
+        self.lastUsed = 0.0
+        self.loads = 0
+
+class ShardedCatalogue(RestaurantCatalogue):
+    """
+    Catalogue split into region shards (see write_region_shards). Positions
+    keep catalogue order; each maps to a shard and an offset in it. Ids,
+    ratings, prices and coordinates are read in place from the index-only
+    snapshot, which the search indexes are built from too, so no shard is
+    loaded until a query or lookup returns one of its rows.
+    """
+    backend = "sharded"
+
+    def __init__(self, shard_dir: str):
+        manifest_path = os.path.join(shard_dir, SHARD_MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"'{manifest_path}' not found; create it with tools/build_shards.py")
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SHARD_FORMAT_VERSION:
+            raise ValueError(f"'{manifest_path}' is not a version {SHARD_FORMAT_VERSION} shard manifest")
+        self._shardOf = array('H')
+        with open(os.path.join(shard_dir, SHARD_ASSIGNMENT), "rb") as f:
+            self._shardOf.frombytes(f.read())
+        self._size = len(self._shardOf)
+        self.shards = [RegionShard(entry, os.path.join(shard_dir, entry["file"]))
+                       for entry in manifest["shards"]]
+        self._offsetOf = array('I', bytes(4 * self._size))
+        for position, shard_number in enumerate(self._shardOf):
+            shard = self.shards[shard_number]
+            self._offsetOf[position] = len(shard.positions)
+            shard.positions.append(position)
+        if self._size != manifest["count"] or \
+                any(len(shard.positions) != entry["count"] for shard, entry in zip(self.shards, manifest["shards"])):
+            raise ValueError(f"'{shard_dir}' is inconsistent; rebuild it with tools/build_shards.py")
+        self._lock = threading.Lock()
+        self._lastSweep = perf_counter()
+        index_path = os.path.join(shard_dir, SHARD_INDEX)
+        with open(index_path, "rb") as f:
+            self._index = SnapshotCatalogue(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), index_path)
+        if len(self._index) != self._size:
+            raise ValueError(f"'{shard_dir}' is inconsistent; rebuild it with tools/build_shards.py")
+        self._ids, self._ratings, self._prices = (self._index.column(name)
+                                                  for name in ("id", "rating", "averagePrice"))
+        self._idOrder = array('I', sorted(range(self._size), key=self._ids.__getitem__))
+
+    def resident(self, shard: RegionShard) -> Tuple[List[Restaurant], SpatialGridIndex]:
+        """The shard's rows and grid, loading them on first use."""
+        shard.lastUsed = now = perf_counter()
+        resident = shard.resident
+        if resident is None:
+            with self._lock:
+                resident = shard.resident
+                if resident is None:
+                    rows = load_data_from_snapshot(shard.path)
+                    if len(rows) != len(shard.positions):
+                        raise ValueError(f"'{shard.path}' changed on disk; reload the data")
+                    resident = shard.resident = (rows, SpatialGridIndex(rows, positions=shard.positions))
+                    shard.loads += 1
+        if now - self._lastSweep > SHARD_SWEEP_INTERVAL:
+            self.releaseIdle()
+        return resident
+
+    def releaseIdle(self, maxIdleSeconds: float = SHARD_IDLE_SECONDS) -> List[str]:
+        """Drop the rows of shards unused for maxIdleSeconds; returns their regions."""
+        now = self._lastSweep = perf_counter()
+        released = []
+        for shard in self.shards:
+            if shard.resident is not None and now - shard.lastUsed > maxIdleSeconds:
+                shard.resident = None  # Requests still holding the rows keep them alive
+                released.append(shard.regionId)
+        return released
+
+    def shardsWithin(self, center: Coordinates, radiusKm: float) -> List[RegionShard]:
+        """Shards with a restaurant that may lie within radiusKm of center."""
+        location_service = LocationService()
+        return [shard for shard in self.shards if shard.positions and
+                location_service.calculateDistance(center, shard.center) <= radiusKm + shard.radiusKm]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[p] for p in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("catalogue position out of range")
+        return self.resident(self.shards[self._shardOf[position]])[0][self._offsetOf[position]]
+
+    def __iter__(self) -> Iterator[Restaurant]:
+        rows = [self.resident(shard)[0] if shard.positions else [] for shard in self.shards]
+        return map(lambda shard_number, offset: rows[shard_number][offset], self._shardOf, self._offsetOf)
+
+    def getById(self, restaurantId: int) -> Optional[Restaurant]:
+        i = bisect_left(self._idOrder, restaurantId, key=self._ids.__getitem__)
+        if i < self._size and self._ids[self._idOrder[i]] == restaurantId:
+            return self[self._idOrder[i]]
+        return None
+
+    def topRated(self, limit: int, maxPrice: Optional[float] = None) -> List[Restaurant]:
+        positions = range(self._size) if maxPrice is None else \
+            (p for p in range(self._size) if self._prices[p] <= maxPrice)
+        return [self[p] for p in heapq.nlargest(limit, positions, key=self._ratings.__getitem__)]
+
+    def rankByRating(self, positions: Iterable[int], limit: Optional[int] = None) -> List[int]:
+        ratings = self._ratings
+        return top_positions(positions, lambda p: (-ratings[p], p), limit)
+
+    def priceSummary(self) -> Optional[Tuple[float, float, float]]:
+        prices = [int(p) if p.is_integer() else p for p in self._prices if p > 0]
+        if not prices:
+            return None
+        return min(prices), sum(prices) / len(prices), max(prices)
+
+    def createSpatialIndex(self) -> "ShardedSpatialIndex":
+        return ShardedSpatialIndex(self)
+
+    def createTextIndex(self) -> TextSearchIndex:
+        return TextSearchIndex(self._index)
+
+    def createColumnarStore(self) -> ColumnarRestaurantStore:
+        return self._index.createColumnarStore()
+
+    def indexSource(self) -> SnapshotCatalogue:
+        return self._index
+
+    def stats(self) -> dict:
+        return {"shards": [{"region": shard.regionId, "restaurants": len(shard.positions),
+                            "resident": shard.resident is not None, "loads": shard.loads}
+                           for shard in self.shards]}
+
+class ShardedSpatialIndex:
+    """Routes each radius query to the shards it can reach, then to their grids."""
+
+    def __init__(self, catalogue: ShardedCatalogue):
+        self.catalogue = catalogue
+
+    def candidatePositions(self, center: Coordinates, radiusKm: Optional[float]) -> List[int]:
+        if not radiusKm:
+            return list(range(len(self.catalogue)))
+        positions: List[int] = []
+        for shard in self.catalogue.shardsWithin(center, radiusKm):
+            positions.extend(self.catalogue.resident(shard)[1].candidatePositions(center, radiusKm))
+        positions.sort()
+        return positions
+
+def open_catalogue(data_dir: str, backend: str = DATA_BACKEND) -> RestaurantCatalogue:
+    """The restaurant catalogue of data_dir in the configured backend."""
+    if backend == "sqlite":
+        return SqliteCatalogue(os.path.join(data_dir, SQLITE_FILE))
+    if backend == "sharded":
+        return ShardedCatalogue(os.path.join(data_dir, SHARD_DIR))
+    if backend != "json":
+        raise ValueError(f"Unknown DATA_BACKEND '{backend}' (expected 'json', 'sqlite' or 'sharded')")
+    return ListCatalogue(load_restaurants(os.path.join(data_dir, RESTAURANTS_FILE)))
+
+# ----------------------------------------------------------------------------
+# DATA VERSIONS (hot reload)
+# ----------------------------------------------------------------------------
+
+DATA_FILES = (RESTAURANTS_FILE, 'data_chat.json', 'dishes.json', 'regions.json')
+DATA_POLL_INTERVAL = float(os.environ.get('DATA_POLL_INTERVAL', '0'))  # Seconds; 0 disables polling
+
+def load_json_file(path: str, default):
+    """Parsed contents of an optional data file, or `default` when it is missing."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ {os.path.basename(path)} not found")
+        return default
+
+class DataVersion:
+    """
+    One consistent generation of the data files plus every structure derived
+    from them. Built in full before it is published and never mutated after,
+    so a request that holds a DataVersion sees the same data throughout.
+    """
+
+    def __init__(self, version: int, restaurants: RestaurantCatalogue, chat_data: dict,
+                 dishes_data: dict, regions_data: list, mtimes: Dict[str, float]):
+        self.version = version
+        self.restaurants = restaurants
+        self.spatial_index = restaurants.createSpatialIndex()
+        self.columnar_store = restaurants.createColumnarStore() if NUMPY_AVAILABLE else None
+        self.text_index = restaurants.createTextIndex()
+        rows = restaurants.indexSource()
+        self.trigram_index = restaurants.createTrigramIndex()
+        self.facet_index = FacetIndex(rows)
+        self.hours_index = OpenHoursIndex(rows)
+        self.chat_data = chat_data
+        self.dishes_data = dishes_data
+        self.regions_data = regions_data
+        self.autocomplete_index = restaurants.createAutocompleteIndex(dishes_data, regions_data)
+        self.mtimes = mtimes
+        self.loaded_at = datetime.now()
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "backend": self.restaurants.backend,
+            "loadedAt": self.loaded_at.isoformat(timespec="seconds"),
+            "restaurants": len(self.restaurants),
+            "dishes": len(self.dishes_data.get('dishes', {})),
+            "regions": len(self.regions_data),
+            "chatEntries": len(self.chat_data),
+            **self.restaurants.stats(),
+        }
+
+class DataStore:
+    """
+    Holds the published DataVersion. reload() builds a new version from the
+    files, entirely on the calling thread, and publishes it with a single
+    reference assignment; readers never see a half-built version. Reloads are
+    serialized, and a reload that would empty the catalogue (e.g. a JSON
+    syntax error mid-edit) keeps the current version instead. The files of a
+    failed build are not retried until they change again (or force=True).
+    """
+
+    def __init__(self, dataDir: str = DATA_DIR):
+        self.dataDir = dataDir
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[DataVersion], None]] = []
+        self._poller: Optional[threading.Thread] = None
+        self._stop_polling = threading.Event()
+        self._current: Optional[DataVersion] = None
+        self._failed: Optional[Tuple[Dict[str, float], str]] = None  # (mtimes, error) of the last failed build
+        # Set in shared memory workers: the catalogue comes from the loader, not the files
+        self.shared: Optional[SharedCatalogueReader] = None
+
+    @property
+    def current(self) -> DataVersion:
+        """The published version; the first access loads it (see load)."""
+        if self._current is None:
+            self.load()
+        return self._current
+
+    def load(self) -> DataVersion:
+        """Build and publish the first version unless one already exists."""
+        with self._reload_lock:
+            if self._current is None:
+                self._current = self._build(1, self.sourceMtimes())
+            return self._current
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dataDir, name)
+
+    @staticmethod
+    def _mtimes(paths: Iterable[str]) -> Dict[str, float]:
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                pass
+        return mtimes
+
+    def catalogueMtimes(self) -> Dict[str, float]:
+        """mtime of each restaurant source (JSON, snapshot, SQLite, shards) that exists."""
+        json_path = self.path(RESTAURANTS_FILE)
+        return self._mtimes([json_path, snapshot_path_for(json_path), self.path(SQLITE_FILE),
+                             os.path.join(self.path(SHARD_DIR), SHARD_MANIFEST)])
+
+    def publishedMtimes(self) -> Dict[str, float]:
+        """mtime of everything a shared memory generation is built from: the
+        restaurant sources plus the dishes and regions autocomplete indexes."""
+        return {**self.catalogueMtimes(),
+                **self._mtimes([self.path('dishes.json'), self.path('regions.json')])}
+
+    def loadDishes(self) -> dict:
+        return load_json_file(self.path('dishes.json'), {})
+
+    def loadRegions(self) -> list:
+        return load_json_file(self.path('regions.json'), {}).get('regions', [])
+
+    def sourceMtimes(self) -> Dict[str, float]:
+        """mtime of every data file that exists; in a shared memory worker, the
+        published catalogue generation stands in for the restaurant files."""
+        mtimes = self._mtimes(self.path(name) for name in DATA_FILES if name != RESTAURANTS_FILE)
+        if self.shared is not None:
+            mtimes["generation"] = self.shared.generation()
+        else:
+            mtimes.update(self.catalogueMtimes())
+        return mtimes
+
+    def _build(self, version: int, mtimes: Dict[str, float]) -> DataVersion:
+        return DataVersion(
+            version=version,
+            restaurants=self.shared.attach() if self.shared is not None else open_catalogue(self.dataDir),
+            chat_data=load_json_file(self.path('data_chat.json'), {}),
+            dishes_data=self.loadDishes(),
+            regions_data=self.loadRegions(),
+            mtimes=mtimes,
+        )
+
+    def subscribe(self, listener: Callable[[DataVersion], None]):
+        """Call listener(new_version) after every publish, e.g. to drop caches."""
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = False) -> dict:
+        """Rebuild and publish if any data file changed (always when force)."""
+        if self._current is None:
+            return {"status": "loaded", "data": self.load().stats()}
+        with self._reload_lock:
+            current = self._current
+            mtimes = self.sourceMtimes()
+            if not force and mtimes == current.mtimes:
+                return {"status": "unchanged", "data": current.stats()}
+            if not force and self._failed is not None and mtimes == self._failed[0]:
+                # Same files as the last failed build: it would only fail again
+                return {"status": "unchanged", "error": self._failed[1], "data": current.stats()}
+            try:
+                candidate = self._build(current.version + 1, mtimes)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                return self._buildFailed(mtimes, str(e), current)
+            if current.restaurants and not candidate.restaurants:
+                return self._buildFailed(mtimes, "New restaurant data is empty or invalid", current)
+            self._current, self._failed = candidate, None  # The atomic swap
+            for listener in self._listeners:
+                listener(candidate)
+            print(f"🔄 Data version {candidate.version} published "
+                  f"({len(candidate.restaurants)} restaurants)")
+            return {"status": "reloaded", "data": candidate.stats()}
+
+    def _buildFailed(self, mtimes: Dict[str, float], error: str, current: DataVersion) -> dict:
+        self._failed = (mtimes, error)
+        return {"status": "failed", "error": error, "data": current.stats()}
+
+    def startPolling(self, interval: float):
+        """Check the data files' mtimes every `interval` seconds on a daemon thread."""
+        if self._poller is not None:
+            return
+
+        def poll():
+            while not self._stop_polling.wait(interval):
+                result = self.reload()
+                if result["status"] == "failed":
+                    print(f"⚠️ Data reload failed: {result['error']}")
+
+        self._stop_polling.clear()
+        self._poller = threading.Thread(target=poll, name="data-reload", daemon=True)
+        self._poller.start()
+
+    def stopPolling(self):
+        if self._poller is not None:
+            self._stop_polling.set()
+            self._poller.join()
+            self._poller = None
+
+# Nothing is read until create_app(preload=True) or the first request
+DATA_STORE = DataStore()
+
+def current_data() -> DataVersion:
+    """
+    The data version for the current request. It is pinned on first use, so
+    every service touched by one request reads the same version even if a
+    reload is published meanwhile. Outside a request: the latest version.
+    """
+    if has_request_context():
+        if 'data' not in g:
+            g.data = DATA_STORE.current
+        return g.data
+    return DATA_STORE.current
+
+#Configure the chatbot:
+
+OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_MODEL = "llama3.2:3b"  # Change to your preferred model
+USE_OLLAMA = True  # Set False to use rule-based only
+OLLAMA_TIMEOUT = 15
+
+# Response cache
+chatbot_cache = {}
+
+# Search result cache: locations are snapped to a grid of this many degrees
+# (~550 m) so nearby users share entries
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_GRID_DEG = 0.005
+
+# ----------------------------------------------------------------------------
+# SERVICE CLASS
+# ----------------------------------------------------------------------------
+
+MAX_PAGE_SIZE = 200
+STREAM_CHUNK_ROWS = 4096  # Candidates filtered per step when streaming from the NumPy store
+
+def encode_cursor(sort_key: tuple, query_digest: str) -> str:
+    """Opaque page cursor: the sort key of the last returned row plus the query it belongs to."""
+    payload = json.dumps({"k": list(sort_key), "q": query_digest}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, query_digest: str) -> tuple:
+    """Sort key stored in a cursor; ValueError if it is malformed or from another query."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        sort_key, digest = tuple(payload["k"]), payload["q"]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if digest != query_digest:
+        raise ValueError("Cursor does not belong to this query")
+    return sort_key
+
+def parse_similarity_threshold(value) -> float:
+    """Validate a 'similarityThreshold' request parameter (0 turns fuzzy matching off)."""
+    if value is None:
+        return TRIGRAM_THRESHOLD
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError("similarityThreshold must be a number between 0 and 1")
+    return float(value)
+
+def parse_page_size(value) -> Optional[int]:
+    """Validate a 'limit' request parameter; None means no paging."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+    return value
+
+class SearchResultCache:
+    """
+    Bounded LRU cache of candidate positions for /api/search.
+
+    Keys are the user location snapped to a grid cell plus a canonical tuple of
+    the filters. Each entry holds every restaurant that passes the filters and
+    lies within radius + (cell center -> corner) of the cell center, i.e. a
+    superset valid for any user inside the cell; callers recompute exact
+    distances for the cached positions. openNow entries expire at the next
+    open-hours boundary.
+    """
+
+    def __init__(self, maxSize: int = SEARCH_CACHE_SIZE, gridDeg: float = SEARCH_CACHE_GRID_DEG):
+        self.maxSize = maxSize
+        self.gridDeg = gridDeg
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Tuple[List[int], Optional[datetime]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snap(self, location: Coordinates) -> Tuple[Tuple[int, int], Coordinates, float]:
+        """Cell key, cell center and the center-to-corner distance (km) for a location."""
+        cell = (math.floor(location.latitude / self.gridDeg),
+                math.floor(location.longitude / self.gridDeg))
+        center = Coordinates((cell[0] + 0.5) * self.gridDeg, (cell[1] + 0.5) * self.gridDeg)
+        corner = Coordinates(cell[0] * self.gridDeg, cell[1] * self.gridDeg)
+        return cell, center, LocationService().calculateDistance(center, corner)
+
+    @staticmethod
+    def filterKey(query: SearchQuery) -> tuple:
+        return (
+            ' '.join(tokenize_text(query.queryText or "")), query.priceRange,
+            tuple(sorted(query.cuisines)), tuple(sorted(query.specialFlags)),
+            tuple(sorted(query.dishTypes)), tuple(sorted(query.flavorProfiles)),
+            query.radiusKm, query.sortBy, query.openNow,
+            query.atTime.strftime("%H:%M") if query.atTime else None,
+            query.similarityThreshold,
+        )
+
+    def get(self, key: tuple) -> Optional[List[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or datetime.now() < entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, positions: List[int], expires: Optional[datetime] = None):
+        with self._lock:
+            self._entries[key] = (positions, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.maxSize,
+            "gridDeg": self.gridDeg,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+class QueryPlan:
+    """Per-request record of the stages a search ran, for the explain flag."""
+
+    def __init__(self):
+        self.cache: Optional[str] = None
+        self.cell: Optional[dict] = None  # The widened query a cache miss ran the indexes with
+        self.stages: List[dict] = []
+
+    def record(self, stage: str, rowsIn: int, rowsOut: int, seconds: float,
+               scope: str = "query", cached: bool = False):
+        """
+        One stage; each stage's rowsIn is the previous one's rowsOut. scope is
+        "cell" for work done for the cache entry (the whole snapped cell), and
+        "query" for work on this request's location and radius.
+        """
+        self.stages.append({
+            "stage": stage,
+            "scope": scope,
+            "cached": cached,
+            "rowsIn": rowsIn,
+            "rowsOut": rowsOut,
+            "timeUs": round(seconds * 1e6, 1),
+        })
+
+    def to_dict(self) -> dict:
+        return {"cache": self.cache, "cell": self.cell, "stages": self.stages}
+
+class QueryPlanner:
+    """
+    Orders the index lookups of a search by expected benefit. Each stage keeps
+    running averages of its cost (seconds) and selectivity (fraction of the
+    catalogue it lets through); stages run in ascending cost / (1 - selectivity),
+    i.e. cheap and selective first, and evaluation stops as soon as the
+    candidate set is empty. Unseen stages start from rough priors.
+    """
+    PRIOR_COST = {"facets": 2e-6, "openNow": 5e-6, "text": 2e-5, "grid": 5e-5}
+    PRIOR_SELECTIVITY = {"facets": 0.3, "openNow": 0.6, "text": 0.1, "grid": 0.2}
+    DECAY = 0.1  # Weight of the newest observation in the running averages
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cost = dict(self.PRIOR_COST)
+        self.selectivity = dict(self.PRIOR_SELECTIVITY)
+
+    def rank(self, stage: str) -> float:
+        return self.cost[stage] / max(1.0 - self.selectivity[stage], 0.01)
+
+    def order(self, stages: Iterable[str]) -> List[str]:
+        return sorted(stages, key=self.rank)
+
+    def observe(self, stage: str, selectivity: float, seconds: float):
+        with self._lock:
+            self.cost[stage] += self.DECAY * (seconds - self.cost[stage])
+            self.selectivity[stage] += self.DECAY * (selectivity - self.selectivity[stage])
+
+    def stats(self) -> dict:
+        return {stage: {"costUs": round(self.cost[stage] * 1e6, 1),
+                        "selectivity": round(self.selectivity[stage], 3),
+                        "rankUs": round(self.rank(stage) * 1e6, 2)}
+                for stage in self.order(self.cost)}
+
+def bitmap_count(bitmap: int) -> int:
+    return bin(bitmap).count('1')
+
+class SearchService:
+    def __init__(self, locationService: LocationService, hoursChecker: HoursChecker):
+        self.locationService = locationService
+        self.hoursChecker = hoursChecker
+        self.result_cache = SearchResultCache()
+        self.planner = QueryPlanner()
+
+    # The catalogue and its indexes come from the request's data version
+    # (see current_data), so a reload never mixes two versions in one search.
+    # Each property costs a request-context lookup: per-row loops bind what
+    # they need to locals first.
+    @property
+    def all_restaurants(self) -> List[Restaurant]: return current_data().restaurants
+    @property
+    def spatial_index(self) -> SpatialGridIndex: return current_data().spatial_index
+    @property
+    def columnar_store(self) -> Optional[ColumnarRestaurantStore]: return current_data().columnar_store
+    @property
+    def text_index(self) -> TextSearchIndex: return current_data().text_index
+    @property
+    def trigram_index(self) -> TrigramIndex: return current_data().trigram_index
+    @property
+    def facet_index(self) -> FacetIndex: return current_data().facet_index
+    @property
+    def hours_index(self) -> OpenHoursIndex: return current_data().hours_index
+
+    TEXT_FIELDS = ("name", "tags")
+
+    def _hoursCheckerFor(self, query: SearchQuery) -> HoursChecker:
+        # atTime reuses the simulation_time hook
+        if query.atTime is not None:
+            return HoursChecker(simulation_time=query.atTime)
+        return self.hoursChecker
+
+    def _textPositions(self, query: SearchQuery) -> Iterable[int]:
+        """Exact (prefix) text matches; trigram matches when there are none."""
+        matches = self.text_index.search(query.queryText, self.TEXT_FIELDS)
+        if matches or not query.similarityThreshold:
+            return matches or ()
+        return [p for p, _, _ in self.trigram_index.search(
+            query.queryText, query.similarityThreshold, self.TEXT_FIELDS)]
+
+    def _candidatePositions(self, query: SearchQuery, minute: int,
+                            plan: Optional[QueryPlan] = None, scope: str = "query") -> List[int]:
+        """
+        Index lookups before any per-row work. Each active filter is one
+        bitmap-producing stage (facets, openNow, text postings, grid cells
+        overlapping the radius circle); the planner picks their order and
+        the AND short-circuits as soon as nothing is left.
+        """
+        size = len(self.all_restaurants)
+        lookups: Dict[str, Callable[[], int]] = {}
+        selections = FacetIndex.selectionsFor(query)
+        if any(selections.values()):
+            lookups["facets"] = lambda: self.facet_index.select(selections)
+        if query.openNow:
+            lookups["openNow"] = lambda: self.hours_index.openBitmap(minute)
+        if tokenize_text(query.queryText or ""):
+            lookups["text"] = lambda: positions_to_bitmap(self._textPositions(query), size)
+        if query.radiusKm:
+            lookups["grid"] = lambda: positions_to_bitmap(
+                self.spatial_index.candidatePositions(query.userLocation, query.radiusKm), size)
+
+        bitmap: Optional[int] = None
+        rows = size
+        for stage in self.planner.order(lookups):
+            start = perf_counter()
+            stage_bitmap = lookups[stage]()
+            elapsed = perf_counter() - start
+            stage_rows = bitmap_count(stage_bitmap)
+            bitmap = stage_bitmap if bitmap is None else bitmap & stage_bitmap
+            rows_out = bitmap_count(bitmap)
+            self.planner.observe(stage, stage_rows / size if size else 0.0, elapsed)
+            if plan is not None:
+                plan.record(stage, rows, rows_out, elapsed, scope=scope)
+            rows = rows_out
+            if not bitmap:
+                return []  # Short-circuit: no later stage can add rows back
+
+        if bitmap is None:
+            return list(range(size))
+        return bitmap_to_positions(bitmap)
+
+    def _cachedCandidatePositions(self, query: SearchQuery, minute: int,
+                                  plan: Optional[QueryPlan] = None) -> List[int]:
+        """
+        _candidatePositions through the result cache. On a miss the indexes
+        are queried around the snapped cell center with the radius widened
+        to cover the whole cell, so the entry serves every user in the cell.
+        """
+        cell, center, cell_reach_km = self.result_cache.snap(query.userLocation)
+        # Positions are only meaningful within one data version
+        key = (current_data().version, cell) + self.result_cache.filterKey(query)
+        start = perf_counter()
+        positions = self.result_cache.get(key)
+        if plan is not None:
+            # A hit stands in for the index stages and the trim of the request that filled it
+            size = len(self.all_restaurants)
+            plan.cache = "miss" if positions is None else "hit"
+            plan.record("cache", size, size if positions is None else len(positions),
+                        perf_counter() - start, scope="cell", cached=positions is not None)
+        if positions is None:
+            widened = replace(query, userLocation=center,
+                              radiusKm=query.radiusKm + cell_reach_km if query.radiusKm else query.radiusKm)
+            if plan is not None:
+                plan.cell = {"latitude": center.latitude, "longitude": center.longitude,
+                             "radiusKm": widened.radiusKm}
+            positions = self._candidatePositions(widened, minute, plan, scope="cell")
+            if widened.radiusKm:
+                # Trim the cell-level superset to the widened circle
+                start = perf_counter()
+                rows_in = len(positions)
+                positions = [p for p, _ in self._exactRows(positions, widened, sort=False)]
+                if plan is not None:
+                    plan.record("cellTrim", rows_in, len(positions), perf_counter() - start, scope="cell")
+            expires = None
+            if query.openNow and query.atTime is None:
+                wait = self.hours_index.minutesUntilChange(minute)
+                if wait is not None:
+                    now = datetime.now().replace(second=0, microsecond=0)
+                    expires = now + timedelta(minutes=wait)
+            self.result_cache.put(key, positions, expires)
+        return positions
+
+    def _iterFiltered(self, positions: Iterable[int], query: SearchQuery) -> Iterator[Tuple[int, float]]:
+        # Text, facet and openNow filters are resolved up front by the
+        # indexes (_candidatePositions); per row only the radius remains:
+        # a lat/lon bounding-box test first, haversine only for rows inside.
+        box = self.locationService.boundingBox(query.userLocation, query.radiusKm) \
+            if query.radiusKm else None
+        restaurants, distance_km = self.all_restaurants, self.locationService.calculateDistance
+
+        for position in positions:
+            restaurant = restaurants[position]
+            if box is not None and not (box[0] <= restaurant.latitude <= box[1]
+                                        and box[2] <= restaurant.longitude <= box[3]):
+                continue
+
+            # Distance Filter
+            distance = distance_km(query.userLocation, restaurant.getLocation())
+            # Use the radiusKm from the query
+            if query.radiusKm and distance > query.radiusKm:
+                continue
+            yield position, distance
+
+    def _applyFilters(self, positions: List[int], query: SearchQuery,
+                      plan: Optional[QueryPlan] = None) -> List[Tuple[int, float]]:
+        if plan is None:
+            return list(self._iterFiltered(positions, query))
+
+        # Explained: the box test and the haversine run as separate passes so each can be timed
+        start = perf_counter()
+        rows = self.all_restaurants
+        box = self.locationService.boundingBox(query.userLocation, query.radiusKm) \
+            if query.radiusKm else None
+        if box is not None:
+            boxed = [p for p in positions if box[0] <= rows[p].latitude <= box[1]
+                     and box[2] <= rows[p].longitude <= box[3]]
+            plan.record("bbox", len(positions), len(boxed), perf_counter() - start)
+        else:
+            boxed = positions
+        start = perf_counter()
+        filtered_results = []
+        for position in boxed:
+            distance = self.locationService.calculateDistance(query.userLocation,
+                                                              rows[position].getLocation())
+            if not query.radiusKm or distance <= query.radiusKm:
+                filtered_results.append((position, distance))
+        plan.record("haversine", len(boxed), len(filtered_results), perf_counter() - start)
+        return filtered_results
+
+    def _sortResults(self, results: List[Tuple[int, float]],
+                     sortBy: str) -> List[Tuple[int, float]]:
+        if sortBy == "rating":
+            rows = self.all_restaurants
+            results.sort(key=lambda item: rows[item[0]].getRating(), reverse=True)
+        elif sortBy == "distance":
+            results.sort(key=lambda item: item[1])
+        return results
+
+    def _sortKey(self, sortBy: str) -> Callable[[Tuple[int, float]], tuple]:
+        """Total order matching _sortResults (ties keep catalogue order), used by paging."""
+        if sortBy == "rating":
+            rows = self.all_restaurants
+            return lambda item: (-rows[item[0]].getRating(), item[0])
+        elif sortBy == "distance":
+            return lambda item: (item[1], item[0])
+        return lambda item: (item[0],)
+
+    @staticmethod
+    def _queryDigest(query: SearchQuery) -> str:
+        canonical = (
+            query.userLocation.latitude, query.userLocation.longitude, query.queryText,
+            query.radiusKm, query.priceRange, query.sortBy, query.openNow,
+            sorted(query.cuisines), sorted(query.specialFlags),
+            sorted(query.dishTypes), sorted(query.flavorProfiles),
+            query.atTime.isoformat() if query.atTime else None,
+        )
+        return hashlib.md5(json.dumps(canonical).encode('utf-8')).hexdigest()[:16]
+
+    def _selectPage(self, results: List[Tuple[int, float]], query: SearchQuery) \
+                    -> Tuple[List[Tuple[int, float]], Optional[str]]:
+        """
+        Top-K selection with a heap instead of a full sort: rows after the
+        cursor, smallest `limit` sort keys. Returns the page and nextCursor.
+        """
+        sort_key = self._sortKey(query.sortBy)
+        digest = self._queryDigest(query)
+        if query.cursor:
+            after = decode_cursor(query.cursor, digest)
+            results = [item for item in results if sort_key(item) > after]
+        page = heapq.nsmallest(query.limit + 1, results, key=sort_key)
+        if len(page) <= query.limit:
+            return page, None
+        page = page[:query.limit]
+        return page, encode_cursor(sort_key(page[-1]), digest)
+
+    def _filterColumnar(self, positions: List[int], query: SearchQuery,
+                        sort: bool = True, plan: Optional[QueryPlan] = None) -> List[Tuple[int, float]]:
+        """
+        Vectorized equivalent of _applyFilters + _sortResults on the NumPy store:
+        bounding box, distance, radius cut and sort are array expressions.
+        """
+        positions, distances = self._columnarMatches(self.columnar_store, positions, query, sort, plan)
+        return list(zip(positions.tolist(), distances.tolist()))
+
+    def _iterColumnar(self, positions: List[int], query: SearchQuery,
+                      chunkSize: int = STREAM_CHUNK_ROWS) -> Iterator[Tuple[int, float]]:
+        """
+        Lazy _filterColumnar. Unsorted queries are filtered chunkSize
+        candidates at a time, so the first rows are out before the rest are
+        read; a sort needs every match first, so sorted queries are filtered
+        and sorted in one pass and only handed out chunk by chunk.
+        """
+        store = self.columnar_store  # One data generation for the whole stream
+        if query.sortBy in ("rating", "distance"):
+            matched, distances = self._columnarMatches(store, positions, query)
+            for start in range(0, len(matched), chunkSize):
+                yield from zip(matched[start:start + chunkSize].tolist(),
+                               distances[start:start + chunkSize].tolist())
+            return
+        for start in range(0, len(positions), chunkSize):
+            matched, distances = self._columnarMatches(store, positions[start:start + chunkSize],
+                                                       query, sort=False)
+            yield from zip(matched.tolist(), distances.tolist())
+
+    def _columnarMatches(self, store: ColumnarRestaurantStore, positions: List[int],
+                         query: SearchQuery, sort: bool = True, plan: Optional[QueryPlan] = None):
+        """Matching positions and their distances as parallel arrays, in response order."""
+        positions = np.asarray(positions, dtype=np.intp)
+        rows_in = len(positions)
+        start = perf_counter()
+
+        box = self.locationService.boundingBox(query.userLocation, query.radiusKm) \
+            if query.radiusKm else None
+        if box is not None:
+            latitudes, longitudes = store.latitude[positions], store.longitude[positions]
+            positions = positions[(latitudes >= box[0]) & (latitudes <= box[1]) &
+                                  (longitudes >= box[2]) & (longitudes <= box[3])]
+        in_box = len(positions)
+        box_seconds = perf_counter() - start
+        start = perf_counter()
+
+        distances = store.distancesKm(query.userLocation, positions)
+        if query.radiusKm:
+            in_radius = distances <= query.radiusKm
+            positions, distances = positions[in_radius], distances[in_radius]
+        if plan is not None:
+            if box is not None:
+                plan.record("bbox", rows_in, in_box, box_seconds)
+            plan.record("haversine", in_box, len(positions), perf_counter() - start)
+
+        if not sort:
+            order = np.arange(len(positions))
+        elif query.sortBy == "rating":
+            order = np.argsort(-store.rating[positions], kind="stable")
+        elif query.sortBy == "distance":
+            order = np.argsort(distances, kind="stable")
+        else:
+            order = np.arange(len(positions))
+
+        return positions[order], distances[order]
+
+    def filterRestaurants(self, searchQuery: SearchQuery) -> List[JSONFragment]:
+        return self.searchPage(searchQuery)[0]
+
+    def _exactRows(self, positions: List[int], query: SearchQuery, sort: bool = True,
+                   plan: Optional[QueryPlan] = None) -> List[Tuple[int, float]]:
+        """Exact distance + radius cut on candidates, sorted by query.sortBy unless sort=False."""
+        if self.columnar_store is not None:
+            return self._filterColumnar(positions, query, sort=sort, plan=plan)
+        rows = self._applyFilters(positions, query, plan)
+        return self._sortResults(rows, query.sortBy) if sort else rows
+
+    def _pageRows(self, rows: List[Tuple[int, float]], query: SearchQuery,
+                  presorted: bool = False) -> Tuple[List[Tuple[int, float]], Optional[str]]:
+        """Apply limit/cursor (heap top-K) or a full sort to matching rows."""
+        if query.limit is not None:
+            return self._selectPage(rows, query)
+        if presorted:
+            return rows, None
+        return self._sortResults(rows, query.sortBy), None
+
+    def iterSerialized(self, rows: Iterable[Tuple[int, float]], hours_checker: HoursChecker,
+                       minute: int) -> Iterator[JSONFragment]:
+        """Serialize result rows one at a time (used directly by streaming responses)."""
+        restaurants, hours_index = self.all_restaurants, self.hours_index
+        for position, distance in rows:
+            # Cached static JSON plus the dynamic data (open status only for returned rows)
+            is_open = hours_index.isOpenAt(position, minute)
+            yield restaurants[position].to_json(
+                calculated_distance_km=round(distance, 1),
+                open_status_text=hours_checker.statusText(is_open),
+                # Use real distance for display
+                distance_text=f"{round(distance, 1)} km",
+            )
+
+    def _serializeRows(self, rows: List[Tuple[int, float]], hours_checker: HoursChecker,
+                       minute: int) -> List[JSONFragment]:
+        # Convert to JSON fragments (JSONFragment.to_dict() for a plain dict)
+        return list(self.iterSerialized(rows, hours_checker, minute))
+
+    def searchRows(self, searchQuery: SearchQuery, plan: Optional[QueryPlan] = None,
+                   lazy: bool = False):
+        """
+        Matching (position, distance) rows in response order, the next cursor,
+        and the hours checker/minute the rows were evaluated with. With
+        lazy=True, unpaged queries return a generator: unsorted ones straight
+        from the filter loop (chunked on the NumPy store), sorted ones on the
+        NumPy store after one vectorized filter-and-sort pass. Sorted queries
+        on the pure-Python backend are always buffered.
+        Raises ValueError for a bad cursor.
+        """
+        hours_checker = self._hoursCheckerFor(searchQuery)
+        minute = hours_checker.currentMinute()  # One clock reading per request
+        positions = self._cachedCandidatePositions(searchQuery, minute, plan)
+        paged = searchQuery.limit is not None
+        if lazy and not paged:
+            if self.columnar_store is not None:
+                return self._iterColumnar(positions, searchQuery), None, hours_checker, minute
+            if searchQuery.sortBy not in ("rating", "distance"):
+                return self._iterFiltered(positions, searchQuery), None, hours_checker, minute
+        rows = self._exactRows(positions, searchQuery, sort=not paged, plan=plan)
+        rows, next_cursor = self._pageRows(rows, searchQuery, presorted=not paged)
+        return rows, next_cursor, hours_checker, minute
+
+    def searchPage(self, searchQuery: SearchQuery,
+                   plan: Optional[QueryPlan] = None) -> Tuple[List[JSONFragment], Optional[str]]:
+        """
+        Filtered, sorted results plus the cursor for the next page (None when
+        this is the last page or the query is not paged). Pass a QueryPlan to
+        have the executed stages and their row counts recorded into it.
+        Raises ValueError for a bad cursor.
+        """
+        rows, next_cursor, hours_checker, minute = self.searchRows(searchQuery, plan)
+        return self._serializeRows(rows, hours_checker, minute), next_cursor
+
+    def _distancesFrom(self, origin: Coordinates, positions: List[int]) -> Dict[int, float]:
+        store = self.columnar_store
+        if store is not None:
+            distances = store.distancesKm(origin, np.asarray(positions, dtype=np.intp))
+            return dict(zip(positions, distances.tolist()))
+        rows = self.all_restaurants
+        return {p: self.locationService.calculateDistance(origin, rows[p].getLocation())
+                for p in positions}
+
+    def searchBatch(self, queries: List[SearchQuery]) -> List[Tuple[List[JSONFragment], Optional[str]]]:
+        """
+        Answer several queries with one shared pass: queries are grouped by
+        origin, each group's candidate sets are merged and every distance is
+        computed once, then each query filters/sorts its own candidates.
+        Results come back in request order. Raises ValueError for a bad cursor.
+        """
+        checkers = [self._hoursCheckerFor(q) for q in queries]
+        minutes = [checker.currentMinute() for checker in checkers]
+        candidates = [self._cachedCandidatePositions(q, m) for q, m in zip(queries, minutes)]
+
+        groups: Dict[Tuple[float, float], List[int]] = {}
+        for index, query in enumerate(queries):
+            origin = (query.userLocation.latitude, query.userLocation.longitude)
+            groups.setdefault(origin, []).append(index)
+
+        responses: List[Optional[Tuple[List[dict], Optional[str]]]] = [None] * len(queries)
+        for indexes in groups.values():
+            origin = queries[indexes[0]].userLocation
+            union = sorted(set().union(*(candidates[i] for i in indexes)))
+            distances = self._distancesFrom(origin, union)
+            for i in indexes:
+                query = queries[i]
+                rows = [(p, distances[p]) for p in candidates[i]
+                        if not query.radiusKm or distances[p] <= query.radiusKm]
+                rows, next_cursor = self._pageRows(rows, query)
+                responses[i] = (self._serializeRows(rows, checkers[i], minutes[i]), next_cursor)
+        return responses
+
+    def searchWithFacets(self, searchQuery: SearchQuery) -> dict:
+        """
+        Results plus per-value counts for every facet (and open/closed), in one
+        pass over the rows that pass the non-facet filters (text + radius).
+        As usual for faceted search, each facet's counts ignore that facet's
+        own selection: a row failing only the cuisine filter still counts
+        towards the cuisine values.
+        """
+        hours_checker = self._hoursCheckerFor(searchQuery)
+        minute = hours_checker.currentMinute()
+        base_query = replace(searchQuery, cuisines=[], specialFlags=[], priceRange=None,
+                             dishTypes=[], flavorProfiles=[], openNow=False)
+        base_rows = self._exactRows(self._cachedCandidatePositions(base_query, minute),
+                                    base_query, sort=False)
+
+        extractors = dict(FacetIndex.FACETS)
+        extractors["openNow"] = None  # Computed from the hours index below
+        selections = {facet: set(values) for facet, values in
+                      FacetIndex.selectionsFor(searchQuery).items() if values}
+        if searchQuery.openNow:
+            selections["openNow"] = {"open"}
+        counts: Dict[str, Dict[str, int]] = {facet: {} for facet in extractors}
+
+        matching = []
+        restaurants, hours_index = self.all_restaurants, self.hours_index
+        for position, distance in base_rows:
+            restaurant = restaurants[position]
+            values = {facet: extract(restaurant) for facet, extract in extractors.items() if extract}
+            values["openNow"] = ["open" if hours_index.isOpenAt(position, minute) else "closed"]
+
+            failed = [facet for facet, wanted in selections.items()
+                      if not any(v in wanted for v in values[facet])]
+            if len(failed) > 1:
+                continue
+            counted = failed if failed else extractors
+            for facet in counted:
+                facet_counts = counts[facet]
+                for value in values[facet]:
+                    facet_counts[value] = facet_counts.get(value, 0) + 1
+            if not failed:
+                matching.append((position, distance))
+
+        rows, next_cursor = self._pageRows(matching, searchQuery)
+        results = self._serializeRows(rows, hours_checker, minute)
+        return {
+            "count": len(results),
+            "total": len(matching),
+            "results": results,
+            "nextCursor": next_cursor,
+            "facets": counts,
+        }
+
+# ----------------------------------------------------------------------------
+# TOUR DESIGNER ROUTING HANDLER
+# ----------------------------------------------------------------------------
+
+TOUR_SESSION_HEADER = "X-Session-Id"  # Clients without one share DEFAULT_TOUR_SESSION
+DEFAULT_TOUR_SESSION = "default"
+TOUR_SESSION_MAX_LENGTH = 128
+TOUR_SESSION_IDLE_SECONDS = float(os.environ.get('TOUR_SESSION_IDLE_SECONDS', '86400'))  # Then forgotten
+TOUR_SESSION_SWEEP_INTERVAL = 300.0  # Seconds between idle checks
+
+class TourRoute:
+    """One session's route: restaurant ids in insertion order (a dict used as an ordered set)."""
+    __slots__ = ("lock", "stops", "lastUsed")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stops: Dict[int, None] = {}
+        self.lastUsed = perf_counter()
+
+    def ids(self) -> List[int]:
+        with self.lock:
+            return list(self.stops)
+
+class RoutingHandle:
+    """
+    Tour routes keyed by session. The registry lock is only held to look up,
+    create or expire a session, never while a route is edited; each route has
+    its own lock, so concurrent designers never wait on each other. Reading a
+    session that does not exist does not create it. Restaurants are resolved
+    through the catalogue's id index.
+    """
+
+    def __init__(self, idleSeconds: float = TOUR_SESSION_IDLE_SECONDS):
+        self.routes: Dict[str, TourRoute] = {}
+        self.idleSeconds = idleSeconds
+        self._lock = threading.Lock()
+        self._lastSweep = perf_counter()
+
+    def _route(self, session: str, create: bool = True) -> Optional[TourRoute]:
+        """The session's route, created on first use unless create=False."""
+        with self._lock:
+            # Marked used under the lock, so expireIdle cannot drop it on its way out
+            route = self.routes.setdefault(session, TourRoute()) if create else self.routes.get(session)
+            now = perf_counter()
+            if route is not None:
+                route.lastUsed = now
+            sweep = now - self._lastSweep > TOUR_SESSION_SWEEP_INTERVAL
+        if sweep:
+            self.expireIdle()
+        return route
+
+    def expireIdle(self) -> int:
+        """Forget sessions unused for idleSeconds; returns how many."""
+        with self._lock:
+            now = self._lastSweep = perf_counter()
+            idle = [session for session, route in self.routes.items()
+                    if now - route.lastUsed > self.idleSeconds]
+            for session in idle:
+                del self.routes[session]
+        return len(idle)
+
+    def add_restaurant(self, restaurant_id: int, session: str = DEFAULT_TOUR_SESSION) -> dict:
+        """Add a restaurant to the route by ID"""
+        route = self._route(session)
+        with route.lock:
+            if restaurant_id in route.stops:
+                return {"status": "already_exists", "route": list(route.stops)}
+            route.stops[restaurant_id] = None
+            return {"status": "added", "route": list(route.stops)}
+
+    def remove_restaurant(self, restaurant_id: int, session: str = DEFAULT_TOUR_SESSION) -> dict:
+        """Remove a restaurant from the route"""
+        route = self._route(session)
+        with route.lock:
+            if restaurant_id not in route.stops:
+                return {"status": "not_found", "route": list(route.stops)}
+            del route.stops[restaurant_id]
+            return {"status": "removed", "route": list(route.stops)}
+
+    def get_route(self, session: str = DEFAULT_TOUR_SESSION) -> List[JSONFragment]:
+        """Get full restaurant data for all restaurants in route"""
+        return [restaurant.to_json() for restaurant in self.get_route_restaurants(session)]
+
+    def get_route_restaurants(self, session: str = DEFAULT_TOUR_SESSION) -> List[Restaurant]:
+        """The route's restaurants in order, skipping ids no longer in the data"""
+        route = self._route(session, create=False)
+        if route is None:
+            return []
+        restaurants = current_data().restaurants
+        stops = (restaurants.getById(rest_id) for rest_id in route.ids())
+        return [restaurant for restaurant in stops if restaurant is not None]
+
+    def reorder_route(self, restaurant_ids: List[int], session: str = DEFAULT_TOUR_SESSION) -> dict:
+        """Put the route in the given order; stops added meanwhile stay at the end"""
+        route = self._route(session)
+        with route.lock:
+            stops = {rest_id: None for rest_id in restaurant_ids if rest_id in route.stops}
+            stops.update(route.stops)
+            route.stops = stops
+            return {"status": "reordered", "route": list(stops)}
+
+    def clear_route(self, session: str = DEFAULT_TOUR_SESSION) -> dict:
+        """Clear all restaurants from the route"""
+        route = self._route(session)
+        with route.lock:
+            route.stops.clear()
+        return {"status": "cleared", "route": []}
+
+    def is_in_route(self, restaurant_id: int, session: str = DEFAULT_TOUR_SESSION) -> bool:
+        """Check if a restaurant is in the route"""
+        route = self._route(session, create=False)
+        return route is not None and restaurant_id in route.stops
+
+# ----------------------------------------------------------------------------
+# TOUR ROUTE OPTIMIZATION
+# ----------------------------------------------------------------------------
+
+ROUTE_MATRIX_CACHE_SIZE = 256  # Distinct stop sets whose distance matrix is kept
+
+@lru_cache(maxsize=ROUTE_MATRIX_CACHE_SIZE)
+def distance_matrix(points: Tuple[Tuple[float, float], ...]) -> Tuple[Tuple[float, ...], ...]:
+    """
+    Haversine distance (km) between every pair of (latitude, longitude)
+    points, one NumPy expression when available. Cached by the points, so
+    optimizing the same stops again (e.g. from a new start) skips it.
+    """
+    if NUMPY_AVAILABLE:
+        radians = np.radians(np.array(points, dtype=np.float64).reshape(-1, 2))
+        lat, lon = radians[:, 0], radians[:, 1]
+        a = np.sin((lat[:, None] - lat[None, :]) / 2) ** 2 + \
+            np.outer(np.cos(lat), np.cos(lat)) * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(np.clip(1 - a, 0.0, None)))
+        return tuple(map(tuple, (LocationService.EARTH_RADIUS_KM * c).tolist()))
+    location_service = LocationService()
+    coordinates = [Coordinates(lat, lon) for lat, lon in points]
+    return tuple(tuple(location_service.calculateDistance(a, b) for b in coordinates)
+                 for a in coordinates)
+
+@dataclass
+class TourPlan:
+    order: List[int]  # Indexes into the stops, in visiting order
+    distanceBeforeKm: float  # Walking the stops as given (from the start, if any)
+    distanceAfterKm: float
+
+class TourOptimizer:
+    """
+    Near-optimal visiting order for a walking tour (an open path, so the tour
+    ends at its last stop): nearest-neighbor construction, then 2-opt and
+    Or-opt moves until neither shortens the path. The user's own order is
+    improved the same way, and the shorter result wins, so the plan is never
+    longer than the route as given.
 
-# --- Load the data ---
-DATA_SOURCE = load_data_from_json('data/restaurants.json')
+    Paths are framed by two end nodes, which keeps every move the same in the
+    loops: the fixed start (or a free end) first and a free end last, where a
+    free end is a virtual node at distance 0 from everything.
+    """
+    EPSILON = 1e-9
 
-# Loading data for chatbot
-CHAT_DATA = {}
-DISHES_DATA = {}
-REGIONS_DATA = []
+    def __init__(self, locationService: Optional[LocationService] = None):
+        self.locationService = locationService or LocationService()
 
-try:
-    with open('data/data_chat.json', 'r', encoding='utf-8') as f:
-        CHAT_DATA = json.load(f)
-except FileNotFoundError:
-    print("⚠️ data_chat.json not found")
+    def optimize(self, points: List[Tuple[float, float]],
+                 start: Optional[Coordinates] = None) -> TourPlan:
+        count = len(points)
+        canonical = sorted(range(count), key=points.__getitem__)  # Same stops -> same cache entry
+        matrix = distance_matrix(tuple(points[i] for i in canonical))
+        if start is not None:
+            from_start = [self.locationService.calculateDistance(start, Coordinates(*points[i]))
+                          for i in canonical]
+        else:
+            from_start = [0.0] * count
+        # Node count is the start, count + 1 the free end
+        d = [list(row) + [from_start[i], 0.0] for i, row in enumerate(matrix)]
+        d.append(from_start + [0.0, 0.0])
+        d.append([0.0] * (count + 2))
+        head, tail = (count if start is not None else count + 1), count + 1
 
-try:
-    with open('data/dishes.json', 'r', encoding='utf-8') as f:
-        DISHES_DATA = json.load(f)
-except FileNotFoundError:
-    print("⚠️ dishes.json not found")
+        given = [head] + sorted(range(count), key=canonical.__getitem__) + [tail]
+        before = self.pathLength(d, given)
+        best = None
+        for path in (self.nearestNeighbor(d, head, tail, canonical), given[:]):
+            self.improve(d, path)
+            length = self.pathLength(d, path)
+            if best is None or length < best[0] - self.EPSILON:
+                best = (length, path)
+        return TourPlan(order=[canonical[node] for node in best[1][1:-1]],
+                        distanceBeforeKm=before, distanceAfterKm=best[0])
 
-try:
-    with open('data/regions.json', 'r', encoding='utf-8') as f:
-        REGIONS_DATA = json.load(f).get('regions', [])
-except FileNotFoundError:
-    print("⚠️ regions.json not found")
+    @staticmethod
+    def pathLength(d: List[List[float]], path: List[int]) -> float:
+        return sum(d[a][b] for a, b in zip(path, path[1:]))
 
-#Configure the chatbot:
+    @staticmethod
+    def nearestNeighbor(d: List[List[float]], head: int, tail: int, canonical: List[int]) -> List[int]:
+        """Greedy path from head; from a free end it starts at the southernmost stop."""
+        unvisited = set(range(len(canonical)))
+        path = [head]
+        current = head if head != tail else 0
+        if head == tail and unvisited:
+            path.append(0)
+            unvisited.discard(0)
+        while unvisited:
+            row = d[current]
+            current = min(unvisited, key=row.__getitem__)
+            unvisited.discard(current)
+            path.append(current)
+        path.append(tail)
+        return path
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL = "llama3.2:3b"  # Change to your preferred model
-USE_OLLAMA = True  # Set False to use rule-based only
-OLLAMA_TIMEOUT = 15
+    def improve(self, d: List[List[float]], path: List[int]):
+        """Apply improving 2-opt and Or-opt moves to path in place until none is left."""
+        while self.twoOpt(d, path) | self.orOpt(d, path):
+            pass
 
-# Response cache
-chatbot_cache = {}
+    def twoOpt(self, d: List[List[float]], path: List[int]) -> bool:
+        """Reverse path[i..j] wherever that shortens the path; True if anything changed."""
+        improved = False
+        epsilon = self.EPSILON
+        for i in range(1, len(path) - 2):
+            from_a, from_b = d[path[i - 1]], d[path[i]]
+            kept = from_a[path[i]] - epsilon
+            for j in range(i + 1, len(path) - 1):
+                c, e = path[j], path[j + 1]
+                if from_a[c] + from_b[e] < kept + d[c][e]:
+                    path[i:j + 1] = path[j:i - 1:-1]
+                    from_b, kept = d[c], from_a[c] - epsilon
+                    improved = True
+        return improved
+
+    def orOpt(self, d: List[List[float]], path: List[int]) -> bool:
+        """Move runs of 1-3 stops (either way round) to their cheapest gap; True if anything moved."""
+        improved = False
+        epsilon = self.EPSILON
+        for size in (1, 2, 3):
+            i = 1
+            while i + size < len(path):
+                segment = path[i:i + size]
+                first, last = segment[0], segment[-1]
+                prev, nxt = path[i - 1], path[i + size]
+                from_first, from_last = d[first], d[last]
+                threshold = from_first[prev] + from_last[nxt] - d[prev][nxt] - epsilon
+                rest = path[:i] + path[i + size:]
+                best = None
+                for j in range(len(rest) - 1):
+                    x, y = rest[j], rest[j + 1]
+                    forward = from_first[x] + from_last[y]
+                    backward = from_last[x] + from_first[y]
+                    cost = (forward if forward < backward else backward) - d[x][y]
+                    if cost < threshold and j != i - 1:  # j == i - 1 is where the run already is
+                        threshold = cost
+                        best = (j, backward < forward)
+                if best is None:
+                    i += 1
+                    continue
+                j, reverse = best
+                path[:] = rest[:j + 1] + (segment[::-1] if reverse else segment) + rest[j + 1:]
+                improved = True
+        return improved
 
 # ----------------------------------------------------------------------------
-# SERVICE CLASS
+# ALONG-THE-ROUTE SUGGESTIONS
 # ----------------------------------------------------------------------------
 
-class SearchService:
-    def __init__(self, locationService: LocationService, hoursChecker: HoursChecker):
-        self.locationService = locationService
-        self.hoursChecker = hoursChecker
-        self.all_restaurants = DATA_SOURCE
+SUGGEST_CORRIDOR_METERS = 300  # Default distance from the route line
+SUGGEST_MAX_CORRIDOR_METERS = 2000
+SUGGEST_LIMIT = 10
+SUGGEST_DETOUR_KM_PER_STAR = 0.5  # Ranking: one rating star is worth this much extra walking
 
-    def _applyFilters(self, restaurants: List[Restaurant], query: SearchQuery) \
-                      -> List[Tuple[Restaurant, float, str]]:
-        filtered_results = []
-        
-        for restaurant in restaurants:
-            passes_filters = True
-            
-            # Text Filter
-            if query.queryText:
-                query_lower = query.queryText.lower()
-                in_name = query_lower in restaurant.getName().lower()
-                in_tags = any(query_lower in tag.lower() for tag in restaurant.getTags())
-                if not (in_name or in_tags):
-                    passes_filters = False
-
-            # OpenHours Filter
-            is_open, open_status_text = self.hoursChecker.isOpen(restaurant.getOpenHours())
-            if query.openNow and not is_open:
-                passes_filters = False
-                
-            # Cuisine Filter
-            if query.cuisines:
-                if not any(c in restaurant.getCuisines() for c in query.cuisines):
-                    passes_filters = False
-
-            # --- ADDED: Special Requirements Filter ---
-            if query.specialFlags:
-                if not any(f in restaurant.getSpecialFlags() for f in query.specialFlags):
-                    passes_filters = False
-
-            # --- ADDED: Price Filter ---
-            price = restaurant.getAveragePrice()
-            if query.priceRange == "low" and price >= 25000:
-                passes_filters = False
-            elif query.priceRange == "mid" and (price < 25000 or price > 50000):
-                passes_filters = False
-            elif query.priceRange == "high" and price <= 50000:
-                passes_filters = False
+class CorridorSearch:
+    """
+    Restaurants within a corridor around the polyline joining a route's
+    stops. Each leg is cut into pieces at most two corridor widths long, and
+    the spatial index is asked for a circle around each piece, so candidates
+    stay near the line however long the legs are. Candidates are then checked
+    exactly (distance to the leg, in a local flat projection) and measured by
+    their detour: the extra walking to visit them between the leg's stops.
+    """
 
-            # Distance Filter
-            distance = self.locationService.calculateDistance(
-                query.userLocation, restaurant.getLocation()
-            )
-            # Use the radiusKm from the query
-            if query.radiusKm and distance > query.radiusKm:
-                passes_filters = False
+    def __init__(self, locationService: LocationService):
+        self.locationService = locationService
 
-            if passes_filters:
-                # Store with distance and open status
-                filtered_results.append((restaurant, distance, open_status_text))
-                
-        return filtered_results
+    # Read through the request's data version, like SearchService
+    @property
+    def all_restaurants(self) -> List[Restaurant]: return current_data().restaurants
+    @property
+    def spatial_index(self) -> SpatialGridIndex: return current_data().spatial_index
+    @property
+    def columnar_store(self) -> Optional[ColumnarRestaurantStore]: return current_data().columnar_store
 
-    def _sortResults(self, results: List[Tuple[Restaurant, float, str]],
-                     sortBy: str) -> List[Tuple[Restaurant, float, str]]:
-        if sortBy == "rating":
-            results.sort(key=lambda item: item[0].getRating(), reverse=True)
-        elif sortBy == "distance":
-            results.sort(key=lambda item: item[1])
-        return results
+    def legCandidates(self, start: Coordinates, end: Coordinates, corridorKm: float) -> Set[int]:
+        """Positions possibly within corridorKm of the leg start -> end."""
+        length = self.locationService.calculateDistance(start, end)
+        pieces = max(1, math.ceil(length / (2 * corridorKm)))
+        radius = length / pieces / 2 + corridorKm
+        positions: Set[int] = set()
+        spatial_index = self.spatial_index
+        for piece in range(pieces):
+            t = (piece + 0.5) / pieces
+            center = Coordinates(start.latitude + (end.latitude - start.latitude) * t,
+                                 start.longitude + (end.longitude - start.longitude) * t)
+            positions.update(spatial_index.candidatePositions(center, radius))
+        return positions
 
-    def filterRestaurants(self, searchQuery: SearchQuery) -> List[dict]:
-        passing_restaurants = self._applyFilters(self.all_restaurants, searchQuery)
-        sorted_restaurants = self._sortResults(passing_restaurants, searchQuery.sortBy)
-        
-        # Convert to JSON-serializable dictionaries
-        final_list = []
-        for restaurant, distance, open_status_text in sorted_restaurants:
-            res_dict = restaurant.to_dict()
-            # Update with dynamic data
-            res_dict['calculated_distance_km'] = round(distance, 1)
-            res_dict['open_status_text'] = open_status_text
-            # Use real distance for display
-            res_dict['distance_text'] = f"{round(distance, 1)} km" 
-            final_list.append(res_dict)
-            
-        return final_list
+    def _measureLeg(self, start: Coordinates, end: Coordinates, positions: List[int],
+                    corridorKm: float) -> List[Tuple[int, float, float]]:
+        """(position, detourKm, offRouteKm) for the positions within corridorKm of the leg."""
+        kx = LocationService.KM_PER_DEGREE * math.cos(math.radians(start.latitude))
+        ky = LocationService.KM_PER_DEGREE
+        bx, by = (end.longitude - start.longitude) * kx, (end.latitude - start.latitude) * ky
+        length_sq = bx * bx + by * by
+        leg_km = self.locationService.calculateDistance(start, end)
+        store = self.columnar_store
+        if store is not None:
+            positions = np.asarray(positions, dtype=np.intp)
+            px = (store.longitude[positions] - start.longitude) * kx
+            py = (store.latitude[positions] - start.latitude) * ky
+            t = np.clip((px * bx + py * by) / length_sq, 0.0, 1.0) if length_sq else np.zeros(len(positions))
+            off_route = np.hypot(px - t * bx, py - t * by)
+            near = off_route <= corridorKm
+            positions, off_route = positions[near], off_route[near]
+            detours = store.distancesKm(start, positions) + store.distancesKm(end, positions) - leg_km
+            detours = np.round(np.maximum(detours, 0.0), 6)  # To the mm, so both paths rank alike
+            return list(zip(positions.tolist(), detours.tolist(), off_route.tolist()))
+        measured = []
+        restaurants = self.all_restaurants
+        for position in positions:
+            location = restaurants[position].getLocation()
+            px = (location.longitude - start.longitude) * kx
+            py = (location.latitude - start.latitude) * ky
+            t = min(1.0, max(0.0, (px * bx + py * by) / length_sq)) if length_sq else 0.0
+            off_route = math.hypot(px - t * bx, py - t * by)
+            if off_route <= corridorKm:
+                detour = self.locationService.calculateDistance(start, location) + \
+                    self.locationService.calculateDistance(location, end) - leg_km
+                measured.append((position, round(max(detour, 0.0), 6), off_route))
+        return measured
+
+    def suggest(self, stops: List[Coordinates], corridorKm: float,
+                limit: int) -> List[Tuple[int, int, float, float]]:
+        """
+        Best `limit` restaurants along the route, as (position, leg, detourKm,
+        offRouteKm) where leg i joins stops[i] and stops[i + 1]. Each restaurant
+        is counted on its cheapest leg; ranked by rating minus detour (see
+        SUGGEST_DETOUR_KM_PER_STAR), then catalogue order.
+        """
+        best: Dict[int, Tuple[int, float, float]] = {}
+        for leg, (start, end) in enumerate(zip(stops, stops[1:])):
+            candidates = list(self.legCandidates(start, end, corridorKm))
+            for position, detour, off_route in self._measureLeg(start, end, candidates, corridorKm):
+                if position not in best or detour < best[position][1]:
+                    best[position] = (leg, detour, off_route)
+        positions = list(best)
+        store = self.columnar_store
+        if store is not None:
+            ratings = store.rating[np.asarray(positions, dtype=np.intp)].tolist()
+        else:
+            restaurants = self.all_restaurants
+            ratings = [restaurants[p].getRating() for p in positions]
+        scores = (best[p][1] / SUGGEST_DETOUR_KM_PER_STAR - rating for p, rating in zip(positions, ratings))
+        return [(p,) + best[p] for _, p in heapq.nsmallest(limit, zip(scores, positions))]
 
 # ----------------------------------------------------------------------------
-# TOUR DESIGNER ROUTING HANDLER
+# MULTI-DAY TOUR PLANNER
 # ----------------------------------------------------------------------------
 
-class RoutingHandle:
-    def __init__(self):
-        self.route_restaurants = []  # List to store restaurant IDs in route
-    
-    def add_restaurant(self, restaurant_id: int) -> dict:
-        """Add a restaurant to the route by ID"""
-        if restaurant_id not in self.route_restaurants:
-            self.route_restaurants.append(restaurant_id)
-            return {"status": "added", "route": self.route_restaurants}
-        return {"status": "already_exists", "route": self.route_restaurants}
-    
-    def remove_restaurant(self, restaurant_id: int) -> dict:
-        """Remove a restaurant from the route"""
-        if restaurant_id in self.route_restaurants:
-            self.route_restaurants.remove(restaurant_id)
-            return {"status": "removed", "route": self.route_restaurants}
-        return {"status": "not_found", "route": self.route_restaurants}
-    
-    def get_route(self) -> List[dict]:
-        """Get full restaurant data for all restaurants in route"""
-        result = []
-        for rest_id in self.route_restaurants:
-            for restaurant in DATA_SOURCE:
-                if restaurant.getId() == rest_id:
-                    result.append(restaurant.to_dict())
+TOUR_MAX_DAYS = 7
+TOUR_DAY_START = "08:00"
+TOUR_DAY_END = "22:00"  # Every visit of a day must be over by then
+TOUR_MINUTES_PER_STOP = 60
+TOUR_TRAVEL_KMH = 15.0  # Motorbike/taxi pace through city traffic
+TOUR_BREAKFAST_CLOSE = 11 * 60  # Places closing by 11:00 are breakfast stops
+TOUR_MORNING_CLOSE = 14 * 60  # Places closing by 14:00 are morning stops (breakfast and lunch)
+TOUR_EVENING_OPEN = 15 * 60  # Places opening from 15:00 are evening stops
+TOUR_CLUSTER_RESTARTS = 4
+TOUR_CLUSTER_ITERATIONS = 25
+TOUR_SLOTS = ("breakfast", "morning", "day", "evening")  # Order of the stops within a day
+
+@dataclass
+class PlannedStop:
+    restaurant: Restaurant
+    slot: str  # One of TOUR_SLOTS
+    arrivalMinute: int  # Minutes after midnight of the tour day, always before the day's end
+    openOnArrival: Optional[bool]  # None when the opening hours are unknown
+
+    @property
+    def arrivalTime(self) -> str:
+        return f"{self.arrivalMinute // 60:02d}:{self.arrivalMinute % 60:02d}"
+
+@dataclass
+class DayPlan:
+    stops: List[PlannedStop]
+    distanceKm: float
+    unscheduled: List[Restaurant] = field(default_factory=list)  # Assigned to the day, but past its end
+
+class TourPlanner:
+    """
+    Splits a route into days. Stops are grouped with balanced k-means on a
+    local flat projection: each day takes at most ceil(stops / days) of them,
+    and breakfast, morning and evening places are spread evenly too, so no
+    day gets more breakfast stops than its morning can hold. Each day visits
+    its stops slot by slot (TOUR_SLOTS), each slot in the order TourOptimizer
+    finds, and the day is then timed from its start; stops that would end
+    after the day's end are returned as unscheduled instead.
+    """
+
+    def __init__(self, optimizer: TourOptimizer, locationService: LocationService):
+        self.optimizer = optimizer
+        self.locationService = locationService
+
+    @staticmethod
+    def slotOf(openHours: str) -> str:
+        schedule = compile_open_hours(openHours)
+        if schedule is None:
+            return "day"  # Unknown or irregular hours: no constraint
+        open_minute, close_minute = schedule
+        if open_minute >= TOUR_EVENING_OPEN:
+            return "evening"
+        if close_minute <= open_minute:
+            return "day"  # Open past midnight from a morning or afternoon opening
+        if open_minute < close_minute <= TOUR_BREAKFAST_CLOSE:
+            return "breakfast"
+        if open_minute < close_minute <= TOUR_MORNING_CLOSE:
+            return "morning"
+        return "day"
+
+    def plan(self, stops: List[Restaurant], days: int, start: Optional[Coordinates] = None,
+             dayStartMinute: int = 8 * 60, minutesPerStop: int = TOUR_MINUTES_PER_STOP,
+             dayEndMinute: int = 22 * 60) -> List[DayPlan]:
+        """Exactly `days` plans (some empty when there are fewer stops than days)."""
+        points = [(r.getLatitude(), r.getLongitude()) for r in stops]
+        slots = [self.slotOf(r.getOpenHours()) for r in stops]
+        groups = self.cluster(points, slots, days)
+        return [self._scheduleDay([stops[i] for i in self._orderDay(group, points, slots, start)],
+                                  start, dayStartMinute, minutesPerStop, dayEndMinute)
+                for group in groups]
+
+    def cluster(self, points: List[Tuple[float, float]], slots: List[str], days: int) -> List[List[int]]:
+        """Stop indexes of each day, days in route order of their first stop."""
+        count = len(points)
+        k = min(days, count)
+        if k == 0:
+            return [[] for _ in range(days)]
+        kx = LocationService.KM_PER_DEGREE * math.cos(math.radians(sum(p[0] for p in points) / count))
+        ky = LocationService.KM_PER_DEGREE
+        xy = [(lng * kx, lat * ky) for lat, lng in points]
+        capacity = math.ceil(count / k)
+        slot_capacity = {slot: math.ceil(slots.count(slot) / k) for slot in TOUR_SLOTS}
+        slot_capacity["day"] = capacity
+
+        best = None
+        for restart in range(min(TOUR_CLUSTER_RESTARTS, count)):
+            centers = self._seedCenters(xy, k, restart * count // min(TOUR_CLUSTER_RESTARTS, count))
+            assignment = None
+            for _ in range(TOUR_CLUSTER_ITERATIONS):
+                updated = self._assign(xy, centers, slots, capacity, slot_capacity)
+                if updated == assignment:
                     break
-        return result
-    
-    def clear_route(self) -> dict:
-        """Clear all restaurants from the route"""
-        self.route_restaurants = []
-        return {"status": "cleared", "route": self.route_restaurants}
-    
-    def is_in_route(self, restaurant_id: int) -> bool:
-        """Check if a restaurant is in the route"""
-        return restaurant_id in self.route_restaurants
+                assignment = updated
+                for c in range(k):
+                    members = [xy[i] for i in range(count) if assignment[i] == c]
+                    if members:  # An emptied day keeps its center; capacity refills it
+                        centers[c] = (sum(x for x, _ in members) / len(members),
+                                      sum(y for _, y in members) / len(members))
+            cost = sum(math.dist(xy[i], centers[assignment[i]]) for i in range(count))
+            if best is None or cost < best[0] - 1e-9:
+                best = (cost, assignment)
+
+        groups = [[i for i in range(count) if best[1][i] == c] for c in range(k)]
+        groups.sort(key=lambda group: group[0] if group else count)
+        return groups + [[] for _ in range(days - k)]
+
+    @staticmethod
+    def _seedCenters(xy: List[Tuple[float, float]], k: int, first: int) -> List[Tuple[float, float]]:
+        """
+        Farthest-first seeding from xy[first]: each next center is the stop
+        farthest from the chosen ones. Stops sharing a location can only seed
+        one center; with fewer distinct locations than k, centers repeat.
+        """
+        centers = [xy[first]]
+        nearest = [math.dist(point, xy[first]) for point in xy]
+        while len(centers) < k:
+            chosen = max(range(len(xy)), key=nearest.__getitem__)
+            if nearest[chosen] == 0:
+                centers.append(centers[len(centers) % len(set(centers))])
+                continue
+            centers.append(xy[chosen])
+            nearest = [min(d, math.dist(point, xy[chosen])) for d, point in zip(nearest, xy)]
+        return centers
+
+    @staticmethod
+    def _assign(xy: List[Tuple[float, float]], centers: List[Tuple[float, float]], slots: List[str],
+                capacity: int, slotCapacity: Dict[str, int]) -> List[int]:
+        """
+        Capacity-constrained nearest-center assignment. Stops with a time slot
+        go first, then the stops that lose most by missing their nearest
+        center.
+        """
+        distances = [[math.dist(point, center) for center in centers] for point in xy]
+        preferences = [sorted(range(len(centers)), key=row.__getitem__) for row in distances]
+
+        def priority(i):
+            first, second = (preferences[i] + preferences[i])[:2]
+            return slots[i] == "day", distances[i][first] - distances[i][second], i  # Biggest regret first
+
+        load = [0] * len(centers)
+        slot_load: Dict[Tuple[str, int], int] = {}
+        assignment = [0] * len(xy)
+        for i in sorted(range(len(xy)), key=priority):
+            open_centers = [c for c in preferences[i] if load[c] < capacity]
+            choice = next((c for c in open_centers
+                           if slot_load.get((slots[i], c), 0) < slotCapacity[slots[i]]), open_centers[0])
+            assignment[i] = choice
+            load[choice] += 1
+            slot_load[(slots[i], choice)] = slot_load.get((slots[i], choice), 0) + 1
+        return assignment
+
+    def _orderDay(self, group: List[int], points: List[Tuple[float, float]], slots: List[str],
+                  start: Optional[Coordinates]) -> List[int]:
+        ordered: List[int] = []
+        position = start
+        for slot in TOUR_SLOTS:
+            members = [i for i in group if slots[i] == slot]
+            plan = self.optimizer.optimize([points[i] for i in members], position)
+            ordered += [members[j] for j in plan.order]
+            if ordered:
+                position = Coordinates(*points[ordered[-1]])
+        return ordered
+
+    def _scheduleDay(self, stops: List[Restaurant], start: Optional[Coordinates],
+                     dayStartMinute: int, minutesPerStop: int, dayEndMinute: int) -> DayPlan:
+        """
+        Arrival times from dayStartMinute. A place that is closed on arrival
+        but opens later the same day, including an overnight place in its
+        closed gap (e.g. 16:00 at "18:00 - 02:00"), is waited for; one that
+        has already closed is not. The first stop whose visit would end after
+        dayEndMinute and every stop after it are left unscheduled.
+        """
+        planned = []
+        minute = float(dayStartMinute)
+        distance_km = 0.0
+        previous = start
+        for index, restaurant in enumerate(stops):
+            location = restaurant.getLocation()
+            leg_km = 0.0 if previous is None else self.locationService.calculateDistance(previous, location)
+            arrival = minute + leg_km / TOUR_TRAVEL_KMH * 60
+            schedule = compile_open_hours(restaurant.getOpenHours())
+            if schedule is not None and arrival < schedule[0] \
+                    and not HoursChecker.isOpenAt(schedule, arrival):
+                arrival = float(schedule[0])  # Wait for it to open
+            if arrival + minutesPerStop > dayEndMinute:
+                return DayPlan(stops=planned, distanceKm=distance_km, unscheduled=stops[index:])
+            open_on_arrival = HoursChecker.isOpenAt(schedule, round(arrival)) if schedule else None
+            planned.append(PlannedStop(restaurant, self.slotOf(restaurant.getOpenHours()),
+                                       round(arrival), open_on_arrival))
+            distance_km += leg_km
+            minute = arrival + minutesPerStop
+            previous = location
+        return DayPlan(stops=planned, distanceKm=distance_km)
 
 # ----------------------------------------------------------------------------
 # SIMPLE SEARCH SERVICE FOR TOUR DESIGNER
@@ -360,63 +3206,98 @@ class RoutingHandle:
 class SimpleSearchQuery:
     queryText: str = ""
     searchBy: str = "all"  # Options: "name", "tags", "address", "all"
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    similarityThreshold: float = TRIGRAM_THRESHOLD  # Fuzzy fallback when nothing matches exactly; 0 disables
 
 class SimpleSearchService:
-    def __init__(self):
-        self.all_restaurants = DATA_SOURCE
+    # Read through the request's data version, like SearchService
+    @property
+    def all_restaurants(self) -> List[Restaurant]: return current_data().restaurants
+    @property
+    def text_index(self) -> TextSearchIndex: return current_data().text_index
+    @property
+    def trigram_index(self) -> TrigramIndex: return current_data().trigram_index
 
-    def _matchesQuery(self, restaurant: Restaurant, query: SimpleSearchQuery) -> tuple[bool, str]:
+    def _matchingPositions(self, query: SimpleSearchQuery, after: Optional[tuple] = None,
+                           limit: Optional[int] = None) -> List[Tuple[tuple, int, str]]:
         """
-        Check if restaurant matches the search query based on searchBy field.
-        Returns: (matches: bool, match_field: str)
+        Resolve the query against the inverted text index based on searchBy,
+        falling back to the trigram index when nothing matches exactly.
+        Only results whose sort key is after `after` are considered; with a
+        limit, the first `limit` of them are picked with a heap instead of
+        sorting every match.
+        Returns: [(sort_key, position, match_field)] in result order - catalogue
+        order for exact matches, most similar first for fuzzy ones
         """
-        if not query.queryText:
-            return True, ""
-        
-        query_lower = query.queryText.lower()
-        
-        # Search by name only
-        if query.searchBy == "name":
-            matches = query_lower in restaurant.getName().lower()
-            return matches, "name" if matches else ""
-        
-        # Search by tags only
-        elif query.searchBy == "tags":
-            matches = any(query_lower in tag.lower() for tag in restaurant.getTags())
-            return matches, "tags" if matches else ""
-        
-        # Search all fields (default)
-        else:
-            in_name = query_lower in restaurant.getName().lower()
-            in_tags = any(query_lower in tag.lower() for tag in restaurant.getTags())
-            
-            matches = in_name or in_tags
-            
-            # Determine which field matched
-            if in_name:
-                match_field = "name"
-            elif in_tags:
-                match_field = "tags"
-            else:
-                match_field = ""
-            
-            return matches, match_field
+        fields = (query.searchBy,) if query.searchBy in ("name", "tags", "address") else ("name", "tags")
+        matches = self.text_index.search(query.queryText, fields)
+        if matches is None:
+            matches = range(len(self.all_restaurants))
+        elif not matches and query.similarityThreshold:
+            return self._fuzzyMatches(query, fields, after, limit)
+        if after is not None and len(after) != 1:
+            raise ValueError("Cursor does not belong to this query")
+        after_position = after[0] if after is not None else -1
+        remaining = (p for p in matches if p > after_position)
+        positions = heapq.nsmallest(limit, remaining) if limit is not None else sorted(remaining)
+
+        if not query.queryText or not query.queryText.strip():
+            return [((p,), p, "") for p in positions]
+        if len(fields) == 1:
+            return [((p,), p, query.searchBy) for p in positions]
+
+        # Search all fields (default): determine which field matched
+        in_name = self.text_index.search(query.queryText, ("name",)) or set()
+        return [((p,), p, "name" if p in in_name else "tags") for p in positions]
+
+    def _fuzzyMatches(self, query: SimpleSearchQuery, fields: Tuple[str, ...], after: Optional[tuple],
+                      limit: Optional[int]) -> List[Tuple[tuple, int, str]]:
+        """Trigram matches keyed (-similarity, position), continuing after `after`."""
+        if after is not None and len(after) != 2:
+            raise ValueError("Cursor does not belong to this query")
+        ranked = (((-round(score, 6), p), p, match_field) for p, match_field, score
+                  in self.trigram_index.search(query.queryText, query.similarityThreshold, fields))
+        remaining = [m for m in ranked if after is None or m[0] > after]
+        return remaining[:limit] if limit is not None else remaining
 
-    def search(self, query: SimpleSearchQuery) -> List[dict]:
+    def search(self, query: SimpleSearchQuery) -> List[JSONFragment]:
         """
-        Main search method - filters restaurants by name or tags.
+        Main search method - filters restaurants by name, tags or address.
         """
-        results = []
-        
-        for restaurant in self.all_restaurants:
-            matches, match_field = self._matchesQuery(restaurant, query)
-            
-            if matches:
-                res_dict = restaurant.to_dict()
-                res_dict['match_field'] = match_field  # Shows where the match was found
-                results.append(res_dict)
-        
-        return results
+        return self.searchPage(query)[0]
+
+    def searchPage(self, query: SimpleSearchQuery) -> Tuple[List[JSONFragment], Optional[str]]:
+        """
+        Like search(), but honours limit/cursor and returns the next cursor.
+        Raises ValueError for a bad cursor.
+        """
+        results, next_cursor = self.iterPage(query)
+        return list(results), next_cursor
+
+    def iterPage(self, query: SimpleSearchQuery) -> Tuple[Iterator[JSONFragment], Optional[str]]:
+        """
+        searchPage() with lazily serialized results, for streaming responses.
+        The cursor is validated eagerly, so ValueError is raised here.
+        """
+        digest = hashlib.md5(json.dumps([query.queryText, query.searchBy, query.similarityThreshold])
+                             .encode('utf-8')).hexdigest()[:16]
+        after = decode_cursor(query.cursor, digest) if query.cursor else None
+        fetch = query.limit + 1 if query.limit is not None else None
+        matched = self._matchingPositions(query, after=after, limit=fetch)
+
+        next_cursor = None
+        if query.limit is not None and len(matched) > query.limit:
+            matched = matched[:query.limit]
+            next_cursor = encode_cursor(matched[-1][0], digest)
+
+        def serialize():
+            restaurants = self.all_restaurants
+            for _, position, match_field in matched:
+                # match_field shows where the match was found
+                yield restaurants[position].to_json(match_field=match_field)
+
+        return serialize(), next_cursor
 
 # ----------------------------------------------------------------------------
 # FLASK API ENDPOINT
@@ -427,28 +3308,65 @@ location_service = LocationService()
 hours_checker = HoursChecker() 
 search_service = SearchService(location_service, hours_checker)
 routing_handler = RoutingHandle()
+tour_optimizer = TourOptimizer(location_service)
+corridor_search = CorridorSearch(location_service)
+tour_planner = TourPlanner(tour_optimizer, location_service)
 simple_search_service = SimpleSearchService()
+DATA_STORE.subscribe(lambda version: search_service.result_cache.clear())
+
+# All routes live on this blueprint; create_app() builds the Flask app around it
+api = Blueprint("api", __name__)
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+def wants_ndjson() -> bool:
+    """Streaming is opt-in: the client must ask for NDJSON in its Accept header."""
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def tour_session() -> str:
+    """The caller's tour session, from the X-Session-Id header. Raises ValueError if malformed."""
+    session = request.headers.get(TOUR_SESSION_HEADER, "").strip()
+    if not session:
+        return DEFAULT_TOUR_SESSION
+    if len(session) > TOUR_SESSION_MAX_LENGTH or not session.isprintable():
+        raise ValueError(f"{TOUR_SESSION_HEADER} must be at most {TOUR_SESSION_MAX_LENGTH} printable characters")
+    return session
+
+def json_response(payload) -> Response:
+    """Like jsonify(), but splices pre-serialized JSONFragment values in as-is."""
+    return Response(encode_json(payload), mimetype="application/json")
+
+def ndjson_response(items: Iterable, next_cursor: Optional[str] = None) -> Response:
+    """One JSON document per line, produced as the generator is consumed."""
+    def generate():
+        for item in items:
+            yield encode_json(item) + b"\n"
 
-# Create the Flask app
-app = Flask(__name__)
-CORS(app)  # Allow cross-origin requests
+    response = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
-@app.route("/", methods=['GET'])
+@api.route("/", methods=['GET'])
 def home():
     # This tells Flask to look in the "templates/" folder for "index.html"
     return render_template("index.html")
 
-# Define the API endpoint for searching
-@app.route("/api/search", methods=['POST'])
-def handle_search():
-    data = request.json
-    
+def parse_search_query(data: dict) -> SearchQuery:
+    """Build a SearchQuery from a request body; ValueError on invalid input."""
+    at_time = None
+    if data.get('atTime'):
+        try:
+            at_time = datetime.strptime(data['atTime'], "%H:%M").time()
+        except (ValueError, TypeError):
+            raise ValueError("atTime must be formatted as HH:MM")
+
     # Default User Location (Ben Thanh Market)
     user_location = Coordinates(
         latitude=data.get('userLatitude', 10.7725),
         longitude=data.get('userLongitude', 106.6980)
     )
-    
+
     query = SearchQuery(
         userLocation=user_location,
         queryText=data.get('queryText', ''),
@@ -457,29 +3375,160 @@ def handle_search():
         cuisines=data.get('cuisines', []),
         sortBy=data.get('sortBy', 'distance'),
         radiusKm=data.get('radiusKm', 10.0),
-        specialFlags=data.get('specialFlags', [])
+        specialFlags=data.get('specialFlags', []),
+        dishTypes=data.get('dishTypes', []),
+        flavorProfiles=data.get('flavorProfiles', []),
+        atTime=at_time,
+        limit=parse_page_size(data.get('limit')),
+        cursor=data.get('cursor'),
+        similarityThreshold=parse_similarity_threshold(data.get('similarityThreshold'))
     )
-    
-    results = search_service.filterRestaurants(query)
-    
-    return jsonify(results)
+    if query.cursor and query.limit is None:
+        query.limit = MAX_PAGE_SIZE
+    return query
+
+# Define the API endpoint for searching
+@api.route("/api/search", methods=['POST'])
+def handle_search():
+    data = request.json
+
+    plan = QueryPlan() if data.get('explain') else None
+    try:
+        query = parse_search_query(data)
+        if wants_ndjson() and plan is None:
+            rows, next_cursor, checker, minute = search_service.searchRows(query, lazy=True)
+            return ndjson_response(search_service.iterSerialized(rows, checker, minute), next_cursor)
+        results, next_cursor = search_service.searchPage(query, plan)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Paged or explained requests get an envelope; plain requests keep the bare list
+    if plan is not None:
+        return json_response({"count": len(results), "results": results, "nextCursor": next_cursor,
+                              "explain": plan.to_dict(), "plannerStats": search_service.planner.stats()})
+    if query.limit is not None:
+        return json_response({"count": len(results), "results": results, "nextCursor": next_cursor})
+    return json_response(results)
+
+MAX_BATCH_QUERIES = 50
+
+@api.route("/api/search/batch", methods=['POST'])
+def handle_search_batch():
+    """
+    Request JSON body: {"queries": [<same body as /api/search>, ...]}
+    Returns an array in request order: [{"count", "results", "nextCursor"}, ...]
+    """
+    data = request.json
+    payloads = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(payloads) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+
+    queries = []
+    for index, payload in enumerate(payloads):
+        try:
+            queries.append(parse_search_query(payload))
+        except (ValueError, AttributeError) as e:
+            return jsonify({"error": f"queries[{index}]: {e}"}), 400
+
+    try:
+        responses = search_service.searchBatch(queries)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return json_response([
+        {"count": len(results), "results": results, "nextCursor": next_cursor}
+        for results, next_cursor in responses
+    ])
+
+@api.route("/api/search/facets", methods=['POST'])
+def handle_search_facets():
+    """
+    Same request body as /api/search. Returns the results plus facet counts:
+    {"count", "total", "results", "nextCursor",
+     "facets": {"cuisines": {"Vietnamese": 12, ...}, "specialFlags": {...},
+                "priceRange": {"low": 3, ...}, "dishType": {...},
+                "flavorProfile": {...}, "openNow": {"open": 9, "closed": 4}}}
+    """
+    data = request.json
+
+    try:
+        query = parse_search_query(data)
+        return json_response(search_service.searchWithFacets(query))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@api.route("/api/search/cache", methods=['GET'])
+def search_cache_stats():
+    """Hit/miss counters of the search result cache"""
+    return jsonify(search_service.result_cache.stats())
+
+@api.route("/api/autocomplete", methods=['GET'])
+def autocomplete():
+    """
+    Prefix suggestions for a search box: /api/autocomplete?q=banh%20m&limit=8
+    Each suggestion is {"text", "type"} plus "id" for restaurants, dishes and regions.
+    """
+    limit = request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int)
+    if not 1 <= limit <= AUTOCOMPLETE_MAX_LIMIT:
+        return jsonify({"error": f"limit must be an integer between 1 and {AUTOCOMPLETE_MAX_LIMIT}"}), 400
+    return json_response(current_data().autocomplete_index.suggest(request.args.get('q', ''), limit))
 
 # Health check endpoint
-@app.route("/api/health", methods=['GET'])
+@api.route("/api/health", methods=['GET'])
 def health_check():
     return jsonify({"status": "Culinary Compass API is running!"})
 
+# ----------------------------------------------------------------------------
+# ADMIN API ENDPOINTS
+# ----------------------------------------------------------------------------
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def admin_allowed() -> bool:
+    """With ADMIN_TOKEN set, callers must send it as X-Admin-Token; otherwise only local callers."""
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@api.route("/api/admin/data", methods=['GET'])
+def get_data_version():
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(current_data().stats())
+
+@api.route("/api/admin/reload", methods=['POST'])
+def reload_data():
+    """
+    Rebuild from data/*.json if anything changed ({"force": true} to rebuild
+    regardless, e.g. to retry files whose last build failed). The rebuild runs
+    on this request's thread; other requests keep the current version meanwhile.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if DATA_STORE.shared is not None:
+        # Workers only follow the loader: ask it to republish, then pick that up on the next poll
+        os.kill(DATA_STORE.shared.loaderPid, signal.SIGHUP)
+        return jsonify({"status": "requested", "data": current_data().stats()}), 202
+    force = bool((request.get_json(silent=True) or {}).get('force'))
+    result = DATA_STORE.reload(force=force)
+    return jsonify(result), 500 if result["status"] == "failed" else 200
+
 # ----------------------------------------------------------------------------
 # TOUR DESIGNER API ENDPOINTS
 # ----------------------------------------------------------------------------
 
-@app.route("/api/tour/search", methods=['POST'])
+@api.route("/api/tour/search", methods=['POST'])
 def handle_tour_search():
     """   
     Request JSON body:
     {
         "queryText": "phở",
-        "searchBy": "tags"  // Options: "name", "tags", "all"
+        "searchBy": "tags",  // Options: "name", "tags", "address", "all"
+        "limit": 20,         // Optional page size
+        "cursor": "...",     // Optional nextCursor from the previous page
+        "similarityThreshold": 0.5  // Optional; typo-tolerant fallback, 0 disables
     }
     """
     data = request.json
@@ -488,25 +3537,38 @@ def handle_tour_search():
         queryText=data.get('queryText', ''),
         searchBy=data.get('searchBy', 'all')
     )
+
+    try:
+        query.limit = parse_page_size(data.get('limit'))
+        if data.get('cursor') and query.limit is None:
+            query.limit = MAX_PAGE_SIZE
+        query.cursor = data.get('cursor')
+        query.similarityThreshold = parse_similarity_threshold(data.get('similarityThreshold'))
+        if wants_ndjson():
+            return ndjson_response(*simple_search_service.iterPage(query))
+        results, next_cursor = simple_search_service.searchPage(query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    results = simple_search_service.search(query)
-    
-    return jsonify({
+    return json_response({
         "query": query.queryText,
         "searchBy": query.searchBy,
         "count": len(results),
-        "results": results
+        "results": results,
+        "nextCursor": next_cursor
     })
 
-@app.route("/api/tour/restaurants", methods=['GET'])
+@api.route("/api/tour/restaurants", methods=['GET'])
 def get_all_tour_restaurants():
     """Get all restaurants data for tour designer"""
-    results = [r.to_dict() for r in simple_search_service.all_restaurants]
-    return jsonify(results)
+    if wants_ndjson():
+        return ndjson_response(r.to_json() for r in simple_search_service.all_restaurants)
+    results = [r.to_json() for r in simple_search_service.all_restaurants]
+    return json_response(results)
 
-@app.route("/api/tour/route/add", methods=['POST'])
+@api.route("/api/tour/route/add", methods=['POST'])
 def add_to_tour_route():
-    """Add a restaurant to the route
+    """Add a restaurant to the caller's route (X-Session-Id header)
     Request JSON: {"restaurant_id": 1}
     """
     data = request.json
@@ -514,13 +3576,19 @@ def add_to_tour_route():
     
     if restaurant_id is None:
         return jsonify({"error": "Missing restaurant_id"}), 400
+    if not isinstance(restaurant_id, int) or isinstance(restaurant_id, bool):
+        return jsonify({"error": "restaurant_id must be an integer"}), 400
+    try:
+        session = tour_session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    result = routing_handler.add_restaurant(restaurant_id)
+    result = routing_handler.add_restaurant(restaurant_id, session)
     return jsonify(result)
 
-@app.route("/api/tour/route/remove", methods=['POST'])
+@api.route("/api/tour/route/remove", methods=['POST'])
 def remove_from_tour_route():
-    """Remove a restaurant from the route
+    """Remove a restaurant from the caller's route
     Request JSON: {"restaurant_id": 1}
     """
     data = request.json
@@ -528,28 +3596,170 @@ def remove_from_tour_route():
     
     if restaurant_id is None:
         return jsonify({"error": "Missing restaurant_id"}), 400
+    if not isinstance(restaurant_id, int) or isinstance(restaurant_id, bool):
+        return jsonify({"error": "restaurant_id must be an integer"}), 400
+    try:
+        session = tour_session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    result = routing_handler.remove_restaurant(restaurant_id)
+    result = routing_handler.remove_restaurant(restaurant_id, session)
     return jsonify(result)
 
-@app.route("/api/tour/route/get", methods=['GET'])
+@api.route("/api/tour/route/get", methods=['GET'])
 def get_tour_route():
-    """Get all restaurants in current route"""
-    restaurants = routing_handler.get_route()
-    return jsonify({"count": len(restaurants), "route": restaurants})
+    """Get all restaurants in the caller's route"""
+    try:
+        session = tour_session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    restaurants = routing_handler.get_route(session)
+    return json_response({"count": len(restaurants), "route": restaurants})
 
-@app.route("/api/tour/route/clear", methods=['POST'])
+@api.route("/api/tour/route/clear", methods=['POST'])
 def clear_tour_route():
-    """Clear all restaurants from the route"""
-    result = routing_handler.clear_route()
+    """Clear all restaurants from the caller's route"""
+    try:
+        session = tour_session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = routing_handler.clear_route(session)
     return jsonify(result)
 
-@app.route("/api/tour/route/check/<int:restaurant_id>", methods=['GET'])
+@api.route("/api/tour/route/check/<int:restaurant_id>", methods=['GET'])
 def check_in_tour_route(restaurant_id):
-    """Check if a restaurant is in the route"""
-    in_route = routing_handler.is_in_route(restaurant_id)
+    """Check if a restaurant is in the caller's route"""
+    try:
+        session = tour_session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    in_route = routing_handler.is_in_route(restaurant_id, session)
     return jsonify({"restaurant_id": restaurant_id, "in_route": in_route})
 
+def parse_start_location(data: dict) -> Optional[Coordinates]:
+    """Optional userLatitude/userLongitude pair from a request body; ValueError if malformed."""
+    latitude, longitude = data.get('userLatitude'), data.get('userLongitude')
+    if latitude is None and longitude is None:
+        return None
+    for value, low, high in ((latitude, -90, 90), (longitude, -180, 180)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            raise ValueError("userLatitude and userLongitude must be given together as valid coordinates")
+    return Coordinates(float(latitude), float(longitude))
+
+@api.route("/api/tour/route/optimize", methods=['POST'])
+def optimize_tour_route():
+    """Shortest visiting order found for the caller's route
+    Request JSON (all optional): {"userLatitude": 10.77, "userLongitude": 106.70, "apply": true}
+    With a user location the tour starts there; "apply" saves the order to the route.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        session = tour_session()
+        start = parse_start_location(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    apply = data.get('apply', False)
+    if not isinstance(apply, bool):
+        return jsonify({"error": "apply must be true or false"}), 400
+
+    stops = routing_handler.get_route_restaurants(session)
+    plan = tour_optimizer.optimize([(r.getLatitude(), r.getLongitude()) for r in stops], start)
+    ordered = [stops[i] for i in plan.order]
+    if apply:
+        routing_handler.reorder_route([r.getId() for r in ordered], session)
+    return json_response({
+        "count": len(ordered),
+        "route": [r.to_json() for r in ordered],
+        "fixedStart": start is not None,
+        "distanceBeforeKm": round(plan.distanceBeforeKm, 3),
+        "distanceAfterKm": round(plan.distanceAfterKm, 3),
+        "applied": apply,
+    })
+
+@api.route("/api/tour/route/suggest", methods=['POST'])
+def suggest_along_tour_route():
+    """Restaurants on the way between the stops of the caller's route
+    Request JSON (all optional): {"corridorMeters": 300, "limit": 10,
+                                  "userLatitude": 10.77, "userLongitude": 106.70}
+    A user location adds the walk from there to the first stop.
+    """
+    data = request.get_json(silent=True) or {}
+    corridor = data.get('corridorMeters', SUGGEST_CORRIDOR_METERS)
+    if isinstance(corridor, bool) or not isinstance(corridor, (int, float)) or \
+            not 0 < corridor <= SUGGEST_MAX_CORRIDOR_METERS:
+        return jsonify({"error": f"corridorMeters must be a number in (0, {SUGGEST_MAX_CORRIDOR_METERS}]"}), 400
+    try:
+        session = tour_session()
+        start = parse_start_location(data)
+        limit = parse_page_size(data.get('limit')) or SUGGEST_LIMIT
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stops = routing_handler.get_route_restaurants(session)
+    points = [r.getLocation() for r in stops]
+    stop_ids: List[Optional[int]] = [r.getId() for r in stops]
+    if start is not None:
+        points.insert(0, start)
+        stop_ids.insert(0, None)  # The user's location
+    restaurants = current_data().restaurants
+    in_route = {r.getId() for r in stops}
+    # The stops themselves lie on the route; ask for enough to drop them
+    suggestions = corridor_search.suggest(points, corridor / 1000, limit + len(stops))
+    results = [restaurants[position].to_json(detour_km=round(detour, 3),
+                                            distance_from_route_m=round(off_route * 1000),
+                                            between_stops=[stop_ids[leg], stop_ids[leg + 1]])
+               for position, leg, detour, off_route in suggestions
+               if restaurants[position].getId() not in in_route][:limit]
+    return json_response({"count": len(results), "corridorMeters": corridor, "suggestions": results})
+
+@api.route("/api/tour/route/plan", methods=['POST'])
+def plan_tour_route():
+    """Split the caller's route into days
+    Request JSON: {"days": 3, "dayStart": "08:00", "dayEnd": "22:00", "minutesPerStop": 60,
+                   "userLatitude": 10.77, "userLongitude": 106.70}
+    Only "days" is required; a user location (e.g. the hotel) starts every day.
+    Stops that do not fit before dayEnd are listed under the day's "unscheduled".
+    """
+    data = request.get_json(silent=True) or {}
+    days = data.get('days')
+    if isinstance(days, bool) or not isinstance(days, int) or not 1 <= days <= TOUR_MAX_DAYS:
+        return jsonify({"error": f"days must be an integer between 1 and {TOUR_MAX_DAYS}"}), 400
+    minutes_per_stop = data.get('minutesPerStop', TOUR_MINUTES_PER_STOP)
+    if isinstance(minutes_per_stop, bool) or not isinstance(minutes_per_stop, int) \
+            or not 10 <= minutes_per_stop <= 240:
+        return jsonify({"error": "minutesPerStop must be an integer between 10 and 240"}), 400
+    try:
+        day_start = datetime.strptime(data.get('dayStart', TOUR_DAY_START), "%H:%M").time()
+        day_end = datetime.strptime(data.get('dayEnd', TOUR_DAY_END), "%H:%M").time()
+    except (ValueError, TypeError):
+        return jsonify({"error": "dayStart and dayEnd must be formatted as HH:MM"}), 400
+    if day_end <= day_start:
+        return jsonify({"error": "dayEnd must be later than dayStart"}), 400
+    try:
+        session = tour_session()
+        start = parse_start_location(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stops = routing_handler.get_route_restaurants(session)
+    plans = tour_planner.plan(stops, days, start, day_start.hour * 60 + day_start.minute,
+                              minutes_per_stop, day_end.hour * 60 + day_end.minute)
+    return json_response({
+        "days": [{
+            "day": number,
+            "count": len(plan.stops),
+            "distanceKm": round(plan.distanceKm, 3),
+            "stops": [stop.restaurant.to_json(tour_slot=stop.slot, arrival_time=stop.arrivalTime,
+                                              open_on_arrival=stop.openOnArrival)
+                      for stop in plan.stops],
+            "unscheduled": [restaurant.to_json(tour_slot=TourPlanner.slotOf(restaurant.getOpenHours()))
+                            for restaurant in plan.unscheduled],
+        } for number, plan in enumerate(plans, 1)],
+        "count": len(stops),
+        "unscheduledCount": sum(len(plan.unscheduled) for plan in plans),
+        "distanceKm": round(sum(plan.distanceKm for plan in plans), 3),
+    })
+
 # ----------------------------------------------------------------------------
 # FREE CHATBOT IMPLEMENTATION (Ollama + Enhanced Rules)
 # ----------------------------------------------------------------------------
@@ -570,11 +3780,12 @@ def check_ollama_available() -> bool:
 
 def get_restaurant_summary_for_ai() -> str:
     """Create compressed summary of restaurants for AI context"""
-    if not DATA_SOURCE:
+    data = current_data()
+    if not data.restaurants:
         return "No restaurant data available."
     summaries = []
     # Include more restaurants for better context (up to 30)
-    for r in DATA_SOURCE[:30]:
+    for r in data.restaurants[:30]:
         cuisines = ', '.join(r.getCuisines()[:2])
         price_info = f"{r.getPriceText()} (avg: {r.getAveragePrice():,} VND)"
         summaries.append(
@@ -583,11 +3794,9 @@ def get_restaurant_summary_for_ai() -> str:
         )
     
     # Add price statistics
-    prices = [r.getAveragePrice() for r in DATA_SOURCE if r.getAveragePrice() > 0]
-    if prices:
-        avg_price = sum(prices) / len(prices)
-        min_price = min(prices)
-        max_price = max(prices)
+    price_summary = data.restaurants.priceSummary()
+    if price_summary:
+        min_price, avg_price, max_price = price_summary
         price_stats = f"\n\nPRICE STATISTICS: Average {avg_price:,.0f} VND, Range: {min_price:,.0f} - {max_price:,.0f} VND"
         return "\n".join(summaries) + price_stats
     
@@ -595,10 +3804,11 @@ def get_restaurant_summary_for_ai() -> str:
 
 def get_dish_summary_for_ai() -> str:
     """Create summary of dishes for AI context"""
-    if not DISHES_DATA.get('dishes'):
+    data = current_data()
+    if not data.dishes_data.get('dishes'):
         return "No dish data available."
     dishes = []
-    for dish_id, dish in list(DISHES_DATA.get('dishes', {}).items())[:15]:
+    for dish_id, dish in list(data.dishes_data.get('dishes', {}).items())[:15]:
         name = dish.get('name', 'Unknown')
         desc = dish.get('description', '')[:80]
         ingredients = ', '.join(dish.get('ingredients', [])[:5])
@@ -607,10 +3817,11 @@ def get_dish_summary_for_ai() -> str:
 
 def get_region_summary_for_ai() -> str:
     """Create summary of regions for AI context"""
-    if not REGIONS_DATA:
+    data = current_data()
+    if not data.regions_data:
         return "No region data available."
     regions = []
-    for reg in REGIONS_DATA[:5]:
+    for reg in data.regions_data[:5]:
         specialties = ', '.join(reg.get('specialties', [])[:3])
         regions.append(f"{reg.get('nameEn', reg.get('name', ''))}: {specialties}")
     return "\n".join(regions)
@@ -630,13 +3841,14 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
     Enhanced rule-based chatbot using project data
     Returns response dict or None if can't handle
     """
+    data = current_data()
     query_lower = user_message.lower()
     
     # 1. Check data_chat.json first (existing keyword matching)
-    if CHAT_DATA:
+    if data.chat_data:
         best_key = None
         best_score = 0
-        for key, entry in CHAT_DATA.items():
+        for key, entry in data.chat_data.items():
             keywords = entry.get('keywords', [])
             score = 0
             for kw in keywords:
@@ -652,7 +3864,7 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
                 best_key = key
         
         if best_key and best_score > 0:
-            responses = CHAT_DATA[best_key].get('responses', [])
+            responses = data.chat_data[best_key].get('responses', [])
             if responses:
                 return {
                     'response': responses[0] if len(responses) == 1 else responses[hash(user_message) % len(responses)],
@@ -671,7 +3883,7 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
     # 2.5. Spiciness queries (general or dish-specific)
     if any(word in query_lower for word in ['spicy', 'spice', 'heat', 'hot', 'how spicy', 'spiciness']):
         # Check if asking about a specific dish
-        dishes = DISHES_DATA.get('dishes', {})
+        dishes = data.dishes_data.get('dishes', {})
         for dish_id, dish in dishes.items():
             dish_name = dish.get('name', '').lower()
             if dish_name and dish_name in query_lower:
@@ -708,7 +3920,7 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
         }
     
     # 3. Dish information queries
-    dishes = DISHES_DATA.get('dishes', {})
+    dishes = data.dishes_data.get('dishes', {})
     for dish_id, dish in dishes.items():
         dish_name = dish.get('name', '').lower()
         dish_name_no_diacritics = dish_name.replace('ở', 'o').replace('ấ', 'a').replace('ế', 'e').replace('ì', 'i').replace('ạ', 'a')
@@ -790,15 +4002,14 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
         # For "cheap" or "affordable" questions without specific number
         if any(word in query_lower for word in ['cheap', 'affordable', 'budget']) and not price_match:
             # Calculate price statistics for better AI context
-            prices = [r.getAveragePrice() for r in DATA_SOURCE if r.getAveragePrice() > 0]
-            if prices:
-                avg_price = sum(prices) / len(prices)
+            price_summary = data.restaurants.priceSummary()
+            if price_summary:
+                avg_price = price_summary[1]
                 cheap_threshold = avg_price * 0.6  # 60% of average = cheap
-                cheap = [r for r in DATA_SOURCE if r.getAveragePrice() <= cheap_threshold]
-                cheap.sort(key=lambda x: x.getRating(), reverse=True)
+                cheap = data.restaurants.topRated(5, maxPrice=cheap_threshold)
                 
                 if cheap:
-                    names = [r.getName() for r in cheap[:5]]
+                    names = [r.getName() for r in cheap]
                     return {
                         'response': f"💸 Budget-friendly picks (under {int(cheap_threshold):,} VND): {', '.join(names)}. Most dishes here are very affordable!",
                         'confidence': 0.88,
@@ -807,11 +4018,10 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
                     }
         
         # For specific price threshold queries
-        cheap = [r for r in DATA_SOURCE if r.getAveragePrice() <= threshold]
-        cheap.sort(key=lambda x: x.getRating(), reverse=True)
+        cheap = data.restaurants.topRated(5, maxPrice=threshold)
         
         if cheap:
-            names = [r.getName() for r in cheap[:5]]
+            names = [r.getName() for r in cheap]
             return {
                 'response': f"💸 Budget-friendly picks under {threshold:,} VND: {', '.join(names)}.",
                 'confidence': 0.88,
@@ -835,10 +4045,14 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
     
     for cuisine, keywords in cuisines_map.items():
         if any(kw in query_lower for kw in keywords):
-            matches = [r for r in DATA_SOURCE if cuisine.lower() in [c.lower() for c in r.getCuisines()]]
-            matches.sort(key=lambda x: x.getRating(), reverse=True)
+            # Facet bitmaps instead of a scan; only the five picks are read
+            facet = data.facet_index
+            bitmap = facet.matchAny("cuisines", [value for value in facet.bitmaps["cuisines"]
+                                                 if value.lower() == cuisine])
+            matches = [data.restaurants[p]
+                       for p in data.restaurants.rankByRating(bitmap_to_positions(bitmap), 5)]
             if matches:
-                names = [r.getName() for r in matches[:5]]
+                names = [r.getName() for r in matches]
                 return {
                     'response': f"🍜 Top {cuisine} spots: {', '.join(names)}.",
                     'confidence': 0.85,
@@ -852,13 +4066,18 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
         for dish_id, dish in dishes.items():
             dish_name = dish.get('name', '').lower()
             if dish_name and dish_name in query_lower:
-                matches = [
-                    r for r in DATA_SOURCE
-                    if dish_name in ' '.join([t.lower() for t in r.getTags()])
-                ]
-                matches.sort(key=lambda x: x.getRating(), reverse=True)
+                # The text index narrows the rows down to those whose tags
+                # hold the dish name's words; only those are checked and read
+                candidates = data.text_index.search(dish_name, ("tags",)) or ()
+                matches = []
+                for position in data.restaurants.rankByRating(candidates):
+                    r = data.restaurants[position]
+                    if dish_name in ' '.join([t.lower() for t in r.getTags()]):
+                        matches.append(r)
+                        if len(matches) == 5:
+                            break
                 if matches:
-                    names = [r.getName() for r in matches[:5]]
+                    names = [r.getName() for r in matches]
                     return {
                         'response': f"🏆 Top places for {dish.get('name')}: {', '.join(names)}.",
                         'confidence': 0.85,
@@ -867,7 +4086,7 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
                     }
         
         # General recommendation
-        top_rated = sorted(DATA_SOURCE, key=lambda x: x.getRating(), reverse=True)[:5]
+        top_rated = data.restaurants.topRated(5)
         names = [r.getName() for r in top_rated]
         return {
             'response': f"🌟 Top rated restaurants: {', '.join(names)}.",
@@ -876,8 +4095,14 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
             'restaurants': names
         }
     
-    # 7. Restaurant name queries
-    for restaurant in DATA_SOURCE:
+    # 7. Restaurant name queries. A name inside the message, or the message
+    # inside a name, shares a word with it (both start at a word), so the
+    # text index supplies the candidates; only they are read, in catalogue order.
+    candidates: Set[int] = set()
+    for token in set(tokenize_text(query_lower)):
+        candidates |= data.text_index.search(token, ("name",)) or set()
+    for position in sorted(candidates):
+        restaurant = data.restaurants[position]
         rname = restaurant.getName().lower()
         if rname and (rname in query_lower or query_lower in rname):
             return {
@@ -893,7 +4118,7 @@ def try_rule_based_chatbot(user_message: str) -> Optional[Dict]:
             }
     
     # 8. Region queries
-    for region in REGIONS_DATA:
+    for region in data.regions_data:
         region_names = [
             region.get('id', '').lower(),
             region.get('name', '').lower(),
@@ -1012,7 +4237,7 @@ Now analyze the user's question and provide a helpful, data-driven response:"""
         print(f"Ollama error: {e}")
         return {'response': None, 'source': 'error', 'cost': 0.0}
 
-@app.route('/api/chatbot', methods=['POST'])
+@api.route('/api/chatbot', methods=['POST'])
 def chatbot():
     """
     Enhanced FREE chatbot endpoint
@@ -1119,9 +4344,10 @@ def chatbot():
             'source': 'error'
         }), 500
 
-@app.route('/api/chatbot/stats', methods=['GET'])
+@api.route('/api/chatbot/stats', methods=['GET'])
 def chatbot_stats():
     """Get chatbot statistics"""
+    data = current_data()
     ollama_available = check_ollama_available()
     
     return jsonify({
@@ -1129,10 +4355,10 @@ def chatbot_stats():
         'ollama_model': OLLAMA_MODEL if ollama_available else None,
         'use_ollama': USE_OLLAMA,
         'cache_size': len(chatbot_cache),
-        'restaurants_loaded': len(DATA_SOURCE),
-        'dishes_loaded': len(DISHES_DATA.get('dishes', {})),
-        'regions_loaded': len(REGIONS_DATA),
-        'chat_data_loaded': len(CHAT_DATA),
+        'restaurants_loaded': len(data.restaurants),
+        'dishes_loaded': len(data.dishes_data.get('dishes', {})),
+        'regions_loaded': len(data.regions_data),
+        'chat_data_loaded': len(data.chat_data),
         'cost': 0.0,  # Always free!
         'source': 'free_implementation'
     })
@@ -1141,7 +4367,7 @@ def chatbot_stats():
 # SURVEY RECOMMENDATION API ENDPOINT
 # ----------------------------------------------------------------------------
 
-@app.route("/api/survey/recommendations", methods=['POST'])
+@api.route("/api/survey/recommendations", methods=['POST'])
 def get_survey_recommendations():
     """
     Get restaurant recommendations based on survey preferences
@@ -1216,10 +4442,10 @@ def get_survey_recommendations():
         top_count = min(5, max(3, len(filtered_restaurants)))
         top_restaurants = filtered_restaurants[:top_count]
         
-        return jsonify({
+        return json_response({
             "count": len(top_restaurants),
             "totalFiltered": len(filtered_restaurants),
-            "restaurants": [r.to_dict() for r in top_restaurants],
+            "restaurants": [r.to_json() for r in top_restaurants],
             "preferences": {
                 "dietary": dietary,
                 "vibe": vibe,
@@ -1367,8 +4593,166 @@ def filter_by_cravings(restaurants, cravings):
     
     return filtered if filtered else restaurants  # Return all if no matches
 
+# ----------------------------------------------------------------------------
+# APP FACTORY AND SERVER ENTRY POINT
+# ----------------------------------------------------------------------------
+
+def create_app(dataDir: Optional[str] = None, preload: bool = False,
+               pollInterval: float = DATA_POLL_INTERVAL) -> Flask:
+    """
+    Build the Flask app. Importing this module reads no data: it is loaded
+    on the first request, or here when preload is set. `flask --app app run`
+    finds this factory by name.
+    """
+    if dataDir is not None:
+        DATA_STORE.dataDir = dataDir
+    app = Flask(__name__)
+    CORS(app, expose_headers=["X-Next-Cursor"])  # Allow cross-origin requests
+    app.register_blueprint(api)
+    if preload:
+        DATA_STORE.load()
+    if pollInterval > 0:
+        DATA_STORE.startPolling(pollInterval)
+    return app
+
+SERVER_SIGNALS = {signal.SIGCHLD, signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+def run_worker(app: Flask, host: str, port: int, listenFd: int):
+    """Serve on an already-bound socket inherited from the parent process."""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, SERVER_SIGNALS)  # Blocked by the parent's loop
+    gc.enable()
+    # Threads do not survive fork
+    if DATA_STORE.shared is not None:
+        DATA_STORE.startPolling(SHARED_POLL_INTERVAL)
+    elif DATA_POLL_INTERVAL > 0:
+        DATA_STORE.startPolling(DATA_POLL_INTERVAL)
+    try:
+        make_server(host, port, app, threaded=True, fd=listenFd).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def serve(host: str = "127.0.0.1", port: int = 5000, workers: int = 1, sharedMemory: bool = False):
+    """
+    Production entry point. Loads and indexes the data once, then forks
+    `workers` processes that accept connections on one shared socket, so the
+    catalogue is shared copy-on-write instead of loaded per worker. Before
+    forking, gc.freeze() moves every loaded object out of the collector's
+    reach, so collections in the workers never write to (and thereby copy)
+    the shared pages. The parent restarts workers that die.
+
+    With sharedMemory, the parent also publishes the catalogue and its text,
+    trigram and autocomplete indexes into shared memory (see
+    SharedCataloguePublisher) and serves them from there, and it republishes
+    on SIGHUP or, with DATA_POLL_INTERVAL, when the restaurant, dish or
+    region files change. Workers re-attach when the generation moves.
+    """
+    from werkzeug.serving import make_server
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        app = create_app(preload=True)
+        print(f"🚀 Serving on http://{host}:{port} (1 process)")
+        make_server(host, port, app, threaded=True).serve_forever()
+        return
+
+    publisher = None
+    if sharedMemory:
+        if not os.path.isdir(SHARED_MEMORY_DIR):
+            raise OSError(f"Shared memory catalogues need POSIX shared memory ({SHARED_MEMORY_DIR})")
+        publisher = SharedCataloguePublisher()
+        publisher.publish(open_catalogue(DATA_STORE.dataDir), DATA_STORE.loadDishes(),
+                          DATA_STORE.loadRegions())
+        DATA_STORE.shared = SharedCatalogueReader(publisher.prefix)
+        DATA_STORE.reload(force=True)  # Index the segment (replacing any version loaded earlier)
+    app = create_app(preload=True, pollInterval=0)
+    listener = socket.create_server((host, port), backlog=128)
+    gc.disable()
+    gc.collect()
+    gc.freeze()
+    # Signals are taken synchronously by the loop below, which can then fork safely
+    signal.pthread_sigmask(signal.SIG_BLOCK, SERVER_SIGNALS)
+
+    def spawn() -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, host, port, listener.fileno())
+            finally:
+                os._exit(0)
+        return pid
+
+    children = [spawn() for _ in range(workers)]
+    print(f"🚀 Serving on http://{host}:{port} ({workers} workers: {', '.join(map(str, children))})")
+
+    stopping = publish_requested = False
+    catalogue_mtimes = DATA_STORE.publishedMtimes()
+    poll = DATA_POLL_INTERVAL if publisher is not None and DATA_POLL_INTERVAL > 0 else None
+    try:
+        while children:
+            received = signal.sigtimedwait(SERVER_SIGNALS, poll) if poll else \
+                signal.sigwaitinfo(SERVER_SIGNALS)
+            signum = received.si_signo if received else None
+            if signum in (signal.SIGTERM, signal.SIGINT) and not stopping:
+                stopping = True
+                for pid in children:
+                    try:
+                        os.kill(pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+            elif signum == signal.SIGHUP:
+                publish_requested = True
+
+            # Reap every worker that exited (pending SIGCHLDs coalesce)
+            while children:
+                try:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    children.clear()
+                    break
+                if pid == 0:
+                    break
+                if pid in children:
+                    children.remove(pid)
+                    if not stopping:
+                        print(f"⚠️ Worker {pid} exited, starting a replacement")
+                        children.append(spawn())
+
+            if publisher is not None and not stopping:
+                current_mtimes = DATA_STORE.publishedMtimes()
+                if publish_requested or current_mtimes != catalogue_mtimes:
+                    publish_requested = False
+                    catalogue_mtimes = current_mtimes
+                    try:
+                        catalogue = open_catalogue(DATA_STORE.dataDir)
+                        if not catalogue:
+                            raise ValueError("New restaurant data is empty or invalid")
+                        generation = publisher.publish(catalogue, DATA_STORE.loadDishes(),
+                                                       DATA_STORE.loadRegions())
+                        print(f"🔄 Catalogue generation {generation} published ({len(catalogue)} restaurants)")
+                    except (OSError, ValueError, sqlite3.Error) as e:
+                        print(f"⚠️ Catalogue publish failed: {e}")
+    finally:
+        listener.close()
+        if publisher is not None:
+            publisher.close()
+
 # Start the Flask server
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Culinary Compass API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int,
+                        help="serve with N pre-forked worker processes sharing the loaded data "
+                             "(default: the single-process debug server)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding the data/*.json files")
+    parser.add_argument("--shared-memory", action="store_true",
+                        help="with --workers: keep one copy of the catalogue in shared memory")
+    args = parser.parse_args()
+    DATA_STORE.dataDir = args.data_dir
+
     print("\n" + "="*60)
     print("🍜 Culinary Compass Chatbot Server Starting...")
     print("="*60)
@@ -1386,10 +4770,18 @@ if __name__ == "__main__":
         print("   → See OLLAMA_SETUP_GUIDE.md for instructions")
     
     print(f"\n📊 Data loaded:")
-    print(f"   → Restaurants: {len(DATA_SOURCE)}")
-    print(f"   → Dishes: {len(DISHES_DATA.get('dishes', {}))}")
-    print(f"   → Regions: {len(REGIONS_DATA)}")
-    print(f"\n🚀 Server running on http://localhost:5000")
+    if args.workers and args.shared_memory:
+        print("   → By the server, into shared memory")  # A copy loaded here would stay in every worker
+    else:
+        data = current_data()
+        print(f"   → Restaurants: {len(data.restaurants)}")
+        print(f"   → Dishes: {len(data.dishes_data.get('dishes', {}))}")
+        print(f"   → Regions: {len(data.regions_data)}")
+        del data  # A module global would pin this version past a reload
+    print(f"\n🚀 Server running on http://{args.host}:{args.port}")
     print("="*60 + "\n")
-    
-    app.run(debug=True, port=5000)
\ No newline at end of file
+
+    if args.workers:
+        serve(args.host, args.port, args.workers, sharedMemory=args.shared_memory)
+    else:
+        create_app().run(debug=True, host=args.host, port=args.port)
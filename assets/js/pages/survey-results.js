@@ -270,7 +270,7 @@ function startNavigation() {
     // Clear any existing route with timeout
     const clearPromise = fetch('http://localhost:5000/api/tour/route/clear', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' }
+        headers: tourHeaders({ 'Content-Type': 'application/json' })
     });
     
     const timeoutPromise = new Promise((_, reject) =>
@@ -321,7 +321,7 @@ async function addRestaurantsToRoute() {
         try {
             await fetch('http://localhost:5000/api/tour/route/add', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: tourHeaders({ 'Content-Type': 'application/json' }),
                 body: JSON.stringify({ restaurant_id: restaurant.id })
             });
         } catch (error) {
@@ -226,7 +226,7 @@ document.addEventListener('DOMContentLoaded', function () {
             if (window.confirm('Are you sure you want to remove all restaurants from the route?')) {
                 fetch('http://localhost:5000/api/tour/route/clear', {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' }
+                    headers: tourHeaders({ 'Content-Type': 'application/json' })
                 })
                 .then(res => res.json())
                 .then(data => {
@@ -253,7 +253,7 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     function showRoute() {
-        fetch('http://localhost:5000/api/tour/route/get')
+        fetch('http://localhost:5000/api/tour/route/get', { headers: tourHeaders() })
         .then(res => res.json())
         .then(data => {
             const routeList = document.querySelector('.route-list');
@@ -410,14 +410,14 @@ document.addEventListener('DOMContentLoaded', function () {
         directionsBtn.addEventListener('click', () => {
             fetch('http://localhost:5000/api/tour/route/clear', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'}
+                headers: tourHeaders({ 'Content-Type': 'application/json' })
             })
             .then(res => res.json())
             .then(() => {
                 //Add to route
                 return fetch('http://localhost:5000/api/tour/route/add', {
                     method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
+                    headers: tourHeaders({ 'Content-Type': 'application/json' }),
                     body: JSON.stringify({restaurant_id: r.id})
                 });
             })
@@ -553,7 +553,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 
                 fetch(`http://localhost:5000${endpoint}`, {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
+                    headers: tourHeaders({ 'Content-Type': 'application/json' }),
                     body: JSON.stringify({ restaurant_id: r.id })
                 })
                 .then(res => res.json())
@@ -209,7 +209,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
         fetch('http://localhost:5000/api/tour/route/remove', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json'},
+            headers: tourHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({restaurant_id: target.id})
         })
         .then(res => res.json())
@@ -237,7 +237,7 @@ document.addEventListener('DOMContentLoaded', function () {
 
         fetch('http://localhost:5000/api/tour/route/remove', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json'},
+            headers: tourHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({restaurant_id: currentRestaurant.id})
         })
         .then(res => res.json())
@@ -261,7 +261,7 @@ document.addEventListener('DOMContentLoaded', function () {
             return;
         }
 
-        fetch('http://localhost:5000/api/tour/route/get')
+        fetch('http://localhost:5000/api/tour/route/get', { headers: tourHeaders() })
         .then(res => res.json())
         .then(data => {
             // Clear markers
@@ -0,0 +1,23 @@
+/* ============================================
+   TOUR SESSION
+   Every browser keeps its own tour route on the
+   server, keyed by the X-Session-Id header
+   ============================================ */
+
+const TOUR_SESSION_KEY = 'tourSessionId';
+
+function tourSessionId() {
+    let sessionId = localStorage.getItem(TOUR_SESSION_KEY);
+    if (!sessionId) {
+        sessionId = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        localStorage.setItem(TOUR_SESSION_KEY, sessionId);
+    }
+    return sessionId;
+}
+
+// Headers for /api/tour/route/* requests: `extra` plus this browser's session
+function tourHeaders(extra = {}) {
+    return { ...extra, 'X-Session-Id': tourSessionId() };
+}
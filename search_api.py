@@ -8,30 +8,27 @@ To run this server:
 3. Server will start on http://localhost:5000
 """
 
-import math
 import json
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime, time
 from typing import List, Optional, Tuple
 from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS
+from search_core import (Coordinates, LocationService, SpatialGridIndex, TextSearchIndex,
+                         intern_strings)
 
 # ----------------------------------------------------------------------------
 # CLASSES
 # ----------------------------------------------------------------------------
 
-@dataclass
-class Coordinates:
-    latitude: float
-    longitude: float
-
-    def getLatitude(self) -> float:
-        return self.latitude
-
-    def getLongitude(self) -> float:
-        return self.longitude
-
 class Restaurant:
+    # Compact layout: no per-instance __dict__, inline coordinates and
+    # interned vocabulary strings in tuples (same layout as app.py)
+    __slots__ = ("id", "name", "rating", "averagePrice", "cuisines", "tags", "openHours",
+                 "specialFlags", "latitude", "longitude", "image_url", "distance_text",
+                 "price_text", "address")
+
     def __init__(self, id: int, name: str, rating: float, averagePrice: float,
                  cuisines: List[str], tags: List[str], openHours: str,
                  specialFlags: List[str], location: Coordinates, image_url: str,
@@ -40,27 +37,34 @@ class Restaurant:
         self.name = name
         self.rating = rating
         self.averagePrice = averagePrice
-        self.cuisines = cuisines
-        self.tags = tags
-        self.openHours = openHours
-        self.specialFlags = specialFlags
-        self.location = location
+        self.cuisines = intern_strings(cuisines)
+        self.tags = intern_strings(tags)
+        self.openHours = sys.intern(openHours)
+        self.specialFlags = intern_strings(specialFlags)
+        self.latitude = location.latitude
+        self.longitude = location.longitude
         self.image_url = image_url
         self.distance_text = distance_text
-        self.price_text = price_text
+        self.price_text = sys.intern(price_text)
         self.address = address
 
     def getId(self) -> int: return self.id
     def getName(self) -> str: return self.name
     def getRating(self) -> float: return self.rating
     def getAveragePrice(self) -> float: return self.averagePrice
-    def getCuisines(self) -> List[str]: return self.cuisines
-    def getTags(self) -> List[str]: return self.tags
+    def getCuisines(self) -> Tuple[str, ...]: return self.cuisines
+    def getTags(self) -> Tuple[str, ...]: return self.tags
     def getOpenHours(self) -> str: return self.openHours
-    def getSpecialFlags(self) -> List[str]: return self.specialFlags
-    def getLocation(self) -> Coordinates: return self.location
+    def getSpecialFlags(self) -> Tuple[str, ...]: return self.specialFlags
+    def getLatitude(self) -> float: return self.latitude
+    def getLongitude(self) -> float: return self.longitude
+    def getLocation(self) -> Coordinates: return Coordinates(self.latitude, self.longitude)
     def getAddress(self) -> str: return self.address
 
+    @property
+    def location(self) -> Coordinates:
+        return self.getLocation()
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -71,7 +75,7 @@ class Restaurant:
             "tags": self.tags,
             "openHours": self.openHours,
             "specialFlags": self.specialFlags,
-            "location": {"latitude": self.location.latitude, "longitude": self.location.longitude},
+            "location": {"latitude": self.latitude, "longitude": self.longitude},
             "image_url": self.image_url,
             "distance_text": self.distance_text,
             "price_text": self.price_text,
@@ -89,26 +93,6 @@ class SearchQuery:
     cuisines: List[str] = field(default_factory=list)
     specialFlags: List[str] = field(default_factory=list)
 
-class LocationService:
-    EARTH_RADIUS_KM: float = 6371.0
-
-    def convertToRadians(self, degrees: float) -> float:
-        return degrees * math.pi / 180.0
-
-    def calculateDistance(self, userLocation: Coordinates,
-                          restaurantLocation: Coordinates) -> float:
-        lat1_rad = self.convertToRadians(userLocation.latitude)
-        lon1_rad = self.convertToRadians(userLocation.longitude)
-        lat2_rad = self.convertToRadians(restaurantLocation.latitude)
-        lon2_rad = self.convertToRadians(restaurantLocation.longitude)
-        d_lon = lon2_rad - lon1_rad
-        d_lat = lat2_rad - lat1_rad
-        a = (math.sin(d_lat / 2)**2) + \
-            (math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(d_lon / 2)**2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = self.EARTH_RADIUS_KM * c
-        return distance
-
 class HoursChecker:
     def parseTime(self, time_str: str) -> Optional[time]:
         try:
@@ -128,37 +112,28 @@ class HoursChecker:
             return None
         return (start_time, end_time)
 
-    def isOpenNow(self, openHours: str) -> bool:
-        hours_tuple = self.parseOpenHours(openHours)
+    def isOpenAt(self, hours_tuple: Optional[Tuple[time, time]], now_time: time) -> bool:
         if hours_tuple is None:
             return True
         start_time, end_time = hours_tuple
-        now_time = datetime.now().time()
         if start_time <= end_time:
             return start_time <= now_time <= end_time
         else:
             return now_time >= start_time or now_time <= end_time
 
+    def isOpenNow(self, openHours: str) -> bool:
+        return self.isOpenAt(self.parseOpenHours(openHours), datetime.now().time())
+
 class SearchEngine:
     def __init__(self, restaurants: List[Restaurant],
                  locationService: LocationService, hoursChecker: HoursChecker):
         self.restaurants = restaurants
         self.locationService = locationService
         self.hoursChecker = hoursChecker
-
-    def isTextMatch(self, restaurant: Restaurant, queryText: str) -> bool:
-        if not queryText:
-            return True
-        lowerQuery = queryText.lower()
-        if lowerQuery in restaurant.getName().lower():
-            return True
-        for cuisine in restaurant.getCuisines():
-            if lowerQuery in cuisine.lower():
-                return True
-        for tag in restaurant.getTags():
-            if lowerQuery in tag.lower():
-                return True
-        return False
+        self.spatialIndex = SpatialGridIndex(restaurants, locationService=locationService)
+        self.textIndex = TextSearchIndex(restaurants)
+        # Parse every openHours string once instead of twice per row per search
+        self.openSchedules = [hoursChecker.parseOpenHours(r.getOpenHours()) for r in restaurants]
 
     def isPriceMatch(self, restaurant: Restaurant, priceRange: Optional[str]) -> bool:
         if not priceRange:
@@ -192,19 +167,22 @@ class SearchEngine:
 
     def search(self, query: SearchQuery) -> List[Restaurant]:
         results = []
-        for restaurant in self.restaurants:
+        textMatches = self.textIndex.search(query.queryText, ("name", "cuisines", "tags"))
+        now_time = datetime.now().time()
+        for position in self.spatialIndex.candidatePositions(query.userLocation, query.radiusKm):
+            if textMatches is not None and position not in textMatches:
+                continue
+            restaurant = self.restaurants[position]
             distance = self.locationService.calculateDistance(query.userLocation, restaurant.getLocation())
             if distance > query.radiusKm:
                 continue
-            if not self.isTextMatch(restaurant, query.queryText):
-                continue
             if not self.isPriceMatch(restaurant, query.priceRange):
                 continue
             if not self.isCuisineMatch(restaurant, query.cuisines):
                 continue
             if not self.isSpecialFlagMatch(restaurant, query.specialFlags):
                 continue
-            if query.openNow and not self.hoursChecker.isOpenNow(restaurant.getOpenHours()):
+            if query.openNow and not self.hoursChecker.isOpenAt(self.openSchedules[position], now_time):
                 continue
             results.append((restaurant, distance))
 
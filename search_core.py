@@ -0,0 +1,341 @@
+"""
+Search building blocks shared by app.py and search_api.py: coordinates and
+haversine distances, the spatial grid index and the diacritic-folding text
+index. Both servers import them from here so the two can't drift apart.
+"""
+
+import math
+import re
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+if TYPE_CHECKING:  # Either server's Restaurant; only its getters are used
+    from app import Restaurant
+
+@dataclass
+class Coordinates:
+    latitude: float
+    longitude: float
+
+    def getLatitude(self) -> float:
+        return self.latitude
+
+    def getLongitude(self) -> float:
+        return self.longitude
+
+def intern_strings(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Tuple of interned strings, so a vocabulary word is stored once for the whole catalogue."""
+    return tuple(sys.intern(value) if isinstance(value, str) else value
+                 for value in values) if values else ()
+
+class LocationService:
+    EARTH_RADIUS_KM: float = 6371.0
+    # Length of one degree of latitude on the same sphere as calculateDistance.
+    # The WGS84 equatorial 111.32 is longer, so spans derived from it come out
+    # too narrow and miss rows at the edge of a radius.
+    KM_PER_DEGREE: float = EARTH_RADIUS_KM * math.pi / 180.0
+
+    def convertToRadians(self, degrees: float) -> float:
+        return degrees * math.pi / 180.0
+
+    def calculateDistance(self, userLocation: Coordinates,
+                          restaurantLocation: Coordinates) -> float:
+        lat1_rad = self.convertToRadians(userLocation.latitude)
+        lon1_rad = self.convertToRadians(userLocation.longitude)
+        lat2_rad = self.convertToRadians(restaurantLocation.latitude)
+        lon2_rad = self.convertToRadians(restaurantLocation.longitude)
+        d_lon = lon2_rad - lon1_rad
+        d_lat = lat2_rad - lat1_rad
+        a = (math.sin(d_lat / 2)**2) + \
+            (math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(d_lon / 2)**2)
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        distance = self.EARTH_RADIUS_KM * c
+        return distance
+
+    def boundingBox(self, center: Coordinates, radiusKm: float) \
+                    -> Optional[Tuple[float, float, float, float]]:
+        """
+        (min_lat, max_lat, min_lon, max_lon) enclosing the radius circle, or
+        None when the circle reaches a pole or wraps the antimeridian.
+        """
+        angular = radiusKm / self.EARTH_RADIUS_KM * (1 + 1e-9)  # Tiny slack for rounding
+        lat_delta = math.degrees(angular)
+        if abs(center.latitude) + lat_delta >= 90.0:
+            return None
+        # Widest longitude span of a spherical cap: asin(sin(d) / cos(lat))
+        ratio = math.sin(angular) / math.cos(self.convertToRadians(center.latitude))
+        if ratio >= 1.0:
+            return None
+        lon_delta = math.degrees(math.asin(ratio))
+        if center.longitude - lon_delta < -180.0 or center.longitude + lon_delta > 180.0:
+            return None
+        return (center.latitude - lat_delta, center.latitude + lat_delta,
+                center.longitude - lon_delta, center.longitude + lon_delta)
+
+class SpatialGridIndex:
+    """
+    Uniform lat/lon grid over restaurant positions (indexes into the catalogue list).
+    Radius queries only visit cells overlapping the search circle, so the exact
+    haversine check runs on a handful of candidates instead of the whole list.
+    """
+    KM_PER_DEGREE: float = LocationService.KM_PER_DEGREE
+
+    def __init__(self, restaurants: List["Restaurant"], cellSizeKm: float = 1.0,
+                 locationService: Optional[LocationService] = None,
+                 positions: Optional[Iterable[int]] = None):
+        # positions: the catalogue positions of `restaurants` when they are a subset (a shard)
+        self.cellSizeDeg = cellSizeKm / self.KM_PER_DEGREE
+        self.positions = range(len(restaurants)) if positions is None else positions
+        self.locationService = locationService or LocationService()
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for position, restaurant in zip(self.positions, restaurants):
+            key = self._cellKey(restaurant.getLatitude(), restaurant.getLongitude())
+            self.cells.setdefault(key, []).append(position)
+
+    def _cellKey(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cellSizeDeg),
+                math.floor(longitude / self.cellSizeDeg))
+
+    def _cellMayOverlap(self, key: Tuple[int, int], center: Coordinates,
+                        radiusKm: float) -> bool:
+        # Distance from the center to the closest point of the cell rectangle
+        min_lat = key[0] * self.cellSizeDeg
+        min_lon = key[1] * self.cellSizeDeg
+        nearest = Coordinates(
+            latitude=min(max(center.latitude, min_lat), min_lat + self.cellSizeDeg),
+            longitude=min(max(center.longitude, min_lon), min_lon + self.cellSizeDeg)
+        )
+        slack_km = 0.01 * self.cellSizeDeg * self.KM_PER_DEGREE
+        return self.locationService.calculateDistance(center, nearest) <= radiusKm + slack_km
+
+    def candidatePositions(self, center: Coordinates, radiusKm: Optional[float]) -> List[int]:
+        """
+        Positions of restaurants in cells that overlap the radius circle,
+        in catalogue order. No radius means every restaurant is a candidate.
+        """
+        if not radiusKm:
+            return list(self.positions)
+
+        box = self.locationService.boundingBox(center, radiusKm)
+        if box is None:
+            return list(self.positions)  # Circle covers a pole or wraps the antimeridian
+        min_lat, max_lat, min_lon, max_lon = box
+
+        min_row, min_col = self._cellKey(min_lat, min_lon)
+        max_row, max_col = self._cellKey(max_lat, max_lon)
+
+        # Walk whichever is smaller: the cells in the bounding box or the occupied cells
+        if (max_row - min_row + 1) * (max_col - min_col + 1) <= len(self.cells):
+            keys = ((row, col)
+                    for row in range(min_row, max_row + 1)
+                    for col in range(min_col, max_col + 1))
+        else:
+            keys = (key for key in self.cells
+                    if min_row <= key[0] <= max_row and min_col <= key[1] <= max_col)
+
+        positions = []
+        for key in keys:
+            bucket = self.cells.get(key)
+            if bucket and self._cellMayOverlap(key, center, radiusKm):
+                positions.extend(bucket)
+        positions.sort()
+        return positions
+
+def fold_diacritics(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics: 'Cơm Tấm' -> 'com tam', 'Đà' -> 'da'."""
+    decomposed = unicodedata.normalize('NFD', text.lower())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace('đ', 'd')
+
+def tokenize_text(text: str) -> List[str]:
+    """Lowercased word tokens in composed (NFC) form, keeping accents."""
+    return re.findall(r'\w+', unicodedata.normalize('NFC', text.lower()))
+
+class PackedStrings:
+    """
+    Read-only sequence of strings kept as one UTF-8 buffer plus end offsets:
+    string i is data[offsets[i]:offsets[i + 1]], decoded on access. Sorted
+    ones work with bisect like a list.
+    """
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets, data):
+        self.offsets, self.data = offsets, data
+
+    @classmethod
+    def pack(cls, strings: Iterable[str]) -> "PackedStrings":
+        offsets, data = array('Q', [0]), bytearray()
+        for value in strings:
+            data += value.encode('utf-8')
+            offsets.append(len(data))
+        return cls(offsets, bytes(data))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _span(self, i: int) -> Tuple[int, int]:
+        if i < 0:
+            i += len(self.offsets) - 1
+        if not 0 <= i < len(self.offsets) - 1:
+            raise IndexError("PackedStrings index out of range")
+        return self.offsets[i], self.offsets[i + 1]
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._span(i)
+        return str(self.data[start:end], 'utf-8')
+
+    def raw(self, i: int) -> bytes:
+        """String i still encoded."""
+        start, end = self._span(i)
+        return bytes(self.data[start:end])
+
+    def sections(self, name: str) -> Dict[str, Tuple[str, object]]:
+        """Named (array type code, buffer) pairs to store, see fromSections."""
+        return {f"{name}.offsets": ("Q", self.offsets), f"{name}.data": ("B", self.data)}
+
+    @classmethod
+    def fromSections(cls, sections: Dict[str, memoryview], name: str) -> "PackedStrings":
+        """Over stored sections (e.g. in shared memory), without copying them."""
+        return cls(sections[f"{name}.offsets"], sections[f"{name}.data"])
+
+class PostingLists:
+    """
+    Integer lists packed CSR style into two flat arrays: list i is
+    values[offsets[i]:offsets[i + 1]], handed out as a view. With keys (one
+    sorted string per list) it is also a read-only mapping. A few arrays
+    instead of a container per list, and they can be stored as they are.
+    """
+    __slots__ = ("offsets", "values", "keys")
+
+    def __init__(self, offsets, values, keys: Optional[Sequence[str]] = None):
+        self.offsets, self.keys = offsets, keys
+        self.values = memoryview(values)  # Slices are views, not copies
+
+    @classmethod
+    def pack(cls, lists: Iterable[Iterable[int]],
+             keys: Optional[Sequence[str]] = None) -> "PostingLists":
+        offsets, values = array('Q', [0]), array('I')
+        for items in lists:
+            values.extend(items)
+            offsets.append(len(values))
+        return cls(offsets, values, keys)
+
+    @classmethod
+    def packMapping(cls, mapping: Dict[str, Iterable[int]]) -> "PostingLists":
+        """Keyed lists from {key: ints}, each list sorted."""
+        keys = sorted(mapping)
+        return cls.pack((sorted(mapping[key]) for key in keys), keys)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> memoryview:
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def run(self, lo: int, hi: int) -> memoryview:
+        """Lists lo .. hi - 1 back to back, as one view."""
+        return self.values[self.offsets[lo]:self.offsets[hi]]
+
+    def get(self, key: str, default=None):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self[i]
+        return default
+
+    def sections(self, name: str) -> Dict[str, Tuple[str, object]]:
+        """Named (array type code, buffer) pairs to store, see fromSections."""
+        sections = {f"{name}.offsets": ("Q", self.offsets), f"{name}.values": ("I", self.values)}
+        if self.keys is not None:
+            keys = self.keys if isinstance(self.keys, PackedStrings) else PackedStrings.pack(self.keys)
+            sections.update(keys.sections(f"{name}.keys"))
+        return sections
+
+    @classmethod
+    def fromSections(cls, sections: Dict[str, memoryview], name: str) -> "PostingLists":
+        """Over stored sections (e.g. in shared memory), without copying them."""
+        keys = PackedStrings.fromSections(sections, f"{name}.keys") \
+            if f"{name}.keys.offsets" in sections else None
+        return cls(sections[f"{name}.offsets"], sections[f"{name}.values"], keys)
+
+class TextSearchIndex:
+    """
+    Inverted token index over name/tags/cuisines/address, built once at load.
+    Every token is stored twice: as written ('phở') and diacritic-folded ('pho').
+    Accented query tokens match the accented vocabulary, plain ones match the
+    folded vocabulary, so "pho" finds "Phở" while "phở" stays precise.
+    Each query token is a prefix match (numbers match exactly); a query is the
+    intersection of the posting lists of all its tokens.
+    """
+    FIELDS = ("name", "tags", "cuisines", "address")
+
+    def __init__(self, restaurants: List["Restaurant"]):
+        postings: Dict[Tuple[str, bool], Dict[str, Set[int]]] = {
+            (f, folded): {} for f in self.FIELDS for folded in (False, True)
+        }
+        for position, restaurant in enumerate(restaurants):
+            field_values = {
+                "name": [restaurant.getName()],
+                "tags": restaurant.getTags(),
+                "cuisines": restaurant.getCuisines(),
+                "address": [restaurant.getAddress()],
+            }
+            for field_name, values in field_values.items():
+                for value in values:
+                    for token in tokenize_text(value):
+                        postings[(field_name, False)].setdefault(token, set()).add(position)
+                        postings[(field_name, True)].setdefault(
+                            fold_diacritics(token), set()).add(position)
+        # Packed: a set per token costs far more than the positions in it
+        self.postings = {key: PostingLists.packMapping(tokens) for key, tokens in postings.items()}
+
+    @staticmethod
+    def _sectionName(key: Tuple[str, bool]) -> str:
+        return f"text.{key[0]}.{'folded' if key[1] else 'exact'}"
+
+    def sections(self) -> Dict[str, Tuple[str, object]]:
+        """The posting lists as named (array type code, buffer) pairs, see fromSections."""
+        sections: Dict[str, Tuple[str, object]] = {}
+        for key, lists in self.postings.items():
+            sections.update(lists.sections(self._sectionName(key)))
+        return sections
+
+    @classmethod
+    def fromSections(cls, sections: Dict[str, memoryview]) -> "TextSearchIndex":
+        """Index over stored sections (e.g. in shared memory), without copying them."""
+        self = cls.__new__(cls)
+        self.postings = {(f, folded): PostingLists.fromSections(sections, cls._sectionName((f, folded)))
+                         for f in cls.FIELDS for folded in (False, True)}
+        return self
+
+    def _lookupToken(self, field_name: str, token: str) -> Set[int]:
+        folded = fold_diacritics(token) == token
+        postings = self.postings[(field_name, folded)]
+        if token.isdigit():  # "Quận 1" must not match "Quận 10"
+            return set(postings.get(token, ()))
+        # The tokens starting with `token` are adjacent, and so are their lists
+        lo = bisect_left(postings.keys, token)
+        hi = bisect_left(postings.keys, token + '\uffff', lo)
+        return set(postings.run(lo, hi).tolist())
+
+    def search(self, queryText: str, fields: Iterable[str]) -> Optional[Set[int]]:
+        """
+        Positions where every query token matches one of the given fields.
+        Returns None when the query has no tokens (i.e. no text constraint).
+        """
+        tokens = tokenize_text(queryText or "")
+        if not tokens:
+            return None
+        fields = tuple(fields)
+        result: Optional[Set[int]] = None
+        for token in sorted(set(tokens), key=len, reverse=True):  # longest = most selective
+            token_matches: Set[int] = set()
+            for field_name in fields:
+                token_matches |= self._lookupToken(field_name, token)
+            result = token_matches if result is None else result & token_matches
+            if not result:
+                break
+        return result
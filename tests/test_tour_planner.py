@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import Restaurant, tour_planner
+
+
+def restaurant(id, latitude, longitude, openHours="06:00 - 22:00"):
+    return Restaurant.from_compact(
+        id=id, name=f"Quán {id}", rating=4.0, averagePrice=30000, cuisines=(), tags=(),
+        openHours=openHours, specialFlags=(), latitude=latitude, longitude=longitude,
+        image_url="", distance_text="", price_text="", address="", dishType=(), flavorProfile=())
+
+
+class TourPlannerTest(unittest.TestCase):
+    def test_stops_sharing_a_location_with_more_days_than_locations(self):
+        # Four stops in one food court used to seed two days at the same point,
+        # leaving one of them empty (ZeroDivisionError in the center update)
+        stops = [restaurant(i, 10.7725, 106.6980) for i in range(4)]
+        stops += [restaurant(4, 10.7800, 106.7000), restaurant(5, 10.7600, 106.6900),
+                  restaurant(6, 10.7900, 106.6800)]
+        plans = tour_planner.plan(stops, days=6)
+        self.assertEqual(len(plans), 6)
+        planned = sorted(stop.restaurant.id for plan in plans for stop in plan.stops)
+        self.assertEqual(planned, list(range(7)))
+        self.assertLessEqual(max(len(plan.stops) for plan in plans), 2)
+
+    def test_every_stop_at_one_location(self):
+        stops = [restaurant(i, 10.7725, 106.6980) for i in range(5)]
+        plans = tour_planner.plan(stops, days=3)
+        self.assertEqual(sorted(len(plan.stops) for plan in plans), [1, 2, 2])
+
+    def test_stops_past_the_day_end_are_unscheduled(self):
+        stops = [restaurant(i, 10.7725 + i * 0.001, 106.6980) for i in range(20)]
+        plan, = tour_planner.plan(stops, days=1, dayStartMinute=8 * 60, minutesPerStop=60,
+                                  dayEndMinute=22 * 60)
+        self.assertEqual(len(plan.stops) + len(plan.unscheduled), 20)
+        self.assertTrue(plan.unscheduled)
+        self.assertLessEqual(plan.stops[-1].arrivalMinute + 60, 22 * 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
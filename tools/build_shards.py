@@ -0,0 +1,51 @@
+"""
+Partition data/restaurants.json into the region shards (data/shards/) served
+with DATA_BACKEND=sharded. Each restaurant goes to the region of
+data/regions.json whose coordinates are nearest; each region becomes a
+snapshot file that the server loads the first time a query reaches it, and
+index.snap holds what the search indexes need of every restaurant, so the
+server starts without loading any region. The manifest is replaced last, so a running server can reload the new set (POST
+/api/admin/reload) without a restart.
+
+Usage (from the repository root):
+    python tools/build_shards.py
+    python tools/build_shards.py data/restaurants.json -o /tmp/shards
+    DATA_BACKEND=sharded python app.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    from app import DATA_DIR, RESTAURANTS_FILE, SHARD_DIR, load_data_from_json, write_region_shards
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("json_path", nargs="?", default=os.path.join(DATA_DIR, RESTAURANTS_FILE))
+    parser.add_argument("--regions", help="regions file (default: regions.json next to the JSON)")
+    parser.add_argument("-o", "--output", help="shard directory (default: shards/ next to the JSON)")
+    args = parser.parse_args()
+
+    restaurants = load_data_from_json(args.json_path)
+    if not restaurants:
+        sys.exit(f"Nothing to shard from '{args.json_path}'")
+    data_dir = os.path.dirname(args.json_path)
+    with open(args.regions or os.path.join(data_dir, "regions.json"), encoding="utf-8") as f:
+        regions = json.load(f).get("regions", [])
+    shard_dir = args.output or os.path.join(data_dir, SHARD_DIR)
+    started = time.perf_counter()
+    counts = write_region_shards(restaurants, regions, shard_dir)
+    print(f"Wrote {len(restaurants)} restaurants to {len(counts)} shards in '{shard_dir}' "
+          f"in {time.perf_counter() - started:.1f} s")
+    for region, count in counts.items():
+        print(f"  {region}: {count}")
+
+
+if __name__ == "__main__":
+    main()
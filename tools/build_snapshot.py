@@ -0,0 +1,98 @@
+"""
+Compile data/restaurants.json into the binary snapshot the server mmaps at
+startup (data/restaurants.snap). The server only uses the snapshot while it
+is newer than the JSON, so re-run this after editing the data.
+
+With --benchmark, instead builds a synthetic catalogue of N restaurants
+(see memory_report.py) and reports how long loading takes from JSON and from
+the snapshot, each in a fresh interpreter.
+
+Usage (from the repository root):
+    python tools/build_snapshot.py
+    python tools/build_snapshot.py data/restaurants.json -o /tmp/restaurants.snap
+    python tools/build_snapshot.py --benchmark 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build(json_path: str, snapshot_path: str) -> None:
+    from app import load_data_from_json, write_snapshot
+
+    restaurants = load_data_from_json(json_path)
+    if not restaurants:
+        sys.exit(f"Nothing to compile from '{json_path}'")
+    write_snapshot(restaurants, snapshot_path)
+    print(f"Wrote {len(restaurants)} restaurants to '{snapshot_path}' "
+          f"({os.path.getsize(snapshot_path):,} bytes)")
+
+
+def time_load(source: str, path: str) -> float:
+    """Seconds spent loading `path` in this (fresh) process."""
+    from app import load_data_from_json, load_data_from_snapshot
+
+    loader = load_data_from_json if source == "json" else load_data_from_snapshot
+    started = time.perf_counter()
+    loader(path)
+    return time.perf_counter() - started
+
+
+def benchmark(count: int) -> None:
+    from memory_report import load_vocabulary, synthetic_row
+    from app import load_data_from_json, write_snapshot
+
+    vocabulary = load_vocabulary()
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = os.path.join(workdir, "restaurants.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i in range(count):
+                row = synthetic_row(i, rng, vocabulary)
+                f.write(("," if i else "") + json.dumps(row, ensure_ascii=False))
+            f.write("]")
+        snapshot_path = os.path.join(workdir, "restaurants.snap")
+        write_snapshot(load_data_from_json(json_path), snapshot_path)
+
+        print(f"| Restaurants | Source | File size | Load time |")
+        print(f"|---:|---|---:|---:|")
+        for source, path in (("json", json_path), ("snapshot", snapshot_path)):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--time-load", source, path],
+                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            seconds = float(output.strip().splitlines()[-1])
+            size = os.path.getsize(path) / (1024 * 1024)
+            print(f"| {count:,} | {source} | {size:,.1f} MB | {seconds:.2f} s |", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("json_path", nargs="?", default=os.path.join("data", "restaurants.json"))
+    parser.add_argument("-o", "--output", help="snapshot path (default: next to the JSON, .snap)")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="time JSON vs snapshot loading for N synthetic restaurants")
+    parser.add_argument("--time-load", nargs=2, metavar=("SOURCE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.time_load:
+        # Child process: one timed load, printed as a bare number
+        print(time_load(*args.time_load))
+    elif args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        from app import snapshot_path_for
+        build(args.json_path, args.output or snapshot_path_for(args.json_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Startup time and memory of N server workers, three ways:
+
+  import - N independent `app.py --workers 1` processes, each loading and
+           indexing the catalogue itself (what running the module once per
+           worker amounts to)
+  fork   - one `app.py --workers N`: the parent loads once, then forks N
+           workers that share the data copy-on-write
+  shared - one `app.py --workers N --shared-memory`: like fork, but the
+           catalogue rows and the text, trigram and autocomplete indexes
+           live in shared memory segments instead of the heap
+
+Both run on a synthetic catalogue (see memory_report.py) in a temporary data
+directory. Each worker gets some search traffic before it is measured, so the
+numbers include pages copied by use. Memory is read from /proc (Linux only):
+RSS per worker, and PSS, which splits shared pages between the processes
+sharing them, so the PSS total is the real memory cost.
+
+Usage (from the repository root):
+    python tools/measure_workers.py                 # 100k restaurants, 4 workers
+    python tools/measure_workers.py --restaurants 200000 --workers 8
+    python tools/measure_workers.py --modes fork,shared
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from memory_report import load_vocabulary, synthetic_row
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_BODY = json.dumps({"userLatitude": 10.77, "userLongitude": 106.68,
+                          "radiusKm": 1.0, "limit": 20}).encode("utf-8")
+
+
+def write_catalogue(data_dir: str, count: int):
+    vocabulary = load_vocabulary()
+    rng = random.Random(42)
+    with open(os.path.join(data_dir, "restaurants.json"), "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(count):
+            f.write(("," if i else "") + json.dumps(synthetic_row(i, rng, vocabulary),
+                                                    ensure_ascii=False))
+        f.write("]")
+    for name in ("dishes.json", "regions.json", "data_chat.json"):
+        source = os.path.join(ROOT, "data", name)
+        if os.path.exists(source):
+            shutil.copy(source, data_dir)
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def post_search(port: int):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/api/search", data=SEARCH_BODY,
+                                     headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(request, timeout=60).read()
+
+
+def wait_healthy(port: int, deadline: float):
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"No server on port {port}")
+
+
+def start(data_dir: str, port: int, workers: int, shared: bool = False) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "app.py", "--workers", str(workers), "--port", str(port),
+         "--data-dir", data_dir] + (["--shared-memory"] if shared else []),
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure(mode: str, data_dir: str, workers: int, port: int, warmup: int) -> dict:
+    started = time.time()
+    if mode == "import":
+        parents = [start(data_dir, port + i, 1) for i in range(workers)]
+        ports = [port + i for i in range(workers)]
+    else:
+        parents = [start(data_dir, port, workers, shared=mode == "shared")]
+        ports = [port]
+    try:
+        for p in ports:
+            wait_healthy(p, started + 1800)
+        if mode != "import":
+            while len(child_pids(parents[0].pid)) < workers:
+                time.sleep(0.05)
+        startup = time.time() - started
+
+        for _ in range(warmup * workers // len(ports)):
+            for p in ports:
+                post_search(p)
+
+        if mode == "import":
+            worker_pids, all_pids = [p.pid for p in parents], [p.pid for p in parents]
+        else:
+            worker_pids = child_pids(parents[0].pid)
+            all_pids = [parents[0].pid] + worker_pids
+        worker_memory = [memory_kb(pid) for pid in worker_pids]
+        return {
+            "startup": startup,
+            "rss": sum(m["Rss"] for m in worker_memory) / len(worker_memory),
+            "pss": sum(m["Pss"] for m in worker_memory) / len(worker_memory),
+            "total": sum(memory_kb(pid)["Pss"] for pid in all_pids),
+        }
+    finally:
+        for p in parents:
+            p.send_signal(signal.SIGTERM)
+        for p in parents:
+            p.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--restaurants", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20, help="searches per worker before measuring")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--modes", default="import,fork,shared", help="comma-separated modes to run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_catalogue(data_dir, args.restaurants)
+        print("| Restaurants | Workers | Mode | Startup | RSS / worker | PSS / worker | Total PSS |")
+        print("|---:|---:|---|---:|---:|---:|---:|")
+        for mode in args.modes.split(","):
+            result = measure(mode, data_dir, args.workers, args.port, args.warmup)
+            print(f"| {args.restaurants:,} | {args.workers} | {mode} | {result['startup']:.1f} s "
+                  f"| {result['rss'] / 1024:,.0f} MB | {result['pss'] / 1024:,.0f} MB "
+                  f"| {result['total'] / 1024:,.0f} MB |", flush=True)
+
+
+if __name__ == "__main__":
+    main()
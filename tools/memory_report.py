@@ -0,0 +1,153 @@
+"""
+Memory footprint of the Restaurant model at catalogue scale.
+
+Builds N synthetic restaurants (vocabulary taken from data/restaurants.json,
+every string a fresh object as json.load would produce) and reports the
+Python heap they retain, measured with tracemalloc. Layouts:
+
+  legacy     - the previous model: per-instance __dict__, list fields and a
+               separate Coordinates object
+  slots      - the current app.Restaurant (__slots__, tuples, interned
+               vocabulary, inline coordinates)
+  slots+json - the same plus the pre-encoded JSON kept for responses
+
+Each measurement runs in its own interpreter so interned strings from one
+run do not flatter the next.
+
+Usage (from the repository root):
+    python tools/memory_report.py                 # 100k and 1M, all layouts
+    python tools/memory_report.py --counts 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LAYOUTS = ("legacy", "slots", "slots+json")
+
+
+class LegacyRestaurant:
+    """The Restaurant layout before the __slots__ change, kept for comparison."""
+
+    def __init__(self, id, name, rating, averagePrice, cuisines, tags, openHours,
+                 specialFlags, location, image_url, distance_text, price_text,
+                 address="", dishType=None, flavorProfile=None):
+        self.id = id
+        self.name = name
+        self.rating = rating
+        self.averagePrice = averagePrice
+        self.cuisines = cuisines
+        self.tags = tags
+        self.openHours = openHours
+        self.specialFlags = specialFlags
+        self.location = location
+        self.image_url = image_url
+        self.distance_text = distance_text
+        self.price_text = price_text
+        self.address = address
+        self.dishType = dishType or []
+        self.flavorProfile = flavorProfile or []
+
+
+def load_vocabulary() -> dict:
+    with open(os.path.join(ROOT, "data", "restaurants.json"), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    vocabulary = {}
+    for field in ("cuisines", "tags", "specialFlags", "dishType", "flavorProfile"):
+        vocabulary[field] = sorted({value for item in data for value in item.get(field, [])})
+    for field in ("openHours", "price_text"):
+        vocabulary[field] = sorted({item[field] for item in data})
+    return vocabulary
+
+
+def fresh(value: str) -> str:
+    # A distinct str object with the same text, like every json.load result
+    return value.encode("utf-8").decode("utf-8")
+
+
+def synthetic_row(i: int, rng: random.Random, vocabulary: dict) -> dict:
+    def pick(field, low, high):
+        return [fresh(v) for v in rng.sample(vocabulary[field], rng.randint(low, high))]
+
+    return {
+        "id": i,
+        "name": f"Quán ăn số {i}",
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "averagePrice": rng.randrange(20000, 300000, 5000),
+        "cuisines": pick("cuisines", 1, 3),
+        "tags": pick("tags", 2, 5),
+        "openHours": fresh(rng.choice(vocabulary["openHours"])),
+        "specialFlags": pick("specialFlags", 0, 3),
+        "location": {"latitude": 10.70 + rng.random() * 0.15,
+                     "longitude": 106.60 + rng.random() * 0.15},
+        "image_url": f"../../assets/images/restaurants-img/{i}.png",
+        "distance_text": f"{rng.randint(1, 99) / 10} km",
+        "price_text": fresh(rng.choice(vocabulary["price_text"])),
+        "address": f"{i % 500 + 1} Nguyễn Trãi, Phường {i % 15 + 1}, Quận {i % 12 + 1}, TP. Hồ Chí Minh",
+        "dishType": pick("dishType", 1, 3),
+        "flavorProfile": pick("flavorProfile", 1, 3),
+    }
+
+
+def measure(layout: str, count: int) -> int:
+    """Bytes retained by `count` restaurants of the given layout."""
+    from app import Coordinates, Restaurant
+
+    model = LegacyRestaurant if layout == "legacy" else Restaurant
+    vocabulary = load_vocabulary()
+    rng = random.Random(42)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    restaurants = []
+    for i in range(count):
+        item = synthetic_row(i, rng, vocabulary)
+        location = item.pop("location")
+        restaurant = model(location=Coordinates(location["latitude"], location["longitude"]), **item)
+        if layout == "slots+json":
+            restaurant.to_json()
+        restaurants.append(restaurant)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained
+
+
+def format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):,.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--layout", choices=LAYOUTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.layout:
+        # Child process: one measurement, printed as a bare number
+        print(measure(args.layout, args.counts[0]))
+        return
+
+    print("| Restaurants | Layout | Heap | Per restaurant | vs legacy |")
+    print("|---:|---|---:|---:|---:|")
+    for count in args.counts:
+        legacy = None
+        for layout in LAYOUTS:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--layout", layout,
+                 "--counts", str(count)],
+                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            size = int(output.strip().splitlines()[-1])
+            legacy = legacy or size
+            print(f"| {count:,} | {layout} | {format_mb(size)} | {size // count} B "
+                  f"| {size / legacy:.0%} |", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Migrate data/restaurants.json into the SQLite catalogue (data/restaurants.db)
+served with DATA_BACKEND=sqlite. The database holds the restaurants table
+(with rating and price indexes), an R*Tree over the coordinates and an FTS5
+index over name, tags, cuisines and address. An existing database is
+replaced atomically, so a running server can reload it (POST
+/api/admin/reload) without a restart.
+
+Usage (from the repository root):
+    python tools/migrate_to_sqlite.py
+    python tools/migrate_to_sqlite.py data/restaurants.json -o /tmp/restaurants.db
+    DATA_BACKEND=sqlite python app.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    from app import DATA_DIR, RESTAURANTS_FILE, SQLITE_FILE, load_data_from_json, write_sqlite_catalogue
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("json_path", nargs="?", default=os.path.join(DATA_DIR, RESTAURANTS_FILE))
+    parser.add_argument("-o", "--output", help="database path (default: restaurants.db next to the JSON)")
+    args = parser.parse_args()
+
+    restaurants = load_data_from_json(args.json_path)
+    if not restaurants:
+        sys.exit(f"Nothing to migrate from '{args.json_path}'")
+    db_path = args.output or os.path.join(os.path.dirname(args.json_path), SQLITE_FILE)
+    started = time.perf_counter()
+    count = write_sqlite_catalogue(restaurants, db_path)
+    print(f"Wrote {count} restaurants to '{db_path}' ({os.path.getsize(db_path):,} bytes) "
+          f"in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()